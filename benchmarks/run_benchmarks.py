@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script benchmarks preprocessing and feature extraction functions of hrvanalysis on
+ synthetic RR-interval recordings from 5 minutes to 7 days, and flags regressions against the
+ baselines stored in baselines.json.
+
+Usage :
+    python benchmarks/run_benchmarks.py                    # compare to stored baselines
+    python benchmarks/run_benchmarks.py --durations 5min 1h
+    python benchmarks/run_benchmarks.py --save-baselines   # store new baselines
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hrvanalysis.preprocessing import get_nn_intervals  # noqa: E402
+from hrvanalysis.extract_features import (get_time_domain_features, get_geometrical_features,  # noqa: E402
+                                          get_frequency_domain_features, get_csi_cvi_features,
+                                          get_poincare_plot_features, get_sampen,
+                                          get_multiscale_entropy, get_dfa_features,
+                                          get_all_features, clear_psd_cache)
+from hrvanalysis.windowing import get_spectrogram_features  # noqa: E402
+
+BASELINES_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Durations of synthetic recordings, in seconds
+DURATIONS = {
+    "5min": 300,
+    "1h": 3600,
+    "24h": 86400,
+    "7d": 604800,
+}
+
+# Relative increase over the baseline above which a benchmark is flagged as a regression. Time
+# depends on the machine and its load, peak memory is almost deterministic.
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.1
+# Increases of time below this one, in seconds, are timer noise and never flagged
+MIN_TIME_INCREASE = 0.002
+
+# Time of a run below which it is repeated, to measure the best of several runs
+MIN_REPEAT_TIME = 0.2
+MAX_REPEAT = 5
+
+# Longest recording on which each benchmark is run : entropy features grow faster than
+# linearly with the number of beats and are not computed on multi-day recordings in practice.
+ENTROPY_MAX_DURATION = 86400
+LOMB_MAX_DURATION = 86400
+
+
+def generate_rr_intervals(duration: float, seed: int = 0) -> np.ndarray:
+    """
+    Generates a synthetic recording of RR-intervals in ms, with respiratory (HF) and Mayer wave
+    (LF) oscillations, a slow circadian trend, 1 % of ectopic beats followed by a compensatory
+    pause and 0.1 % of artefacts out of the plausible range.
+
+    Parameters
+    ----------
+    duration : float
+        Duration of the recording, in seconds.
+    seed : int
+        Seed of the random generator, so that recordings are the same from one run to another.
+
+    Returns
+    -------
+    rr_intervals : array
+        array of RR-intervals, in ms.
+    """
+    rng = np.random.default_rng(seed)
+    beat_count = int(duration / 0.8) + 1
+    beat_time = np.arange(beat_count) * 0.8
+    rr_intervals = (800 + 100 * np.sin(2 * np.pi * beat_time / 86400)
+                    + 25 * np.sin(2 * np.pi * 0.1 * beat_time)
+                    + 15 * np.sin(2 * np.pi * 0.25 * beat_time)
+                    + rng.normal(0, 10, beat_count))
+    rr_intervals = np.round(rr_intervals[np.cumsum(rr_intervals) <= duration * 1000])
+
+    ectopic_beats = np.flatnonzero(rng.random(len(rr_intervals) - 1) < 0.01)
+    rr_intervals[ectopic_beats] *= 0.6
+    rr_intervals[ectopic_beats + 1] *= 1.4
+    artefacts = rng.random(len(rr_intervals)) < 0.001
+    rr_intervals[artefacts] = rng.choice([150, 2500], size=np.count_nonzero(artefacts))
+    return rr_intervals
+
+
+def get_benchmarks() -> Dict[str, Tuple[Callable, float]]:
+    """
+    Returns the benchmarked functions, each one taking RR-intervals and NN-intervals, with the
+    longest recording duration on which they are run.
+    """
+    benchmarks = {}
+    for method in ["malik", "kamath", "karlsson", "acar", "custom"]:
+        benchmarks["get_nn_intervals[{}]".format(method)] = (
+            lambda rr, nn, method=method: get_nn_intervals(rr, ectopic_beats_removal_method=method,
+                                                           verbose=False), None)
+    benchmarks.update({
+        "get_time_domain_features": (lambda rr, nn: get_time_domain_features(nn), None),
+        "get_geometrical_features": (lambda rr, nn: get_geometrical_features(nn), None),
+        "get_frequency_domain_features[welch]": (
+            lambda rr, nn: get_frequency_domain_features(nn, method="welch"), None),
+        "get_frequency_domain_features[lomb]": (
+            lambda rr, nn: get_frequency_domain_features(nn, method="lomb"), LOMB_MAX_DURATION),
+        "get_csi_cvi_features": (lambda rr, nn: get_csi_cvi_features(nn), None),
+        "get_poincare_plot_features": (lambda rr, nn: get_poincare_plot_features(nn), None),
+        "get_sampen": (lambda rr, nn: get_sampen(nn), ENTROPY_MAX_DURATION),
+        "get_multiscale_entropy": (lambda rr, nn: get_multiscale_entropy(nn), ENTROPY_MAX_DURATION),
+        "get_dfa_features": (lambda rr, nn: get_dfa_features(nn), None),
+        "get_all_features": (lambda rr, nn: get_all_features(nn), ENTROPY_MAX_DURATION),
+        "get_spectrogram_features": (lambda rr, nn: get_spectrogram_features(nn), None),
+    })
+    return benchmarks
+
+
+def measure(function: Callable, *args) -> dict:
+    """
+    Measures the best time of several runs of a function and its peak memory, traced in a
+    separate run as tracing slows allocations down.
+    """
+    times = []
+    while len(times) < MAX_REPEAT and sum(times) < MIN_REPEAT_TIME:
+        # Cached power spectral densities would make repeated runs faster than the first one
+        clear_psd_cache()
+        gc.collect()
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+
+    clear_psd_cache()
+    gc.collect()
+    tracemalloc.start()
+    function(*args)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time": min(times), "peak_memory": peak_memory}
+
+
+def run_benchmarks(durations: List[str], benchmark_names: List[str] = None) -> dict:
+    """
+    Runs benchmarks on synthetic recordings of the given durations.
+
+    Returns
+    -------
+    results : dict
+        Dictionary mapping "benchmark name/duration" to the time in seconds and peak memory in
+        bytes of the benchmark.
+    """
+    benchmarks = get_benchmarks()
+    # Modules imported on first use, such as scipy.signal, are loaded before timing anything
+    warm_up_rr_intervals = generate_rr_intervals(DURATIONS["5min"])
+    warm_up_nn_intervals = get_nn_intervals(warm_up_rr_intervals, verbose=False)
+    for function, _ in benchmarks.values():
+        function(warm_up_rr_intervals, warm_up_nn_intervals)
+
+    results = {}
+    for duration_name in durations:
+        rr_intervals = generate_rr_intervals(DURATIONS[duration_name])
+        nn_intervals = get_nn_intervals(rr_intervals, verbose=False)
+        for benchmark_name, (function, max_duration) in benchmarks.items():
+            if benchmark_names and benchmark_name not in benchmark_names:
+                continue
+            if max_duration is not None and DURATIONS[duration_name] > max_duration:
+                continue
+            result = measure(function, rr_intervals, nn_intervals)
+            results["{}/{}".format(benchmark_name, duration_name)] = result
+            print("{:<45} {:>6} {:>10.4f} s {:>10.1f} MB".format(
+                benchmark_name, duration_name, result["time"], result["peak_memory"] / 1e6))
+    return results
+
+
+def get_regressions(results: dict, baselines: dict, time_tolerance: float = TIME_TOLERANCE,
+                    memory_tolerance: float = MEMORY_TOLERANCE) -> List[str]:
+    """
+    Compares results to baselines and returns a description of each regression.
+
+    Parameters
+    ----------
+    results : dict
+        results of run_benchmarks.
+    baselines : dict
+        stored results of run_benchmarks.
+    time_tolerance : float
+        relative increase of time over the baseline above which a benchmark is flagged.
+    memory_tolerance : float
+        relative increase of peak memory over the baseline above which a benchmark is flagged.
+
+    Returns
+    -------
+    regressions : list
+        list of messages describing each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baselines:
+            continue
+        for metric, tolerance in [("time", time_tolerance), ("peak_memory", memory_tolerance)]:
+            baseline = baselines[name][metric]
+            if metric == "time" and result[metric] - baseline < MIN_TIME_INCREASE:
+                continue
+            if result[metric] > baseline * (1 + tolerance):
+                regressions.append("{} : {} {:.4g} exceeds baseline {:.4g} by more than {:.0%}".format(
+                    name, metric, result[metric], baseline, tolerance))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", nargs="+", choices=list(DURATIONS), default=list(DURATIONS))
+    parser.add_argument("--benchmarks", nargs="+", choices=list(get_benchmarks()), default=None)
+    parser.add_argument("--baselines", default=BASELINES_FILENAME,
+                        help="JSON file of baselines to compare to or to save")
+    parser.add_argument("--save-baselines", action="store_true",
+                        help="store results as new baselines instead of comparing to them")
+    parser.add_argument("--output", help="JSON file in which results are written")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.durations, args.benchmarks)
+    if args.output:
+        with open(args.output, "w") as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, "r") as json_file:
+            baselines = json.load(json_file)
+
+    if args.save_baselines:
+        baselines.update(results)
+        with open(args.baselines, "w") as json_file:
+            json.dump(baselines, json_file, indent=2, sort_keys=True)
+        return 0
+
+    regressions = get_regressions(results, baselines, args.time_tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
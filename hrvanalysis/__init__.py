@@ -5,11 +5,56 @@
 
 __version__ = "1.0.3"
 
+import importlib
+
 from hrvanalysis.extract_features import (get_time_domain_features, get_frequency_domain_features,
                                           get_geometrical_features, get_csi_cvi_features,
-                                          get_poincare_plot_features, get_sampen)
+                                          get_poincare_plot_features, get_sampen,
+                                          get_multiscale_entropy, get_dfa_features, get_all_features,
+                                          get_frequency_bands_features, FrequencyBand)
 
 from hrvanalysis.preprocessing import (remove_outliers, remove_ectopic_beats, interpolate_nan_values,
-                                       get_nn_intervals)
+                                       get_nn_intervals, clean_rr_intervals)
+
+# Functions of other modules are loaded on first access, so that importing hrvanalysis only
+# loads feature extraction and preprocessing : importing matplotlib is slow, and the time of
+# the other modules adds up as the package grows
+_LAZY_ATTRIBUTES = {
+    "get_batch_features": "hrvanalysis.batch",
+    "get_sliding_window_features": "hrvanalysis.windowing",
+    "get_spectrogram_features": "hrvanalysis.windowing",
+    "HrvStream": "hrvanalysis.streaming",
+    "get_cohort_features": "hrvanalysis.parallel",
+    "read_rr_intervals": "hrvanalysis.chunked",
+    "HrvChunkCleaner": "hrvanalysis.chunked",
+    "get_chunked_epoch_features": "hrvanalysis.chunked",
+    "write_rr_intervals_file": "hrvanalysis.storage",
+    "RrIntervalsFile": "hrvanalysis.storage",
+    "profile_stages": "hrvanalysis.profiling",
+    "add_stage_callback": "hrvanalysis.profiling",
+    "remove_stage_callback": "hrvanalysis.profiling",
+    "plot_timeseries": "hrvanalysis.plot",
+    "plot_distrib": "hrvanalysis.plot",
+    "plot_psd": "hrvanalysis.plot",
+    "plot_poincare": "hrvanalysis.plot",
+}
+
+__all__ = ["get_time_domain_features", "get_frequency_domain_features", "get_geometrical_features",
+           "get_csi_cvi_features", "get_poincare_plot_features", "get_sampen",
+           "get_multiscale_entropy", "get_dfa_features", "get_all_features",
+           "get_frequency_bands_features", "FrequencyBand", "remove_outliers",
+           "remove_ectopic_beats", "interpolate_nan_values", "get_nn_intervals",
+           "clean_rr_intervals"] + list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        attribute = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        # Cache the attribute so that __getattr__ is only called once
+        globals()[name] = attribute
+        return attribute
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
 
-from hrvanalysis.plot import (plot_timeseries, plot_distrib, plot_psd, plot_poincare)
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides methods to extract features from many recordings of Normal to Normal
+ Intervals at once for heart rate variability analysis."""
+
+from typing import List, Tuple
+from collections import namedtuple
+import numpy as np
+from hrvanalysis.extract_features import (_get_freq_psd_from_nn_intervals, _get_features_from_psd,
+                                          _get_nn_histograms, _get_tinn, get_lomb_psd, WELCH_METHOD,
+                                          LOMB_METHOD, VlfBand, LfBand, HfBand)
+
+# limit functions that user might import using "from hrv-analysis import *"
+__all__ = ["get_batch_features", "flatten_batch"]
+
+
+def flatten_batch(nn_intervals: List[List[float]], offsets: List[int] = None,
+                  min_length: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns a batch of recordings as a single flat array of values and the offsets of each
+    recording in it.
+
+    Parameters
+    ---------
+    nn_intervals : list
+        list of recordings, each one being a list or array of Normal to Normal Interval. If
+        offsets are given, flat array of the Normal to Normal Intervals of all recordings.
+    offsets : list
+        Index of the first Normal to Normal Interval of each recording in the flat array,
+        followed by the total number of Normal to Normal Intervals. Only needed if nn_intervals
+        is already a flat array.
+    min_length : int
+        Minimum number of Normal to Normal Intervals of each recording.
+
+    Returns
+    ---------
+    values : array
+        Normal to Normal Intervals of all recordings, concatenated.
+    offsets : array
+        Array of length number of recordings + 1. Recording i is values[offsets[i]:offsets[i + 1]].
+    """
+    if offsets is None:
+        recordings = [np.asarray(recording, dtype=float) for recording in nn_intervals]
+        lengths = [len(recording) for recording in recordings]
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(int)
+        values = np.concatenate(recordings) if recordings else np.array([], dtype=float)
+    else:
+        values = np.asarray(nn_intervals, dtype=float)
+        offsets = np.asarray(offsets, dtype=int)
+
+    if len(offsets) < 2 or offsets[0] != 0 or offsets[-1] != len(values):
+        raise ValueError("offsets must start at 0 and end with the total number of NN-intervals")
+    if np.any(np.diff(offsets) < min_length):
+        raise ValueError("Each recording must contain at least {} NN-intervals".format(min_length))
+    return values, offsets
+
+
+def get_batch_features(nn_intervals: List[List[float]], offsets: List[int] = None,
+                       pnni_as_percent: bool = True, frequency_domain: bool = True,
+                       method: str = WELCH_METHOD, sampling_frequency: int = 4,
+                       interpolation_method: str = "linear",
+                       vlf_band: namedtuple = VlfBand(0.003, 0.04),
+                       lf_band: namedtuple = LfBand(0.04, 0.15),
+                       hf_band: namedtuple = HfBand(0.15, 0.40),
+                       lomb_frequencies: List[float] = None) -> dict:
+    """
+    Returns a columnar table with time domain, geometrical, Poincaré plot, CSI / CVI and
+    frequency domain features of many recordings at once.
+
+    Time domain, geometrical, Poincaré plot and CSI / CVI features are computed for all
+    recordings together with segment reductions, without looping over recordings. The power
+    spectral density is estimated recording by recording, except for the Lomb method on a
+    fixed frequency grid which processes all recordings in one call.
+
+    Parameters
+    ---------
+    nn_intervals : list
+        list of recordings, each one being a list or array of Normal to Normal Interval. If
+        offsets are given, flat array of the Normal to Normal Intervals of all recordings.
+    offsets : list
+        Index of the first Normal to Normal Interval of each recording in the flat array,
+        followed by the total number of Normal to Normal Intervals.
+    pnni_as_percent: bool
+        whether to remove bias or not to compute pnni features.
+    frequency_domain : bool
+        whether to compute frequency domain features or not.
+    method : str
+        Method used to calculate the psd. Choice are Welch's FFT or Lomb method.
+    sampling_frequency : int
+        Frequency at which the signal is sampled. No need to specify if Lomb method is used.
+    interpolation_method : str
+        kind of interpolation as a string, by default "linear". No need to specify if Lomb
+        method is used.
+    vlf_band : tuple
+        Very low frequency bands for features extraction from power spectral density.
+    lf_band : tuple
+        Low frequency bands for features extraction from power spectral density.
+    hf_band : tuple
+        High frequency bands for features extraction from power spectral density.
+    lomb_frequencies : array
+        Regular frequency grid on which Lomb periodograms of all recordings are evaluated at
+        once, see get_lomb_psd. Only used if Lomb method is used.
+
+    Returns
+    ---------
+    batch_features : dict
+        Dictionary mapping each feature name to an array containing its value for every
+        recording, in input order. It can directly be given to pandas.DataFrame.
+    """
+    values, offsets = flatten_batch(nn_intervals, offsets)
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    recording_index = np.repeat(np.arange(len(lengths)), lengths)
+
+    # Successive differences, without the ones between two different recordings
+    diff_nni = np.delete(np.diff(values), offsets[1:-1] - 1)
+    diff_starts = starts - np.arange(len(starts))
+    diff_lengths = lengths - 1
+
+    batch_features = _get_batch_time_domain_features(values, starts, lengths, recording_index,
+                                                     diff_nni, diff_starts, diff_lengths,
+                                                     pnni_as_percent)
+    batch_features.update(_get_batch_geometrical_features(values, lengths, recording_index))
+    batch_features.update(_get_batch_poincare_and_csi_cvi_features(batch_features["sdnn"],
+                                                                   diff_nni, diff_starts,
+                                                                   diff_lengths))
+
+    if frequency_domain:
+        recordings = [values[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        if method == LOMB_METHOD and lomb_frequencies is not None:
+            freq = np.asarray(lomb_frequencies, dtype=float)
+            freq_psd_list = [(freq, psd) for psd in get_lomb_psd(recordings, freq)]
+        else:
+            freq_psd_list = [_get_freq_psd_from_nn_intervals(
+                nn_intervals=recording, method=method, sampling_frequency=sampling_frequency,
+                interpolation_method=interpolation_method, vlf_band=vlf_band, hf_band=hf_band)
+                for recording in recordings]
+        frequency_domain_features = [_get_features_from_psd(freq=freq, psd=psd, vlf_band=vlf_band,
+                                                            lf_band=lf_band, hf_band=hf_band)
+                                     for freq, psd in freq_psd_list]
+        for feature_name in frequency_domain_features[0]:
+            batch_features[feature_name] = np.array([features[feature_name]
+                                                     for features in frequency_domain_features])
+
+    return batch_features
+
+
+def _segment_mean(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Mean of each segment of values."""
+    return np.add.reduceat(values, starts) / lengths
+
+
+def _segment_var(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray,
+                 ddof: int = 0) -> np.ndarray:
+    """Variance of each segment of values, computed in two passes as numpy does."""
+    segment_mean = _segment_mean(values, starts, lengths)
+    squared_deviation = (values - np.repeat(segment_mean, lengths)) ** 2
+    return np.add.reduceat(squared_deviation, starts) / (lengths - ddof)
+
+
+def _get_batch_time_domain_features(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray,
+                                    recording_index: np.ndarray, diff_nni: np.ndarray,
+                                    diff_starts: np.ndarray, diff_lengths: np.ndarray,
+                                    pnni_as_percent: bool = True) -> dict:
+    """
+    Computes time domain features of every recording of the batch. See
+    get_time_domain_features for details about each feature.
+    """
+    length_int = diff_lengths if pnni_as_percent else lengths
+
+    mean_nni = _segment_mean(values, starts, lengths)
+
+    # Sort values inside each recording to get median, min and max at once
+    sorted_values = values[np.lexsort((values, recording_index))]
+    median_nni = (sorted_values[starts + (lengths - 1) // 2] + sorted_values[starts + lengths // 2]) / 2
+    min_nni = sorted_values[starts]
+    max_nni = sorted_values[starts + lengths - 1]
+
+    sdsd = np.sqrt(_segment_var(diff_nni, diff_starts, diff_lengths))
+    rmssd = np.sqrt(_segment_mean(diff_nni ** 2, diff_starts, diff_lengths))
+
+    nni_50 = np.add.reduceat((np.abs(diff_nni) > 50).astype(int), diff_starts)
+    nni_20 = np.add.reduceat((np.abs(diff_nni) > 20).astype(int), diff_starts)
+
+    sdnn = np.sqrt(_segment_var(values, starts, lengths, ddof=1))
+
+    heart_rate = np.divide(60000, values)
+
+    return {
+        'mean_nni': mean_nni,
+        'sdnn': sdnn,
+        'sdsd': sdsd,
+        'nni_50': nni_50,
+        'pnni_50': 100 * nni_50 / length_int,
+        'nni_20': nni_20,
+        'pnni_20': 100 * nni_20 / length_int,
+        'rmssd': rmssd,
+        'median_nni': median_nni,
+        'range_nni': max_nni - min_nni,
+        'cvsd': rmssd / mean_nni,
+        'cvnni': sdnn / mean_nni,
+        'mean_hr': _segment_mean(heart_rate, starts, lengths),
+        'max_hr': np.divide(60000, min_nni),
+        'min_hr': np.divide(60000, max_nni),
+        'std_hr': np.sqrt(_segment_var(heart_rate, starts, lengths)),
+    }
+
+
+def _get_batch_geometrical_features(values: np.ndarray, lengths: np.ndarray,
+                                    recording_index: np.ndarray) -> dict:
+    """
+    Computes geometrical features of every recording of the batch with a single 2D histogram.
+    See get_geometrical_features for details about each feature.
+    """
+    histograms = _get_nn_histograms(values, recording_index, len(lengths))
+    with np.errstate(divide="ignore"):
+        triang_idx = lengths / histograms.max(axis=1)
+
+    return {
+        "triangular_index": triang_idx,
+        "tinn": _get_tinn(histograms)
+    }
+
+
+def _get_batch_poincare_and_csi_cvi_features(sdnn: np.ndarray, diff_nni: np.ndarray,
+                                             diff_starts: np.ndarray, diff_lengths: np.ndarray) -> dict:
+    """
+    Computes Poincaré plot and CSI / CVI features of every recording of the batch. See
+    get_poincare_plot_features and get_csi_cvi_features for details about each feature.
+    """
+    var_diff_nni = _segment_var(diff_nni, diff_starts, diff_lengths, ddof=1)
+    sd1 = np.sqrt(var_diff_nni * 0.5)
+    sd2 = np.sqrt(2 * sdnn ** 2 - 0.5 * var_diff_nni)
+
+    T = 4 * sd1
+    L = 4 * sd2
+
+    return {
+        'sd1': sd1,
+        'sd2': sd2,
+        'ratio_sd2_sd1': sd2 / sd1,
+        'csi': L / T,
+        'cvi': np.log10(L * T),
+        'Modified_csi': L ** 2 / T
+    }
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides methods to clean RR-intervals and extract features on epochs of
+ recordings too long to be loaded in memory, such as multi-day ambulatory recordings, by reading
+ them chunk by chunk from disk."""
+
+import os
+from itertools import islice
+from typing import Iterable, Iterator, List, Union
+import numpy as np
+from hrvanalysis.preprocessing import (MALIK_RULE, KARLSSON_RULE, KAMATH_RULE, ACAR_RULE, CUSTOM_RULE,
+                                       ACAR_WINDOW, _get_karlsson_outlier_indexes,
+                                       _get_acar_outlier_indexes, _get_successive_rule_outlier_mask)
+from hrvanalysis.windowing import BEATS_UNIT, SECONDS_UNIT, _get_window_features
+
+# limit functions that user might import using "from hrv-analysis import *"
+__all__ = ["read_rr_intervals", "HrvChunkCleaner", "get_chunked_epoch_features"]
+
+# Default number of RR-intervals read at once, about a day of recording
+DEFAULT_CHUNK_SIZE = 100000
+
+# Extensions of files read as text, with one RR-interval per line
+TEXT_EXTENSIONS = [".txt", ".csv"]
+
+
+def read_rr_intervals(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      dtype: str = None) -> Iterator[np.ndarray]:
+    """
+    Reads RR-intervals from a file chunk by chunk, so that only chunk_size RR-intervals are held
+    in memory at once.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file. Text files (.txt, .csv) contain one RR-interval per line, .npy files a
+        one dimensional array. Other files are read as raw binary arrays of the given dtype.
+    chunk_size : int
+        Number of RR-intervals in each chunk.
+    dtype : str
+        dtype of the values of a raw binary file, for example "float32" or "int16". Not used
+        for text and .npy files.
+
+    Returns
+    -------
+    rr_intervals_chunks : iterator
+        Iterator over arrays of at most chunk_size RR-intervals, in ms. Chunks of .npy and raw
+        binary files are read-only views of a memory map of the file.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be strictly positive")
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension in TEXT_EXTENSIONS:
+        return _read_text_rr_intervals(path, chunk_size)
+
+    if extension == ".npy":
+        rr_intervals = np.load(path, mmap_mode="r")
+    elif dtype is None:
+        raise ValueError("dtype must be given to read a raw binary file")
+    else:
+        rr_intervals = np.memmap(path, dtype=dtype, mode="r")
+    if rr_intervals.ndim != 1:
+        raise ValueError("RR-intervals file must contain a one dimensional array")
+    return (rr_intervals[start:start + chunk_size] for start in range(0, len(rr_intervals), chunk_size))
+
+
+def _read_text_rr_intervals(path: str, chunk_size: int) -> Iterator[np.ndarray]:
+    """Reads a text file containing one RR-interval per line, chunk_size lines at a time."""
+    with open(path, "r") as text_file:
+        while True:
+            lines = [line for line in islice(text_file, chunk_size) if line.strip()]
+            if not lines:
+                break
+            yield np.array(lines).astype(float)
+
+
+class HrvChunkCleaner:
+    """
+    Cleans RR-intervals chunk by chunk and returns the same NN-intervals as get_nn_intervals
+    with linear interpolation on the whole recording.
+
+    Each chunk is cleaned with the array methods of the preprocessing module. Between two
+    chunks, only the values the ectopic beats rules and the interpolation depend on are kept :
+    the previous RR-intervals, whether the last one has been removed, and the values held back
+    because they are followed by a gap, or not yet decided by the karlsson rule.
+
+    Parameters
+    ----------
+    low_rri : int
+        lowest RrInterval to be considered plausible.
+    high_rri : int
+        highest RrInterval to be considered plausible.
+    ectopic_beats_removal_method : str
+        method to use to clean outlier. malik, kamath, karlsson, acar or custom.
+    custom_removing_rule : float
+        Percentage criteria used by the custom, karlsson and acar rules.
+
+    Examples
+    --------
+    >>> cleaner = HrvChunkCleaner()
+    >>> for rr_intervals in read_rr_intervals("recording.npy"):
+    ...     nn_intervals = cleaner.add_rr_intervals(rr_intervals)
+    >>> nn_intervals = cleaner.flush()
+    """
+
+    def __init__(self, low_rri: int = 300, high_rri: int = 2000,
+                 ectopic_beats_removal_method: str = KAMATH_RULE, custom_removing_rule: float = 0.2):
+        if ectopic_beats_removal_method not in [MALIK_RULE, KAMATH_RULE, KARLSSON_RULE, ACAR_RULE,
+                                                CUSTOM_RULE]:
+            raise ValueError("Not a valid method. Please choose between malik, kamath, karlsson, acar.\
+             You can also choose your own removing critera with custom_rule parameter.")
+        self.low_rri = low_rri
+        self.high_rri = high_rri
+        self.method = ectopic_beats_removal_method
+        self.custom_removing_rule = custom_removing_rule
+
+        self._outliers_interpolator = _ChunkLinearInterpolator()
+        self._ectopic_beats_interpolator = _ChunkLinearInterpolator()
+        # Previous interpolated RR-intervals : last decided ones and, for the karlsson rule, the
+        # last one which waits for its next RR-interval. Acar rule keeps previous cleaned values.
+        self._previous_rr_intervals = np.empty(0)
+        self._pending_rr_intervals = np.empty(0)
+        self._previous_outlier = False
+
+    def add_rr_intervals(self, rr_intervals: List[float]) -> np.ndarray:
+        """
+        Cleans a new chunk of RR-intervals.
+
+        Parameters
+        ----------
+        rr_intervals : list or array
+            next RR-intervals of the recording, in ms.
+
+        Returns
+        -------
+        nn_intervals : array
+            NN-intervals which could be emitted after receiving these RR-intervals. NN-intervals
+            at the end of the chunk may be emitted with the next chunk.
+        """
+        rr_intervals = np.array(rr_intervals, dtype=float)
+        rr_intervals[~((rr_intervals >= self.low_rri) & (rr_intervals <= self.high_rri))] = np.nan
+        interpolated_rr_intervals = self._outliers_interpolator.push(rr_intervals)
+        nn_intervals = self._remove_ectopic_beats(interpolated_rr_intervals)
+        return self._ectopic_beats_interpolator.push(nn_intervals)
+
+    def flush(self) -> np.ndarray:
+        """
+        Emits the NN-intervals held back at the end of the recording, as get_nn_intervals does :
+        trailing removed values are replaced by the last valid one.
+
+        Returns
+        -------
+        nn_intervals : array
+            NN-intervals emitted.
+        """
+        nn_intervals = self._remove_ectopic_beats(self._outliers_interpolator.flush())
+        # Last RR-interval has no next one and is always kept by the karlsson rule
+        nn_intervals = np.concatenate((nn_intervals, self._pending_rr_intervals))
+        self._pending_rr_intervals = np.empty(0)
+        return np.concatenate((self._ectopic_beats_interpolator.push(nn_intervals),
+                               self._ectopic_beats_interpolator.flush()))
+
+    def _remove_ectopic_beats(self, rr_intervals: np.ndarray) -> np.ndarray:
+        """
+        Applies the ectopic beats rule to new interpolated RR-intervals, the previous ones being
+        prepended so that decisions are the ones taken on the whole recording.
+        """
+        if not len(rr_intervals):
+            return rr_intervals
+
+        if self.method == KARLSSON_RULE:
+            buffer = np.concatenate((self._previous_rr_intervals, self._pending_rr_intervals,
+                                     rr_intervals))
+            # First RR-interval of the recording is always kept, last one waits for the next one
+            nn_intervals = buffer.copy()
+            nn_intervals[_get_karlsson_outlier_indexes(buffer, self.custom_removing_rule)] = np.nan
+            nn_intervals = nn_intervals[len(self._previous_rr_intervals):-1]
+            self._previous_rr_intervals = buffer[-2:-1]
+            self._pending_rr_intervals = buffer[-1:]
+            return nn_intervals
+
+        if self.method == ACAR_RULE:
+            # Acar rule compares to previous cleaned NN-intervals
+            buffer = np.concatenate((self._previous_rr_intervals, rr_intervals))
+            outlier_indexes = np.asarray(_get_acar_outlier_indexes(buffer, self.custom_removing_rule),
+                                         dtype=int)
+            buffer[outlier_indexes] = np.nan
+            self._previous_rr_intervals = buffer[-ACAR_WINDOW:]
+            return buffer[-len(rr_intervals):]
+
+        # A nan before a removed RR-interval starts a run of failed comparisons at the removed
+        # one, so that the comparison with the first new RR-interval is skipped
+        context = [np.nan] if self._previous_outlier else []
+        buffer = np.concatenate((context, self._previous_rr_intervals, rr_intervals))
+        outlier_mask = _get_successive_rule_outlier_mask(buffer, method=self.method,
+                                                         custom_rule=self.custom_removing_rule)
+        outlier_mask = outlier_mask[-len(rr_intervals):]
+        self._previous_rr_intervals = rr_intervals[-1:]
+        self._previous_outlier = bool(outlier_mask[-1])
+        return np.where(outlier_mask, np.nan, rr_intervals)
+
+
+class _ChunkLinearInterpolator:
+    """
+    Linear interpolation of nan values of a recording received chunk by chunk. Values are held
+    back while a gap is open and released, interpolated, with the chunk containing the next valid
+    value. Leading nan values take the first valid value, as in interpolate_nan_values.
+    """
+
+    def __init__(self):
+        self._last_valid_value = None
+        self._gap_length = 0
+
+    def push(self, values: np.ndarray) -> np.ndarray:
+        valid_indexes = np.flatnonzero(~np.isnan(values))
+        if not len(valid_indexes):
+            self._gap_length += len(values)
+            return np.empty(0)
+
+        previous_values = [] if self._last_valid_value is None else [self._last_valid_value]
+        buffer = np.concatenate((previous_values, np.full(self._gap_length, np.nan), values))
+        valid_indexes = np.concatenate(([0] if previous_values else [],
+                                        valid_indexes + len(previous_values) + self._gap_length))
+        last_valid_index = int(valid_indexes[-1])
+        interpolated_values = np.interp(np.arange(len(previous_values), last_valid_index + 1),
+                                        valid_indexes, buffer[valid_indexes.astype(int)])
+
+        self._last_valid_value = buffer[last_valid_index]
+        self._gap_length = len(buffer) - last_valid_index - 1
+        return interpolated_values
+
+    def flush(self) -> np.ndarray:
+        if self._last_valid_value is None:
+            return np.empty(0)
+        values = np.full(self._gap_length, self._last_valid_value)
+        self._gap_length = 0
+        return values
+
+
+def get_chunked_epoch_features(rr_intervals: Union[str, Iterable[np.ndarray]], epoch: float = 300,
+                               unit: str = SECONDS_UNIT, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                               dtype: str = None, low_rri: int = 300, high_rri: int = 2000,
+                               ectopic_beats_removal_method: str = KAMATH_RULE,
+                               custom_removing_rule: float = 0.2, pnni_as_percent: bool = True) -> dict:
+    """
+    Cleans a recording chunk by chunk and returns time domain and Poincaré plot features of each
+    of its consecutive epochs, for example every 5 minutes of a 7 days recording, without ever
+    holding the whole recording in memory.
+
+    NN-intervals are the ones of get_nn_intervals with linear interpolation, and features the
+    ones of get_sliding_window_features with step equal to epoch. Only the NN-intervals of the
+    current epoch and one chunk are kept in memory.
+
+    Parameters
+    ----------
+    rr_intervals : str or iterable
+        Path of a file read with read_rr_intervals, or iterable over chunks of RR-intervals.
+    epoch : float
+        Length of each epoch, in beats or in seconds depending on unit.
+    unit : str
+        Unit of epoch, "beats" or "seconds". In seconds, an epoch contains the NN-intervals
+        ending inside it.
+    chunk_size : int
+        Number of RR-intervals read at once from the file.
+    dtype : str
+        dtype of the values of a raw binary file, see read_rr_intervals.
+    low_rri : int
+        lowest RrInterval to be considered plausible.
+    high_rri : int
+        highest RrInterval to be considered plausible.
+    ectopic_beats_removal_method : str
+        method to use to clean outlier. malik, kamath, karlsson, acar or custom.
+    custom_removing_rule : float
+        Percentage criteria used by the custom, karlsson and acar rules.
+    pnni_as_percent: bool
+        whether to remove bias or not to compute pnni features.
+
+    Returns
+    -------
+    epoch_features : dict
+        Dictionary mapping each feature name to an array containing its value for every complete
+        epoch, as returned by get_sliding_window_features. window_start and window_end give the
+        indexes of the NN-intervals of each epoch in the whole recording.
+    """
+    if epoch <= 0:
+        raise ValueError("epoch must be strictly positive")
+    if unit not in [BEATS_UNIT, SECONDS_UNIT]:
+        raise ValueError("Not a valid unit. Choose between 'beats' and 'seconds'")
+    if isinstance(rr_intervals, (str, os.PathLike)):
+        rr_intervals = read_rr_intervals(rr_intervals, chunk_size=chunk_size, dtype=dtype)
+
+    cleaner = HrvChunkCleaner(low_rri=low_rri, high_rri=high_rri,
+                              ectopic_beats_removal_method=ectopic_beats_removal_method,
+                              custom_removing_rule=custom_removing_rule)
+    epoch_splitter = _EpochSplitter(epoch, unit, pnni_as_percent)
+    for rr_intervals_chunk in rr_intervals:
+        epoch_splitter.add_nn_intervals(cleaner.add_rr_intervals(rr_intervals_chunk))
+    epoch_splitter.add_nn_intervals(cleaner.flush())
+    return epoch_splitter.get_epoch_features()
+
+
+class _EpochSplitter:
+    """
+    Accumulates NN-intervals until epochs are complete and computes the features of complete
+    epochs. Epoch boundaries are the ones get_sliding_window_features would find on the whole
+    recording.
+    """
+
+    def __init__(self, epoch: float, unit: str, pnni_as_percent: bool):
+        self.epoch = epoch
+        self.unit = unit
+        self.pnni_as_percent = pnni_as_percent
+        self._nn_intervals = np.empty(0)
+        # Index in the recording and start time, in ms, of the first NN-interval kept
+        self._first_index = 0
+        self._start_time = 0.
+        self._epoch_count = 0
+        self._epoch_features = []
+
+    def add_nn_intervals(self, nn_intervals: np.ndarray):
+        nn_intervals = np.concatenate((self._nn_intervals, nn_intervals))
+        if self.unit == BEATS_UNIT:
+            epoch_count = len(nn_intervals) // int(self.epoch)
+            window_start = np.arange(epoch_count) * int(self.epoch)
+            window_end = window_start + int(self.epoch)
+            next_start = window_end[-1] if epoch_count else 0
+        else:
+            # Time in seconds at the end of each NN-interval, as in get_sliding_window_features
+            nni_end_time = (self._start_time + np.cumsum(nn_intervals)) / 1000
+            duration = nni_end_time[-1] if len(nni_end_time) else 0
+            epoch_count = max(int(np.floor(duration / self.epoch)) - self._epoch_count, 0)
+            window_start_time = (self._epoch_count + np.arange(epoch_count + 1)) * self.epoch
+            window_bounds = np.searchsorted(nni_end_time, window_start_time, side="right")
+            window_start, window_end = window_bounds[:-1], window_bounds[1:]
+            next_start = window_bounds[-1]
+
+        if epoch_count:
+            epoch_features = _get_window_features(nn_intervals, window_start, window_end,
+                                                  self.pnni_as_percent)
+            epoch_features["window_start"] = window_start + self._first_index
+            epoch_features["window_end"] = window_end + self._first_index
+            self._epoch_features.append(epoch_features)
+            self._epoch_count += epoch_count
+        self._start_time += float(np.sum(nn_intervals[:next_start]))
+        self._first_index += next_start
+        self._nn_intervals = nn_intervals[next_start:]
+
+    def get_epoch_features(self) -> dict:
+        if not self._epoch_features:
+            return _get_window_features(np.empty(0), np.empty(0, dtype=int), np.empty(0, dtype=int),
+                                        self.pnni_as_percent)
+        return {feature_name: np.concatenate([epoch_features[feature_name]
+                                              for epoch_features in self._epoch_features])
+                for feature_name in self._epoch_features[0]}
@@ -3,18 +3,23 @@
 """This script provides several methods to extract features from Normal to Normal Intervals
  for heart rate variability analysis."""
 
+import math
+import hashlib
+import threading
+import warnings
 from typing import List, Tuple
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 import numpy as np
-import nolds
-from scipy import interpolate
-from scipy import signal
-from astropy.timeseries import LombScargle
+from hrvanalysis.profiling import profile_stage
+# scipy and astropy are imported by the functions needing them, so that importing the package
+# stays fast
 
 # limit functions that user might import using "from hrv-analysis import *"
 __all__ = ['get_time_domain_features', 'get_frequency_domain_features',
            'get_geometrical_features', 'get_poincare_plot_features',
-           "get_csi_cvi_features", "get_sampen"]
+           "get_csi_cvi_features", "get_sampen", "set_psd_cache_max_bytes", "clear_psd_cache",
+           "get_psd_cache_info", "get_lomb_psd", "resample_nn_intervals", "get_multiscale_entropy",
+           "get_dfa_features", "get_all_features", "get_frequency_bands_features", "FrequencyBand"]
 
 # Frequency Methods name
 WELCH_METHOD = "welch"
@@ -25,6 +30,130 @@ VlfBand = namedtuple("Vlf_band", ["low", "high"])
 LfBand = namedtuple("Lf_band", ["low", "high"])
 HfBand = namedtuple("Hf_band", ["low", "high"])
 
+# Named band of a band bank given to get_frequency_bands_features
+FrequencyBand = namedtuple("Frequency_band", ["name", "low", "high"])
+
+# Default band bank : ultra low, very low, low and high frequency bands of the Task Force
+DEFAULT_FREQUENCY_BANDS = (FrequencyBand("ulf", 0, 0.003), FrequencyBand("vlf", 0.003, 0.04),
+                           FrequencyBand("lf", 0.04, 0.15), FrequencyBand("hf", 0.15, 0.40))
+
+# Feature groups computed by get_all_features
+TIME_DOMAIN_FEATURES = "time_domain"
+GEOMETRICAL_FEATURES = "geometrical"
+FREQUENCY_DOMAIN_FEATURES = "frequency_domain"
+POINCARE_PLOT_FEATURES = "poincare_plot"
+CSI_CVI_FEATURES = "csi_cvi"
+SAMPEN_FEATURES = "sampen"
+MULTISCALE_ENTROPY_FEATURES = "multiscale_entropy"
+DFA_FEATURES = "dfa"
+FEATURE_GROUPS = (TIME_DOMAIN_FEATURES, GEOMETRICAL_FEATURES, FREQUENCY_DOMAIN_FEATURES,
+                  POINCARE_PLOT_FEATURES, CSI_CVI_FEATURES, SAMPEN_FEATURES,
+                  MULTISCALE_ENTROPY_FEATURES, DFA_FEATURES)
+
+# nfft value choosing Welch segment and FFT lengths from the recording
+AUTO_WELCH_NFFT = "auto"
+
+# Number of samples interpolated at once when resampling NN-intervals
+RESAMPLING_CHUNK_SIZE = 2 ** 16
+
+# Default memory bound of the power spectral density cache, in bytes
+DEFAULT_PSD_CACHE_MAX_BYTES = 32 * 1024 ** 2
+
+# Histogram of NN-intervals used by geometrical features : bins of HISTOGRAM_BIN_WIDTH ms starting
+# at HISTOGRAM_MIN_NNI, whose edges are np.arange(HISTOGRAM_MIN_NNI, HISTOGRAM_MAX_NNI, bin_width)
+HISTOGRAM_MIN_NNI = 300
+HISTOGRAM_MAX_NNI = 2000
+HISTOGRAM_BIN_WIDTH = 8
+
+# Histogram methods : integer bin indexes counted with np.bincount, or np.histogram
+BINCOUNT_HISTOGRAM = "bincount"
+NUMPY_HISTOGRAM = "numpy"
+
+# Number of NN-intervals whose bin indexes are computed at once, to bound temporary arrays
+HISTOGRAM_CHUNK_SIZE = 2 ** 14
+
+# Mean number of templates matching a template on their first value above which sample entropy
+# counts matching templates by range counting instead of comparing them one by one
+RANGE_COUNTING_MIN_CANDIDATES = 2048
+
+# ----------------- ALL FEATURES ----------------- #
+
+
+def get_all_features(nn_intervals: List[float], feature_groups: List[str] = FEATURE_GROUPS,
+                     pnni_as_percent: bool = True, frequency_domain_kwargs: dict = None) -> dict:
+    """
+    Returns a dictionary containing the features of the selected feature groups, computing
+    intermediates shared by several groups only once.
+
+    Parameters
+    ---------
+    nn_intervals : list
+        list of Normal to Normal Interval
+    feature_groups : list
+        Feature groups to compute, among "time_domain", "geometrical", "frequency_domain",
+        "poincare_plot", "csi_cvi", "sampen", "multiscale_entropy" and "dfa". By default, all
+        of them.
+    pnni_as_percent: bool
+        whether to remove bias or not to compute pnni features.
+    frequency_domain_kwargs : dict
+        Keyword arguments given to get_frequency_domain_features, such as method or
+        sampling_frequency.
+
+    Returns
+    ---------
+    all_features : dict
+        Dictionary containing the features of every selected group, with the same names and
+        values as the get_*_features function of the group.
+
+    Notes
+    ---------
+    nn_intervals are converted to an array once. Successive differences and standard
+    deviations are computed once for time domain, Poincaré plot and CSI / CVI features, sample
+    entropy is taken from the first scale of the multiscale entropy, and the power spectral
+    density goes through the same cache as get_frequency_domain_features. Intermediates of
+    unselected groups are not computed.
+    """
+    unknown_groups = set(feature_groups) - set(FEATURE_GROUPS)
+    if unknown_groups:
+        raise ValueError("Unknown feature groups {}. Choose among {}".format(
+            sorted(unknown_groups), list(FEATURE_GROUPS)))
+
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    all_features = {}
+
+    if {TIME_DOMAIN_FEATURES, POINCARE_PLOT_FEATURES, CSI_CVI_FEATURES} & set(feature_groups):
+        diff_nni = np.diff(nn_intervals)
+        sdnn = np.std(nn_intervals, ddof=1)
+    if TIME_DOMAIN_FEATURES in feature_groups:
+        all_features.update(_get_time_domain_features(nn_intervals, diff_nni, sdnn,
+                                                      pnni_as_percent))
+    if GEOMETRICAL_FEATURES in feature_groups:
+        all_features.update(get_geometrical_features(nn_intervals))
+    if FREQUENCY_DOMAIN_FEATURES in feature_groups:
+        all_features.update(get_frequency_domain_features(nn_intervals,
+                                                          **(frequency_domain_kwargs or {})))
+    if {POINCARE_PLOT_FEATURES, CSI_CVI_FEATURES} & set(feature_groups):
+        poincare_plot_features = _get_poincare_plot_features(sdnn, np.std(diff_nni, ddof=1))
+        if POINCARE_PLOT_FEATURES in feature_groups:
+            all_features.update(poincare_plot_features)
+        if CSI_CVI_FEATURES in feature_groups:
+            all_features.update(_get_csi_cvi_features(poincare_plot_features["sd1"],
+                                                      poincare_plot_features["sd2"]))
+    if MULTISCALE_ENTROPY_FEATURES in feature_groups:
+        multiscale_entropy = get_multiscale_entropy(nn_intervals)
+    if SAMPEN_FEATURES in feature_groups:
+        # Sample entropy is the first scale of the multiscale entropy
+        all_features.update({'sampen': multiscale_entropy["mse_1"]}
+                            if MULTISCALE_ENTROPY_FEATURES in feature_groups
+                            else get_sampen(nn_intervals))
+    if MULTISCALE_ENTROPY_FEATURES in feature_groups:
+        all_features.update(multiscale_entropy)
+    if DFA_FEATURES in feature_groups:
+        all_features.update(get_dfa_features(nn_intervals))
+
+    return all_features
+
+
 # ----------------- TIME DOMAIN FEATURES ----------------- #
 
 
@@ -96,34 +225,45 @@ def get_time_domain_features(nn_intervals: List[float], pnni_as_percent: bool =
     of Pacing and Electrophysiology, 1996
     """
 
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
     diff_nni = np.diff(nn_intervals)
+    # ddof = 1 : unbiased estimator => divide std by n-1
+    sdnn = np.std(nn_intervals, ddof=1)
+    return _get_time_domain_features(nn_intervals, diff_nni, sdnn, pnni_as_percent)
+
+
+def _get_time_domain_features(nn_intervals: List[float], diff_nni: np.ndarray, sdnn: float,
+                              pnni_as_percent: bool = True) -> dict:
+    """
+    Computes time domain features from NN-intervals, their successive differences and their
+    standard deviation. See get_time_domain_features for details about each feature.
+    """
     length_int = len(nn_intervals) - 1 if pnni_as_percent else len(nn_intervals)
 
     # Basic statistics
     mean_nni = np.mean(nn_intervals)
     median_nni = np.median(nn_intervals)
-    range_nni = max(nn_intervals) - min(nn_intervals)
+    range_nni = np.max(nn_intervals) - np.min(nn_intervals)
 
     sdsd = np.std(diff_nni)
     rmssd = np.sqrt(np.mean(diff_nni ** 2))
 
-    nni_50 = sum(np.abs(diff_nni) > 50)
+    nni_50 = np.count_nonzero(np.abs(diff_nni) > 50)
     pnni_50 = 100 * nni_50 / length_int
-    nni_20 = sum(np.abs(diff_nni) > 20)
+    nni_20 = np.count_nonzero(np.abs(diff_nni) > 20)
     pnni_20 = 100 * nni_20 / length_int
 
     # Feature found on github and not in documentation
     cvsd = rmssd / mean_nni
 
     # Features only for long term recordings
-    sdnn = np.std(nn_intervals, ddof=1)  # ddof = 1 : unbiased estimator => divide std by n-1
     cvnni = sdnn / mean_nni
 
     # Heart Rate equivalent features
     heart_rate_list = np.divide(60000, nn_intervals)
     mean_hr = np.mean(heart_rate_list)
-    min_hr = min(heart_rate_list)
-    max_hr = max(heart_rate_list)
+    min_hr = np.min(heart_rate_list)
+    max_hr = np.max(heart_rate_list)
     std_hr = np.std(heart_rate_list)
 
     time_domain_features = {
@@ -148,7 +288,8 @@ def get_time_domain_features(nn_intervals: List[float], pnni_as_percent: bool =
     return time_domain_features
 
 
-def get_geometrical_features(nn_intervals: List[float]) -> dict:
+def get_geometrical_features(nn_intervals: List[float], bin_width: float = HISTOGRAM_BIN_WIDTH,
+                             histogram_method: str = BINCOUNT_HISTOGRAM) -> dict:
     """
     Returns a dictionary containing geometrical time domain features for HRV analyses.
     Known practise is to use this function on recordings from 20 minutes to 24 Hours window.
@@ -157,6 +298,12 @@ def get_geometrical_features(nn_intervals: List[float]) -> dict:
     ---------
     nn_intervals : list
         list of Normal to Normal Interval.
+    bin_width : float
+        Width of the bins of the NN-intervals histogram, in ms. The Task Force recommends
+        7.8125 ms (1/128 s).
+    histogram_method : str
+        Method used to compute the histogram, "bincount" or "numpy". Both give the same
+        histogram, "bincount" counts integer bin indexes and is faster than np.histogram.
 
     Returns
     ---------
@@ -176,6 +323,12 @@ def get_geometrical_features(nn_intervals: List[float]) -> dict:
      of the distribution measured as a base of a triangle, approximating the NN-interval \
      distribution
 
+    The triangle is 0 outside of [N, M], and linear from N to the top of the histogram and from
+    the top of the histogram to M. N and M are the bin centers minimizing the squared difference
+    between the histogram and the triangle, and TINN is M - N in ms. The squared difference is
+    the sum of a term depending on N only and a term depending on M only, each one computed for
+    every bin at once from cumulative sums of the histogram.
+
     References
     ----------
     .. [1] Heart rate variability - Standards of measurement, physiological interpretation, and \
@@ -183,10 +336,12 @@ def get_geometrical_features(nn_intervals: List[float]) -> dict:
     of Pacing and Electrophysiology, 1996
 
     """
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    histograms = _get_nn_histograms(nn_intervals, bin_width=bin_width,
+                                    histogram_method=histogram_method)
 
-    triang_idx = len(nn_intervals) / max(np.histogram(nn_intervals, bins=range(300, 2000, 8))[0])
-    # TODO
-    tinn = None
+    triang_idx = len(nn_intervals) / max(histograms[0])
+    tinn = _get_tinn(histograms, bin_width)[0]
 
     geometrical_features = {
         "triangular_index": triang_idx,
@@ -196,6 +351,123 @@ def get_geometrical_features(nn_intervals: List[float]) -> dict:
     return geometrical_features
 
 
+def _get_nn_histograms(values: np.ndarray, recording_index: np.ndarray = None,
+                       recording_count: int = 1, bin_width: float = HISTOGRAM_BIN_WIDTH,
+                       histogram_method: str = BINCOUNT_HISTOGRAM) -> np.ndarray:
+    """
+    Computes the NN-intervals histogram of one or many recordings, with the bins of
+    np.histogram(values, bins=np.arange(HISTOGRAM_MIN_NNI, HISTOGRAM_MAX_NNI, bin_width)).
+
+    Parameters
+    ---------
+    values : array
+        NN-intervals of all recordings.
+    recording_index : array
+        index of the recording of each NN-interval. By default, all NN-intervals belong to a
+        single recording.
+    recording_count : int
+        number of recordings.
+    bin_width : float
+        Width of the bins, in ms.
+    histogram_method : str
+        "bincount" to compute bin indexes from the bin width and count them all at once, or
+        "numpy" to call np.histogram on each recording.
+
+    Returns
+    ---------
+    histograms : array
+        array of shape (recording_count, number of bins), histogram of each recording.
+    """
+    bin_edges = np.arange(HISTOGRAM_MIN_NNI, HISTOGRAM_MAX_NNI, bin_width)
+    bin_count = len(bin_edges) - 1
+    if bin_count < 1:
+        raise ValueError("bin_width is too large, the histogram has no bin")
+
+    if histogram_method == NUMPY_HISTOGRAM:
+        if recording_index is None:
+            return np.histogram(values, bins=bin_edges)[0][np.newaxis]
+        return np.array([np.histogram(values[recording_index == index], bins=bin_edges)[0]
+                         for index in range(recording_count)], dtype=int).reshape(recording_count,
+                                                                                 bin_count)
+    if histogram_method != BINCOUNT_HISTOGRAM:
+        raise ValueError("Not a valid histogram method. Choose between 'bincount' and 'numpy'")
+
+    histograms = np.zeros(recording_count * bin_count, dtype=int)
+    for start in range(0, len(values), HISTOGRAM_CHUNK_SIZE):
+        chunk_values = values[start:start + HISTOGRAM_CHUNK_SIZE]
+        in_range = (chunk_values >= bin_edges[0]) & (chunk_values <= bin_edges[-1])
+        chunk_values = chunk_values[in_range]
+        bin_index = np.floor((chunk_values - bin_edges[0]) / bin_width).astype(int)
+        # Rounding of the division may put values next to an edge in the neighbouring bin
+        np.clip(bin_index, 0, bin_count - 1, out=bin_index)
+        bin_index -= chunk_values < bin_edges[bin_index]
+        bin_index += (chunk_values >= bin_edges[bin_index + 1]) & (bin_index < bin_count - 1)
+        if recording_index is not None:
+            bin_index += recording_index[start:start + HISTOGRAM_CHUNK_SIZE][in_range] * bin_count
+        histograms += np.bincount(bin_index, minlength=recording_count * bin_count)
+    return histograms.reshape(recording_count, bin_count)
+
+
+def _get_tinn(histograms: np.ndarray, bin_width: float = HISTOGRAM_BIN_WIDTH) -> np.ndarray:
+    """
+    Computes the TINN of each histogram with least squares fits of both sides of the triangle,
+    see get_geometrical_features.
+
+    For a left vertex N at L = X - N bins from the top X of height Y, the squared difference
+    between the histogram D and the triangle is, up to a term not depending on N :
+    - 2 * Y / L * sum((t - N) * D[t] for N <= t <= X) + Y ** 2 * (L + 1) * (2 * L + 1) / (6 * L)
+    where the sum is given by cumulative sums of D and t * D. The right vertex is symmetric.
+
+    Parameters
+    ---------
+    histograms : array
+        array of shape (number of recordings, number of bins).
+    bin_width : float
+        Width of the bins, in ms.
+
+    Returns
+    ---------
+    tinn : array
+        TINN of each histogram in ms, nan for empty histograms.
+    """
+    histograms = np.asarray(histograms, dtype=float)
+    recording_count, bin_count = histograms.shape
+    rows = np.arange(recording_count)[:, np.newaxis]
+    bins = np.arange(bin_count)
+    top_bin = np.argmax(histograms, axis=1)[:, np.newaxis]
+    top_height = histograms[rows, top_bin]
+
+    cumulative_count = np.concatenate((np.zeros((recording_count, 1)),
+                                       np.cumsum(histograms, axis=1)), axis=1)
+    cumulative_moment = np.concatenate((np.zeros((recording_count, 1)),
+                                        np.cumsum(histograms * bins, axis=1)), axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Left vertex N, on bins before the top
+        distance = (top_bin - bins).astype(float)
+        count = cumulative_count[rows, top_bin + 1] - cumulative_count[:, :-1]
+        moment = cumulative_moment[rows, top_bin + 1] - cumulative_moment[:, :-1]
+        left_error = (-2 * top_height / distance * (moment - bins * count)
+                      + top_height ** 2 * (distance + 1) * (2 * distance + 1) / (6 * distance))
+        left_error[distance <= 0] = np.inf
+
+        # Right vertex M, on bins after the top
+        distance = (bins - top_bin).astype(float)
+        count = cumulative_count[:, 1:] - cumulative_count[rows, top_bin]
+        moment = cumulative_moment[:, 1:] - cumulative_moment[rows, top_bin]
+        right_error = (-2 * top_height / distance * (bins * count - moment)
+                       + top_height ** 2 * (distance + 1) * (2 * distance + 1) / (6 * distance))
+        right_error[distance <= 0] = np.inf
+
+    # Without any bin on one side, the vertex is the top itself
+    top_bin = top_bin[:, 0]
+    left_vertex = np.where(top_bin > 0, np.argmin(left_error, axis=1), top_bin)
+    right_vertex = np.where(top_bin < bin_count - 1, np.argmin(right_error, axis=1), top_bin)
+    tinn = (right_vertex - left_vertex) * float(bin_width)
+    tinn[top_height[:, 0] == 0] = np.nan
+    return tinn
+
+
 # ----------------- FREQUENCY DOMAIN FEATURES ----------------- #
 
 
@@ -203,7 +475,10 @@ def get_frequency_domain_features(nn_intervals: List[float], method: str = WELCH
                                   sampling_frequency: int = 4, interpolation_method: str = "linear",
                                   vlf_band: namedtuple = VlfBand(0.003, 0.04),
                                   lf_band: namedtuple = LfBand(0.04, 0.15),
-                                  hf_band: namedtuple = HfBand(0.15, 0.40)) -> dict:
+                                  hf_band: namedtuple = HfBand(0.15, 0.40),
+                                  lomb_frequencies: List[float] = None, nperseg: int = None,
+                                  noverlap: int = None, nfft=4096, window="hann",
+                                  detrend="constant") -> dict:
     """
     Returns a dictionary containing frequency domain features for HRV analyses.
     To our knowledge, you might use this function on short term recordings, from 2 to 5 minutes  \
@@ -227,6 +502,25 @@ def get_frequency_domain_features(nn_intervals: List[float], method: str = WELCH
         Low frequency bands for features extraction from power spectral density.
     hf_band : tuple
         High frequency bands for features extraction from power spectral density.
+    lomb_frequencies : array
+        Regular frequency grid on which the Lomb periodogram is evaluated with the fast
+        Press & Rybicki method, see get_lomb_psd. By default, the grid is chosen by astropy
+        depending on the recording. Only used if Lomb method is used.
+    nperseg : int
+        Length of each Welch segment, in samples. By default, 256 samples. Only used if Welch
+        method is used.
+    noverlap : int
+        Number of samples shared by two consecutive Welch segments. By default, half of a
+        segment. Only used if Welch method is used.
+    nfft : int or str
+        Length of the FFT of each Welch segment, by default 4096. If "auto", nfft and, unless
+        given, nperseg are chosen as powers of two, see Notes. Only used if Welch method is used.
+    window : str, tuple or array
+        Window applied to each Welch segment, as accepted by scipy.signal.welch, by default
+        "hann". Only used if Welch method is used.
+    detrend : str, function or False
+        Detrending applied to each Welch segment, as accepted by scipy.signal.welch, by default
+        "constant". Only used if Welch method is used.
 
     Returns
     ---------
@@ -261,6 +555,11 @@ def get_frequency_domain_features(nn_intervals: List[float], method: str = WELCH
 
     - **hfnu** : normalized hf power.
 
+    With nfft set to "auto", Welch segments are the shortest power of two length resolving the
+    lower bound of the VLF band, bounded by the length of the resampled signal, and nfft is the
+    smallest power of two greater or equal to the segment length. The cost of each FFT then
+    does not depend on the recording length, and the number of FFTs grows linearly with it.
+
     References
     ----------
     .. [1] Heart rate variability - Standards of measurement, physiological interpretation, and \
@@ -271,30 +570,152 @@ def get_frequency_domain_features(nn_intervals: List[float], method: str = WELCH
 
     """
 
-    # ----------  Handle pandas series  ---------- #
+    # ----------  Handle pandas series and float32 arrays  ---------- #
 
-    nn_intervals = list(nn_intervals)
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
 
     # ----------  Compute frequency & Power spectral density of signal  ---------- #
     freq, psd = _get_freq_psd_from_nn_intervals(nn_intervals=nn_intervals, method=method,
                                                 sampling_frequency=sampling_frequency,
                                                 interpolation_method=interpolation_method,
-                                                vlf_band=vlf_band, hf_band=hf_band)
+                                                vlf_band=vlf_band, hf_band=hf_band,
+                                                lomb_frequencies=lomb_frequencies,
+                                                nperseg=nperseg, noverlap=noverlap, nfft=nfft,
+                                                window=window, detrend=detrend)
 
     # ---------- Features calculation ---------- #
-    frequency_domain_features = _get_features_from_psd(freq=freq, psd=psd,
-                                                      vlf_band=vlf_band,
-                                                      lf_band=lf_band,
-                                                      hf_band=hf_band)
+    with profile_stage("frequency_domain.band_integration", len(freq)):
+        frequency_domain_features = _get_features_from_psd(freq=freq, psd=psd,
+                                                          vlf_band=vlf_band,
+                                                          lf_band=lf_band,
+                                                          hf_band=hf_band)
 
     return frequency_domain_features
 
 
+def get_frequency_bands_features(nn_intervals: List[float],
+                                 bands: List[FrequencyBand] = DEFAULT_FREQUENCY_BANDS,
+                                 method: str = WELCH_METHOD, sampling_frequency: int = 4,
+                                 interpolation_method: str = "linear",
+                                 lomb_frequencies: List[float] = None, nperseg: int = None,
+                                 noverlap: int = None, nfft=4096, window="hann",
+                                 detrend="constant") -> dict:
+    """
+    Returns a dictionary containing the power, peak frequency and relative power of each band
+    of a band bank, computed from a single power spectral density.
+
+    Parameters
+    ---------
+    nn_intervals : list
+        list of Normal to Normal Interval
+    bands : list
+        list of FrequencyBand, or of (name, low, high) tuples, in Hz. Bands may overlap, for
+        example research sub-bands inside the LF band. By default, ULF, VLF, LF and HF bands.
+    method : str
+        Method used to calculate the psd. Choice are Welch's FFT or Lomb method.
+    sampling_frequency : int
+        Frequency at which the signal is sampled, by default set to 4 Hz. No need to specify
+        if Lomb method is used.
+    interpolation_method : str
+        kind of interpolation as a string, by default "linear". No need to specify if Lomb
+        method is used.
+    lomb_frequencies : array
+        Regular frequency grid on which the Lomb periodogram is evaluated. By default, the grid
+        is chosen by astropy between the lowest and the highest band bounds. Only used if Lomb
+        method is used.
+    nperseg : int
+        Length of each Welch segment, in samples. Only used if Welch method is used.
+    noverlap : int
+        Number of samples shared by two consecutive Welch segments. Only used if Welch method
+        is used.
+    nfft : int or str
+        Length of the FFT of each Welch segment, by default 4096, or "auto", see
+        get_frequency_domain_features. Only used if Welch method is used.
+    window : str, tuple or array
+        Window applied to each Welch segment. Only used if Welch method is used.
+    detrend : str, function or False
+        Detrending applied to each Welch segment. Only used if Welch method is used.
+
+    Returns
+    ---------
+    frequency_bands_features : dict
+        Dictionary containing, for each band name :
+
+        - **<name>** : power in the band, integrated with the trapezoidal rule over the
+          frequencies in [low, high), as for get_frequency_domain_features.
+
+        - **<name>_peak** : frequency of the highest power spectral density in the band, nan if
+          the band contains no frequency.
+
+        - **<name>_relative** : power in the band divided by total_power.
+
+        and **total_power**, the power between the lowest and the highest band bounds.
+
+    Notes
+    ---------
+    The power spectral density is integrated once with a cumulative trapezoidal sum, and the
+    bounds of all bands are found at once in the frequency array with np.searchsorted, so that
+    each band costs two lookups whatever its width. The power spectral density is shared with
+    get_frequency_domain_features through the cache.
+
+    Examples
+    --------
+    >>> bands = [FrequencyBand("lf1", 0.04, 0.09), FrequencyBand("lf2", 0.09, 0.15),
+    ...          FrequencyBand("hf", 0.15, 0.40)]
+    >>> get_frequency_bands_features(nn_intervals, bands=bands)["lf2_relative"]
+    """
+    bands = [FrequencyBand(*band) for band in bands]
+    if not bands:
+        raise ValueError("bands must contain at least one band")
+    names = [band.name for band in bands]
+    if len(set(names)) != len(names):
+        raise ValueError("Band names must be unique")
+    lows = np.array([band.low for band in bands], dtype=float)
+    highs = np.array([band.high for band in bands], dtype=float)
+    if np.any(lows >= highs):
+        raise ValueError("Lower bound of each band must be lower than its higher bound")
+
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    # Bounds of the whole bank set the Lomb frequency grid and the Welch "auto" segments. The
+    # Lomb periodogram is not defined at 0 Hz, so the grid starts at the lowest positive bound.
+    positive_lows = lows[lows > 0]
+    lowest_frequency = positive_lows.min() if len(positive_lows) else highs.min()
+    freq, psd = _get_freq_psd_from_nn_intervals(nn_intervals=nn_intervals, method=method,
+                                                sampling_frequency=sampling_frequency,
+                                                interpolation_method=interpolation_method,
+                                                vlf_band=VlfBand(lowest_frequency, highs.max()),
+                                                hf_band=HfBand(lowest_frequency, highs.max()),
+                                                lomb_frequencies=lomb_frequencies,
+                                                nperseg=nperseg, noverlap=noverlap, nfft=nfft,
+                                                window=window, detrend=detrend)
+
+    with profile_stage("frequency_domain.band_integration", len(freq)):
+        powers, start_indexes, end_indexes = _get_band_powers(
+            freq, psd, np.append(lows, lows.min()), np.append(highs, highs.max()))
+        total_power = powers[-1]
+
+        frequency_bands_features = {}
+        for index, name in enumerate(names):
+            start_index, end_index = start_indexes[index], end_indexes[index]
+            peak = freq[start_index + np.argmax(psd[start_index:end_index])] \
+                if end_index > start_index else np.nan
+            frequency_bands_features[name] = powers[index]
+            frequency_bands_features[name + "_peak"] = peak
+            with np.errstate(divide="ignore", invalid="ignore"):
+                frequency_bands_features[name + "_relative"] = powers[index] / total_power
+        frequency_bands_features["total_power"] = total_power
+
+    return frequency_bands_features
+
+
 def _get_freq_psd_from_nn_intervals(nn_intervals: List[float], method: str = WELCH_METHOD,
                                     sampling_frequency: int = 4,
                                     interpolation_method: str = "linear",
                                     vlf_band: namedtuple = VlfBand(0.003, 0.04),
-                                    hf_band: namedtuple = HfBand(0.15, 0.40)) -> Tuple:
+                                    hf_band: namedtuple = HfBand(0.15, 0.40),
+                                    lomb_frequencies: List[float] = None, nperseg: int = None,
+                                    noverlap: int = None, nfft=4096, window="hann",
+                                    detrend="constant") -> Tuple:
     """
     Returns the frequency and power of the signal.
 
@@ -314,6 +735,21 @@ def _get_freq_psd_from_nn_intervals(nn_intervals: List[float], method: str = WEL
         Very low frequency bands for features extraction from power spectral density.
     hf_band : tuple
         High frequency bands for features extraction from power spectral density.
+    lomb_frequencies : array
+        Regular frequency grid on which the Lomb periodogram is evaluated. By default, the grid
+        is chosen by astropy. Only used if Lomb method is used.
+    nperseg : int
+        Length of each Welch segment, in samples. Only used if Welch method is used.
+    noverlap : int
+        Number of samples shared by two consecutive Welch segments. Only used if Welch method
+        is used.
+    nfft : int or str
+        Length of the FFT of each Welch segment, or "auto" to choose it from the recording
+        length and the VLF band. Only used if Welch method is used.
+    window : str, tuple or array
+        Window applied to each Welch segment. Only used if Welch method is used.
+    detrend : str, function or False
+        Detrending applied to each Welch segment. Only used if Welch method is used.
 
     Returns
     ---------
@@ -321,34 +757,400 @@ def _get_freq_psd_from_nn_intervals(nn_intervals: List[float], method: str = WEL
         Frequency of the corresponding psd points.
     psd : list
         Power Spectral Density of the signal.
-    """
-
-    timestamp_list = _create_timestamp_list(nn_intervals)
 
+    Notes
+    ---------
+    Results are memoized in a LRU cache keyed on the content of nn_intervals and on the
+    parameters the power spectral density depends on. Computing features on other frequency
+    bands or plotting an already computed power spectral density then only costs an
+    integration. Returned arrays are read-only since they are shared with the cache.
+    """
+    psd_parameters = {"method": method, "sampling_frequency": sampling_frequency,
+                      "interpolation_method": interpolation_method}
+    if method == LOMB_METHOD and lomb_frequencies is not None:
+        lomb_frequencies = np.asarray(lomb_frequencies, dtype=float)
+        psd_parameters.update(lomb_frequencies=(lomb_frequencies[0], lomb_frequencies[-1],
+                                                len(lomb_frequencies)))
+    elif method == LOMB_METHOD:
+        # Lomb frequency grid depends on bands, welch one does not
+        psd_parameters.update(minimum_frequency=vlf_band[0], maximum_frequency=hf_band[1])
+    else:
+        psd_parameters.update(nperseg=nperseg, noverlap=noverlap, nfft=nfft, detrend=detrend,
+                              window=window if isinstance(window, (str, tuple))
+                              else tuple(np.asarray(window).tolist()))
+        if nfft == AUTO_WELCH_NFFT:
+            # Automatic segment length depends on the VLF band
+            psd_parameters.update(minimum_frequency=vlf_band[0])
+
+    cache_key = _PSD_CACHE.get_key(nn_intervals, psd_parameters)
+    freq_psd = _PSD_CACHE.get(cache_key)
+    if freq_psd is None:
+        freq_psd = _compute_freq_psd_from_nn_intervals(nn_intervals=nn_intervals, method=method,
+                                                       sampling_frequency=sampling_frequency,
+                                                       interpolation_method=interpolation_method,
+                                                       vlf_band=vlf_band, hf_band=hf_band,
+                                                       lomb_frequencies=lomb_frequencies,
+                                                       nperseg=nperseg, noverlap=noverlap,
+                                                       nfft=nfft, window=window, detrend=detrend)
+        freq_psd = _PSD_CACHE.put(cache_key, freq_psd)
+    return freq_psd
+
+
+def _compute_freq_psd_from_nn_intervals(nn_intervals: List[float], method: str = WELCH_METHOD,
+                                        sampling_frequency: int = 4,
+                                        interpolation_method: str = "linear",
+                                        vlf_band: namedtuple = VlfBand(0.003, 0.04),
+                                        hf_band: namedtuple = HfBand(0.15, 0.40),
+                                        lomb_frequencies: List[float] = None, nperseg: int = None,
+                                        noverlap: int = None, nfft=4096, window="hann",
+                                        detrend="constant") -> Tuple:
+    """
+    Computes the frequency and power of the signal, without cache. See
+    _get_freq_psd_from_nn_intervals for details about parameters.
+    """
     if method == WELCH_METHOD:
         # ---------- Interpolation of signal ---------- #
-        funct = interpolate.interp1d(x=timestamp_list, y=nn_intervals, kind=interpolation_method)
+        with profile_stage("frequency_domain.interpolation", len(nn_intervals)):
+            nni_normalized = resample_nn_intervals(nn_intervals, sampling_frequency=sampling_frequency,
+                                                   interpolation_method=interpolation_method)
 
-        timestamps_interpolation = _create_interpolated_timestamp_list(nn_intervals, sampling_frequency)
-        nni_interpolation = funct(timestamps_interpolation)
-
-        # ---------- Remove DC Component ---------- #
-        nni_normalized = nni_interpolation - np.mean(nni_interpolation)
+            # ---------- Remove DC Component ---------- #
+            nni_normalized -= np.mean(nni_normalized)
 
         #  --------- Compute Power Spectral Density  --------- #
-        freq, psd = signal.welch(x=nni_normalized, fs=sampling_frequency, window='hann',
-                                 nfft=4096)
+        if nfft == AUTO_WELCH_NFFT:
+            nperseg, nfft = _get_auto_welch_sizes(len(nni_normalized), sampling_frequency,
+                                                  vlf_band, nperseg)
+        from scipy import signal
+        with profile_stage("frequency_domain.welch", len(nni_normalized)):
+            freq, psd = signal.welch(x=nni_normalized, fs=sampling_frequency, window=window,
+                                     nperseg=nperseg, noverlap=noverlap, nfft=nfft, detrend=detrend)
+
+    elif method == LOMB_METHOD and lomb_frequencies is not None:
+        freq = np.asarray(lomb_frequencies, dtype=float)
+        with profile_stage("frequency_domain.lomb", len(nn_intervals)):
+            psd = get_lomb_psd(nn_intervals, freq)
 
     elif method == LOMB_METHOD:
-        freq, psd = LombScargle(timestamp_list, nn_intervals,
-                                normalization='psd').autopower(minimum_frequency=vlf_band[0],
-                                                               maximum_frequency=hf_band[1])
+        from astropy.timeseries import LombScargle
+        with profile_stage("frequency_domain.timestamps", len(nn_intervals)):
+            timestamp_list = _create_timestamp_list(nn_intervals)
+        with profile_stage("frequency_domain.lomb", len(nn_intervals)):
+            freq, psd = LombScargle(timestamp_list, nn_intervals,
+                                    normalization='psd').autopower(minimum_frequency=vlf_band[0],
+                                                                   maximum_frequency=hf_band[1])
     else:
         raise ValueError("Not a valid method. Choose between 'lomb' and 'welch'")
 
     return freq, psd
 
 
+def _get_auto_welch_sizes(sample_count: int, sampling_frequency: float, vlf_band: namedtuple,
+                          nperseg: int = None) -> Tuple[int, int]:
+    """
+    Returns Welch segment length and FFT length chosen as powers of two. Segments are long
+    enough for their frequency resolution to reach the lower bound of the VLF band, without
+    exceeding the signal length. nperseg is kept if given.
+    """
+    if nperseg is None:
+        signal_nperseg = 2 ** int(math.floor(math.log2(max(sample_count, 1))))
+        if vlf_band[0] > 0:
+            vlf_nperseg = 2 ** int(math.ceil(math.log2(sampling_frequency / vlf_band[0])))
+            nperseg = min(vlf_nperseg, signal_nperseg)
+        else:
+            nperseg = signal_nperseg
+    nfft = 2 ** int(math.ceil(math.log2(nperseg)))
+    return nperseg, nfft
+
+
+def get_lomb_psd(nn_intervals: List[float], lomb_frequencies: List[float],
+                 oversampling: int = 5, extirpolation_points: int = 4) -> np.ndarray:
+    """
+    Returns the Lomb periodogram of one or many recordings on a common regular frequency grid,
+    so that spectra of different recordings line up bin for bin.
+
+    The periodogram is computed with the O(N log N) method of Press & Rybicki : weighted values
+    are extirpolated on a regular time grid whose FFT gives the trigonometric sums needed at
+    every frequency. All recordings are extirpolated together and transformed with a single
+    batched FFT. It is the same floating mean, psd normalized periodogram as astropy
+    LombScargle with method "fast".
+
+    Parameters
+    ---------
+    nn_intervals : list
+        list of Normal to Normal Interval, or list of recordings.
+    lomb_frequencies : array
+        Regular frequency grid, in Hz, for example np.linspace(0.003, 0.4, 512). The periodogram
+        is not defined at 0 Hz, so frequencies must be strictly positive.
+    oversampling : int
+        Number of time grid points across the highest frequency sinusoid. Trade-off between
+        accuracy and speed.
+    extirpolation_points : int
+        Number of adjacent time grid points on which each value is extirpolated.
+
+    Returns
+    ---------
+    psd : array
+        Power Spectral Density on lomb_frequencies. Array of shape (number of recordings,
+        number of frequencies) if a list of recordings is given.
+
+    References
+    ----------
+    .. [3] Press W.H. and Rybicki G.B, Fast algorithm for spectral analysis of unevenly sampled \
+    data, ApJ 338, p277, 1989
+    """
+    lomb_frequencies = np.asarray(lomb_frequencies, dtype=float)
+    frequency_step = (lomb_frequencies[-1] - lomb_frequencies[0]) / (len(lomb_frequencies) - 1) \
+        if len(lomb_frequencies) > 1 else 0.
+    if frequency_step <= 0 or lomb_frequencies[0] <= 0 or \
+            not np.allclose(np.diff(lomb_frequencies), frequency_step):
+        raise ValueError("lomb_frequencies must be a positive and regular increasing frequency grid")
+
+    is_single_recording = np.ndim(nn_intervals[0]) == 0 if len(nn_intervals) else True
+    recordings = [nn_intervals] if is_single_recording else nn_intervals
+
+    # Flatten recordings and compute timestamps and weights of each one
+    recordings = [np.asarray(recording, dtype=float) for recording in recordings]
+    lengths = np.array([len(recording) for recording in recordings])
+    recording_index = np.repeat(np.arange(len(recordings)), lengths)
+    timestamps = np.concatenate([_create_timestamp_list(recording) for recording in recordings])
+    values = np.concatenate(recordings)
+    weights = 1 / lengths[recording_index]
+    values = values - np.bincount(recording_index, weights=weights * values)[recording_index]
+
+    trig_sum_parameters = dict(timestamps=timestamps, recording_index=recording_index,
+                               recording_count=len(recordings), f0=lomb_frequencies[0],
+                               df=frequency_step, frequency_count=len(lomb_frequencies),
+                               oversampling=oversampling, extirpolation_points=extirpolation_points)
+    (sin_y, cos_y), (sin_1, cos_1) = _get_batch_trig_sums(weights=[weights * values, weights],
+                                                          **trig_sum_parameters)
+    (sin_2, cos_2), = _get_batch_trig_sums(weights=[weights], frequency_factor=2, **trig_sum_parameters)
+
+    # Time shift tau at each frequency, from trigonometric identities
+    tan_2omega_tau = (sin_2 - 2 * sin_1 * cos_1) / (cos_2 - (cos_1 * cos_1 - sin_1 * sin_1))
+    sin_2omega_tau = tan_2omega_tau / np.sqrt(1 + tan_2omega_tau ** 2)
+    cos_2omega_tau = 1 / np.sqrt(1 + tan_2omega_tau ** 2)
+    cos_omega_tau = np.sqrt(0.5) * np.sqrt(1 + cos_2omega_tau)
+    sin_omega_tau = np.sqrt(0.5) * np.sign(sin_2omega_tau) * np.sqrt(1 - cos_2omega_tau)
+
+    # Floating mean periodogram following Zechmeister & Kurster
+    yc = cos_y * cos_omega_tau + sin_y * sin_omega_tau
+    ys = sin_y * cos_omega_tau - cos_y * sin_omega_tau
+    cc = 0.5 * (1 + cos_2 * cos_2omega_tau + sin_2 * sin_2omega_tau) - \
+        (cos_1 * cos_omega_tau + sin_1 * sin_omega_tau) ** 2
+    ss = 0.5 * (1 - cos_2 * cos_2omega_tau - sin_2 * sin_2omega_tau) - \
+        (sin_1 * cos_omega_tau - cos_1 * sin_omega_tau) ** 2
+    psd = (yc * yc / cc + ys * ys / ss) * 0.5 * lengths[:, np.newaxis]
+
+    return psd[0] if is_single_recording else psd
+
+
+def _get_batch_trig_sums(timestamps: np.ndarray, weights: List[np.ndarray], recording_index: np.ndarray,
+                         recording_count: int, f0: float, df: float, frequency_count: int,
+                         frequency_factor: int = 1, oversampling: int = 5,
+                         extirpolation_points: int = 4) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Computes, for every recording and every weights array, the sums of weights * sin(2 pi f t)
+    and weights * cos(2 pi f t) on the frequency grid f = frequency_factor * (f0 + df * k), with
+    Press & Rybicki's Lagrangian extirpolation and a single batched FFT.
+    """
+    df *= frequency_factor
+    f0 *= frequency_factor
+    # Size of the FFT is the power of two above the oversampled number of frequencies
+    fft_size = 1 << int(frequency_count * oversampling - 1).bit_length()
+    time_grid_position = (timestamps * fft_size * df) % fft_size
+
+    # Lagrangian extirpolation coefficients on the extirpolation_points nearest points of the
+    # time grid. Points falling exactly on the grid only get a coefficient on it.
+    lowest_point = np.clip((time_grid_position - extirpolation_points // 2).astype(int), 0,
+                           fft_size - extirpolation_points)
+    grid_points = lowest_point + np.arange(extirpolation_points)[:, np.newaxis]
+    distances = time_grid_position - grid_points
+    is_on_grid = np.any(distances == 0, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coefficients = np.prod(distances, axis=0) / distances
+    for j in range(extirpolation_points):
+        other_points = np.arange(extirpolation_points) != j
+        coefficients[j] /= np.prod(j - np.arange(extirpolation_points)[other_points])
+    coefficients[:, is_on_grid] = distances[:, is_on_grid] == 0
+    grid_index = (grid_points + recording_index * fft_size).ravel()
+
+    shift = np.exp(2j * np.pi * f0 * timestamps) if f0 > 0 else 1.
+    trig_sums = []
+    for weights_array in weights:
+        contributions = (coefficients * (weights_array * shift)).ravel()
+        time_grid = np.bincount(grid_index, weights=np.real(contributions),
+                                minlength=recording_count * fft_size) + \
+            1j * np.bincount(grid_index, weights=np.imag(contributions),
+                             minlength=recording_count * fft_size)
+        fft_grid = np.fft.ifft(time_grid.reshape(recording_count, fft_size), axis=1)[:, :frequency_count]
+        trig_sums.append((fft_size * fft_grid.imag, fft_size * fft_grid.real))
+    return trig_sums
+
+
+class _PsdCache:
+    """
+    Thread-safe LRU cache of (freq, psd) arrays, bounded by the memory used by the arrays.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_PSD_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(nn_intervals: List[float], psd_parameters: dict) -> tuple:
+        nn_intervals = np.ascontiguousarray(nn_intervals, dtype=float)
+        digest = hashlib.blake2b(nn_intervals.view(np.uint8), digest_size=16).hexdigest()
+        return (digest, len(nn_intervals)) + tuple(sorted(psd_parameters.items()))
+
+    def get(self, key: tuple):
+        with self._lock:
+            freq_psd = self._entries.get(key)
+            if freq_psd is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return freq_psd
+
+    def put(self, key: tuple, freq_psd: tuple) -> tuple:
+        """
+        Stores read-only copies of the arrays, as they may belong to the caller, such as a
+        given Lomb frequency grid. Returns the stored entry, or freq_psd if it is too large.
+        """
+        entry_bytes = sum(np.asarray(array).nbytes for array in freq_psd)
+        if entry_bytes > self.max_bytes:
+            return freq_psd
+        freq_psd = tuple(np.array(array) for array in freq_psd)
+        for array in freq_psd:
+            array.flags.writeable = False
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = freq_psd
+            self.current_bytes += entry_bytes
+            self._evict()
+        return freq_psd
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes:
+            _, freq_psd = self._entries.popitem(last=False)
+            self.current_bytes -= sum(np.asarray(array).nbytes for array in freq_psd)
+
+
+_PSD_CACHE = _PsdCache()
+
+
+def set_psd_cache_max_bytes(max_bytes: int):
+    """
+    Sets the memory bound of the power spectral density cache. Least recently used power
+    spectral densities are evicted first.
+
+    Parameters
+    ---------
+    max_bytes : int
+        Maximum memory used by cached power spectral densities, in bytes. 0 disables the cache.
+    """
+    with _PSD_CACHE._lock:
+        _PSD_CACHE.max_bytes = max_bytes
+        _PSD_CACHE._evict()
+
+
+def clear_psd_cache():
+    """
+    Removes every power spectral density from the cache and resets its statistics.
+    """
+    _PSD_CACHE.clear()
+
+
+def get_psd_cache_info() -> dict:
+    """
+    Returns statistics about the power spectral density cache.
+
+    Returns
+    ---------
+    psd_cache_info : dict
+        Dictionary containing hits, misses, entries, current_bytes and max_bytes of the cache.
+    """
+    with _PSD_CACHE._lock:
+        return {
+            "hits": _PSD_CACHE.hits,
+            "misses": _PSD_CACHE.misses,
+            "entries": len(_PSD_CACHE._entries),
+            "current_bytes": _PSD_CACHE.current_bytes,
+            "max_bytes": _PSD_CACHE.max_bytes
+        }
+
+
+def resample_nn_intervals(nn_intervals: List[float], sampling_frequency: int = 4,
+                          interpolation_method: str = "linear", out: np.ndarray = None) -> np.ndarray:
+    """
+    Resamples NN-intervals on a regular time grid, as done before computing the Welch power
+    spectral density.
+
+    The signal is evaluated chunk by chunk directly in the output buffer, so that the only
+    array as long as the output is the output itself. Linear interpolation uses np.interp ;
+    quadratic and cubic interpolation build the spline once, which is then evaluated on each
+    chunk. Other kinds of interpolation fall back to scipy interp1d.
+
+    Parameters
+    ---------
+    nn_intervals : list
+        list of Normal to Normal Interval
+    sampling_frequency : int
+        Frequency at which the signal is sampled.
+    interpolation_method : str
+        kind of interpolation as a string, by default "linear". Same kinds as scipy interp1d.
+    out : array
+        Buffer in which resampled values are written, for example to reuse it over many
+        recordings. It must be at least as long as the resampled signal.
+
+    Returns
+    ---------
+    nni_interpolation : array
+        Resampled NN-intervals at timestamps given by _create_interpolated_timestamp_list. View
+        on out if given.
+    """
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    timestamp_list = _create_timestamp_list(nn_intervals)
+    sampling_period = 1 / float(sampling_frequency)
+    # Same number of samples as np.arange(0, timestamp_list[-1], sampling_period)
+    sample_count = max(int(np.ceil(timestamp_list[-1] / sampling_period)), 0)
+
+    if out is None:
+        out = np.empty(sample_count)
+    elif len(out) < sample_count:
+        raise ValueError("out buffer is too small, {} samples are needed".format(sample_count))
+    nni_interpolation = out[:sample_count]
+
+    if interpolation_method in ["linear", "slinear"]:
+        def funct(timestamps):
+            return np.interp(timestamps, timestamp_list, nn_intervals)
+    elif interpolation_method in ["quadratic", "cubic"]:
+        from scipy import interpolate
+        funct = interpolate.make_interp_spline(timestamp_list, nn_intervals,
+                                               k=2 if interpolation_method == "quadratic" else 3)
+    else:
+        from scipy import interpolate
+        funct = interpolate.interp1d(x=timestamp_list, y=nn_intervals, kind=interpolation_method)
+
+    for start in range(0, sample_count, RESAMPLING_CHUNK_SIZE):
+        end = min(start + RESAMPLING_CHUNK_SIZE, sample_count)
+        nni_interpolation[start:end] = funct(np.arange(start, end, dtype=float) * sampling_period)
+    return nni_interpolation
+
+
 def _create_timestamp_list(nn_intervals: List[float]) -> List[float]:
     """
     Creates corresponding time interval for all nn_intervals
@@ -418,17 +1220,11 @@ def _get_features_from_psd(freq: List[float], psd: List[float], vlf_band: namedt
         about each features given below.
     """
 
-    # Calcul of indices between desired frequency bands
-    vlf_indexes = np.logical_and(freq >= vlf_band[0], freq < vlf_band[1])
-    lf_indexes = np.logical_and(freq >= lf_band[0], freq < lf_band[1])
-    hf_indexes = np.logical_and(freq >= hf_band[0], freq < hf_band[1])
-
     # Integrate using the composite trapezoidal rule
-    lf = np.trapz(y=psd[lf_indexes], x=freq[lf_indexes])
-    hf = np.trapz(y=psd[hf_indexes], x=freq[hf_indexes])
+    vlf, lf, hf = _get_band_powers(freq, psd, np.array([vlf_band[0], lf_band[0], hf_band[0]]),
+                                   np.array([vlf_band[1], lf_band[1], hf_band[1]]))[0]
 
     # total power & vlf : Feature often used for  "long term recordings" analysis
-    vlf = np.trapz(y=psd[vlf_indexes], x=freq[vlf_indexes])
     total_power = vlf + lf + hf
 
     lf_hf_ratio = lf / hf
@@ -448,6 +1244,55 @@ def _get_features_from_psd(freq: List[float], psd: List[float], vlf_band: namedt
     return freqency_domain_features
 
 
+def _get_band_powers(freq: np.ndarray, psd: np.ndarray, lows: np.ndarray,
+                     highs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Integrates the power spectral density over many bands with the trapezoidal rule, from a
+    single cumulative sum.
+
+    The power of a band is the trapezoidal integral over the frequencies in [low, high), as
+    np.trapz(psd[mask], freq[mask]) : it is the difference of the cumulative integral at the
+    last and at the first frequency of the band, found in the sorted frequency array with
+    np.searchsorted.
+
+    Parameters
+    ---------
+    freq : array
+        Array of sample frequencies, sorted.
+    psd : array
+        Power spectral density, or array whose last axis is the frequency axis, for example
+        the power spectral densities of every epoch of a spectrogram.
+    lows : array
+        Lower bound of each band.
+    highs : array
+        Higher bound of each band.
+
+    Returns
+    ---------
+    powers : array
+        Power in each band, on the last axis, 0 if the band contains less than 2 frequencies.
+    start_indexes : array
+        Index of the first frequency of each band.
+    end_indexes : array
+        Index after the last frequency of each band.
+    """
+    freq = np.asarray(freq, dtype=float)
+    psd = np.asarray(psd, dtype=float)
+    if len(freq) == 0:
+        return (np.zeros(psd.shape[:-1] + (len(lows),)), np.zeros(len(lows), dtype=int),
+                np.zeros(len(lows), dtype=int))
+    cumulative_power = np.zeros(psd.shape)
+    np.cumsum(np.diff(freq) * (psd[..., 1:] + psd[..., :-1]) / 2, axis=-1,
+              out=cumulative_power[..., 1:])
+
+    start_indexes = np.searchsorted(freq, lows, side="left")
+    end_indexes = np.maximum(np.searchsorted(freq, highs, side="left"), start_indexes)
+    last_indexes = np.maximum(end_indexes - 1, start_indexes)
+    powers = cumulative_power[..., np.minimum(last_indexes, len(freq) - 1)] \
+        - cumulative_power[..., np.minimum(start_indexes, len(freq) - 1)]
+    return powers, start_indexes, end_indexes
+
+
 # ----------------- NON lINEAR DOMAIN FEATURES ----------------- #
 
 
@@ -485,8 +1330,16 @@ def get_csi_cvi_features(nn_intervals: List[float]) -> dict:
 
     # Measures the width and length of poincare cloud
     poincare_plot_features = get_poincare_plot_features(nn_intervals)
-    T = 4 * poincare_plot_features['sd1']
-    L = 4 * poincare_plot_features['sd2']
+    return _get_csi_cvi_features(poincare_plot_features['sd1'], poincare_plot_features['sd2'])
+
+
+def _get_csi_cvi_features(sd1: float, sd2: float) -> dict:
+    """
+    Computes CSI / CVI features from Poincaré plot features. See get_csi_cvi_features for
+    details about each feature.
+    """
+    T = 4 * sd1
+    L = 4 * sd2
 
     csi = L / T
     cvi = np.log10(L * T)
@@ -534,11 +1387,22 @@ def get_poincare_plot_features(nn_intervals: List[float]) -> dict:
     and non- linear analyses, Soroor Behbahani, Nader Jafarnia Dabanloo et al - 2013
 
     """
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
     diff_nn_intervals = np.diff(nn_intervals)
+    return _get_poincare_plot_features(np.std(nn_intervals, ddof=1),
+                                       np.std(diff_nn_intervals, ddof=1))
+
+
+def _get_poincare_plot_features(sdnn: float, std_diff_nni: float) -> dict:
+    """
+    Computes Poincaré plot features from the unbiased standard deviations of NN-intervals and
+    of their successive differences. See get_poincare_plot_features for details about each
+    feature.
+    """
     # measures the width of poincare cloud
-    sd1 = np.sqrt(np.std(diff_nn_intervals, ddof=1) ** 2 * 0.5)
+    sd1 = np.sqrt(std_diff_nni ** 2 * 0.5)
     # measures the length of the poincare cloud
-    sd2 = np.sqrt(2 * np.std(nn_intervals, ddof=1) ** 2 - 0.5 * np.std(diff_nn_intervals, ddof=1) ** 2)
+    sd2 = np.sqrt(2 * sdnn ** 2 - 0.5 * std_diff_nni ** 2)
     ratio_sd2_sd1 = sd2 / sd1
 
     poincare_plot_features = {
@@ -550,7 +1414,7 @@ def get_poincare_plot_features(nn_intervals: List[float]) -> dict:
     return poincare_plot_features
 
 
-def get_sampen(nn_intervals: List[float]) -> dict:
+def get_sampen(nn_intervals: List[float], emb_dim: int = 2, tolerance: float = None) -> dict:
     """
     Function computing the sample entropy of the given data.
     Must use this function on short term recordings, from 1 minute window.
@@ -559,18 +1423,396 @@ def get_sampen(nn_intervals: List[float]) -> dict:
     ---------
     nn_intervals : list
         Normal to Normal Interval
+    emb_dim : int
+        Embedding dimension, i.e. length of the compared templates, by default 2.
+    tolerance : float
+        Distance under which two templates match. By default, as in nolds, about 0.2 times the
+        standard deviation of nn_intervals for emb_dim of 2.
 
     Returns
     ---------
     sampen : float
         The sample entropy of the data
 
+    Notes
+    ---------
+    Results are the same as nolds.sampen with Chebyshev distance. Templates are sorted by their
+    first value so that only pairs whose first values are within tolerance are compared, in
+    vectorized passes whose memory is proportional to the size of the recording. As the number
+    of such pairs grows with the square of the size of the recording, long recordings are
+    counted by range counting instead, whose cost grows as n log(n) ** emb_dim : about 5 s on
+    24 hours recordings.
+
     References
     ----------
     .. [5] Physiological time-series analysis using approximate entropy and sample entropy, \
     JOSHUA S. RICHMAN1, J. RANDALL MOORMAN - 2000
 
     """
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    if len(nn_intervals) < emb_dim + 1:
+        raise ValueError("Sample entropy needs at least emb_dim + 1 NN-intervals")
+    if tolerance is None:
+        # Same default as nolds, equal to 0.2 * std for emb_dim = 2
+        tolerance = np.std(nn_intervals, ddof=1) * 0.1164 * (0.5627 * np.log(emb_dim) + 1.3334)
+
+    count_m, count_m1 = _count_template_matches(nn_intervals, emb_dim, tolerance)
+    return {'sampen': _get_sampen_from_counts(count_m, count_m1)}
+
+
+def get_multiscale_entropy(nn_intervals: List[float], max_scale: int = 10, emb_dim: int = 2,
+                           tolerance: float = None) -> dict:
+    """
+    Function computing the sample entropy of the coarse-grained NN-intervals at scales 1 to
+    max_scale, i.e. the multiscale entropy profile.
+
+    Parameters
+    ---------
+    nn_intervals : list
+        Normal to Normal Interval
+    max_scale : int
+        Largest coarse-graining scale, by default 10.
+    emb_dim : int
+        Embedding dimension, i.e. length of the compared templates, by default 2.
+    tolerance : float
+        Distance under which two templates match, the same at every scale. By default, as in
+        get_sampen, about 0.2 times the standard deviation of the original NN-intervals.
 
-    sampen = nolds.sampen(nn_intervals, emb_dim=2)
-    return {'sampen': sampen}
+    Returns
+    ---------
+    multiscale_entropy : dict
+        dictionary containing the sample entropy at each scale and the complexity index.
+
+    Notes
+    ---------
+    - **mse_i** : sample entropy of the series of means of consecutive non-overlapping windows \
+    of i NN-intervals. mse_1 is equal to sampen.
+
+    - **complexity_index** : sum of the sample entropies over all scales.
+
+    Coarse-grained series of different scales do not share templates, so template matches are
+    counted at each scale separately. As the coarse-grained series at scale i is i times
+    shorter, counting its templates costs about i² times less than at scale 1, but each scale
+    also has a fixed cost : the whole profile costs 3 to 4 times a single sample entropy on 5
+    minutes to 1 hour recordings. Scales whose coarse-grained series is shorter than
+    emb_dim + 1 are set to nan.
+
+    References
+    ----------
+    .. [6] Multiscale entropy analysis of complex physiologic time series, Costa M., \
+    Goldberger A. L., Peng C. K. - 2002
+
+    """
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    if tolerance is None:
+        tolerance = np.std(nn_intervals, ddof=1) * 0.1164 * (0.5627 * np.log(emb_dim) + 1.3334)
+
+    multiscale_entropy = {}
+    for scale in range(1, max_scale + 1):
+        coarse_grained_nni = _coarse_grain(nn_intervals, scale)
+        if len(coarse_grained_nni) < emb_dim + 1:
+            multiscale_entropy["mse_{}".format(scale)] = np.nan
+            continue
+        count_m, count_m1 = _count_template_matches(coarse_grained_nni, emb_dim, tolerance)
+        multiscale_entropy["mse_{}".format(scale)] = _get_sampen_from_counts(count_m, count_m1)
+
+    multiscale_entropy["complexity_index"] = sum(multiscale_entropy.values())
+    return multiscale_entropy
+
+
+def get_dfa_features(nn_intervals: List[float], short_term_scales: Tuple[int, int] = (4, 16),
+                     long_term_scales: Tuple[int, int] = (16, 64)) -> dict:
+    """
+    Function computing the short term and long term scaling exponents of the detrended
+    fluctuation analysis (DFA) of the NN-intervals.
+
+    Parameters
+    ---------
+    nn_intervals : list
+        Normal to Normal Interval
+    short_term_scales : tuple
+        Smallest and largest box sizes, in beats, used to fit alpha1. By default 4 to 16.
+    long_term_scales : tuple
+        Smallest and largest box sizes, in beats, used to fit alpha2. By default 16 to 64.
+
+    Returns
+    ---------
+    dfa_features : dict
+        dictionary containing DFA scaling exponents.
+
+    Notes
+    ---------
+    - **dfa_alpha1** : slope of log F(n) against log n for box sizes n in short_term_scales, \
+    F(n) being the root mean square deviation of the integrated NN-intervals from their linear \
+    trend in non-overlapping boxes of n beats.
+
+    - **dfa_alpha2** : same slope for box sizes n in long_term_scales.
+
+    Results are the same as nolds.dfa with overlap=False and fit_exp="poly". The integrated
+    series is computed once and the trends of all boxes of a size are fitted at once. Box sizes
+    greater or equal to the number of NN-intervals are ignored, and an exponent fitted on less
+    than 2 box sizes is set to nan.
+
+    References
+    ----------
+    .. [7] Quantification of scaling exponents and crossover phenomena in nonstationary \
+    heartbeat time series, Peng C. K., Havlin S., Stanley H. E., Goldberger A. L. - 1995
+
+    """
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    profile = np.cumsum(nn_intervals - np.mean(nn_intervals))
+
+    dfa_features = {}
+    for feature_name, (min_box_size, max_box_size) in [("dfa_alpha1", short_term_scales),
+                                                       ("dfa_alpha2", long_term_scales)]:
+        box_sizes = np.arange(max(min_box_size, 2), min(max_box_size, len(profile) - 1) + 1)
+        fluctuations = np.array([_get_dfa_fluctuation(profile, box_size) for box_size in box_sizes])
+        is_not_zero = fluctuations > 0
+        if np.count_nonzero(is_not_zero) < 2:
+            dfa_features[feature_name] = np.nan
+        else:
+            dfa_features[feature_name] = np.polyfit(np.log(box_sizes[is_not_zero]),
+                                                    np.log(fluctuations[is_not_zero]), 1)[0]
+    return dfa_features
+
+
+def _get_sampen_from_counts(count_m: int, count_m1: int) -> float:
+    """
+    Returns the sample entropy from the number of matching templates of length m and m + 1,
+    with a warning when one of them is zero.
+    """
+    if count_m > 0 and count_m1 > 0:
+        return -np.log(count_m1 / count_m)
+    warnings.warn("No templates are within tolerance, consider raising the tolerance",
+                  RuntimeWarning)
+    if count_m == 0 and count_m1 == 0:
+        return np.nan
+    elif count_m == 0:
+        return -np.inf
+    return np.inf
+
+
+def _coarse_grain(values: np.ndarray, scale: int) -> np.ndarray:
+    """
+    Returns the means of consecutive non-overlapping windows of scale values. A last
+    incomplete window is dropped.
+    """
+    if scale == 1:
+        return values
+    window_count = len(values) // scale
+    return values[:window_count * scale].reshape(window_count, scale).mean(axis=1)
+
+
+def _get_dfa_fluctuation(profile: np.ndarray, box_size: int) -> float:
+    """
+    Returns the root mean square deviation of the profile from its least squares linear trend
+    in non-overlapping boxes of box_size values. Values after the last complete box are
+    ignored.
+    """
+    box_count = len(profile) // box_size
+    boxes = profile[:box_count * box_size].reshape(box_count, box_size)
+    centered_time = np.arange(box_size) - (box_size - 1) / 2
+    slopes = boxes @ centered_time / np.dot(centered_time, centered_time)
+    residuals = boxes - boxes.mean(axis=1)[:, np.newaxis] - slopes[:, np.newaxis] * centered_time
+    return np.sqrt(np.mean(residuals ** 2))
+
+
+def _count_template_matches(values: np.ndarray, emb_dim: int, tolerance: float) -> Tuple[int, int]:
+    """
+    Counts the pairs of templates of length emb_dim and emb_dim + 1 whose Chebyshev distance is
+    strictly lower than tolerance. Only the len(values) - emb_dim templates having a successor
+    are considered, as in nolds.
+
+    Pairs of templates matching on their first value are compared while each template has less
+    than RANGE_COUNTING_MIN_CANDIDATES of them on average, and counted by range counting
+    otherwise.
+    """
+    template_count = len(values) - emb_dim
+    sorted_first_values = np.sort(values[:template_count])
+    candidate_count = np.sum(np.searchsorted(sorted_first_values, sorted_first_values + tolerance) -
+                             np.arange(1, template_count + 1))
+    if candidate_count <= RANGE_COUNTING_MIN_CANDIDATES * template_count:
+        return _compare_sorted_templates(values, emb_dim, tolerance)
+    return _count_templates_in_boxes(values, emb_dim, tolerance)
+
+
+def _compare_sorted_templates(values: np.ndarray, emb_dim: int,
+                              tolerance: float) -> Tuple[int, int]:
+    """
+    Counts the matching pairs of templates as _count_template_matches, by comparing them.
+
+    Templates are sorted by their first value : the templates matching a template on their
+    first value are then the following ones in sorted order, until the difference reaches
+    tolerance. Pairs are compared by increasing rank offset, on the shrinking range of sorted
+    templates which still have a candidate at that offset.
+    """
+    template_count = len(values) - emb_dim
+    order = np.argsort(values[:template_count], kind="stable")
+    # Row lag holds values[i + lag] of each template i, in sorted order
+    templates = values[order[:, np.newaxis] + np.arange(emb_dim + 1)].T.copy()
+
+    count_m = 0
+    count_m1 = 0
+    range_start, range_end = 0, template_count
+    offset = 1
+    while True:
+        range_end = min(range_end, template_count - offset)
+        if range_end <= range_start:
+            break
+        distance = np.abs(templates[:, range_start + offset:range_end + offset] -
+                          templates[:, range_start:range_end])
+        is_match = distance[0] < tolerance
+        candidate_index = np.flatnonzero(is_match)
+        if len(candidate_index) == 0:
+            break
+        # Templates out of this range have no candidate at larger offsets either
+        range_start, range_end = (range_start + candidate_index[0],
+                                  range_start + candidate_index[-1] + 1)
+        for lag in range(1, emb_dim):
+            is_match &= distance[lag] < tolerance
+        count_m += int(np.count_nonzero(is_match))
+        is_match &= distance[emb_dim] < tolerance
+        count_m1 += int(np.count_nonzero(is_match))
+        offset += 1
+    return count_m, count_m1
+
+
+def _count_templates_in_boxes(values: np.ndarray, emb_dim: int,
+                              tolerance: float) -> Tuple[int, int]:
+    """
+    Counts the matching pairs of templates as _count_template_matches, by range counting : each
+    lag of the templates is replaced by the ranks of its values, so that the templates matching
+    a template are the ones whose ranks are within a box, i.e. a range of ranks on every lag.
+    """
+    template_count = len(values) - emb_dim
+    rank_ranges = [_get_rank_ranges(values[lag:lag + template_count], tolerance)
+                   for lag in range(emb_dim + 1)]
+    counts = []
+    for template_length in (emb_dim, emb_dim + 1):
+        ranks, lows, highs = (list(axis) for axis in zip(*rank_ranges[:template_length]))
+        match_count = _count_points_in_boxes(ranks, lows, highs,
+                                             np.ones(template_count, dtype=np.int64),
+                                             template_count + 1)
+        # Each template matches itself, and each pair is counted from both of its templates
+        counts.append((match_count - template_count) // 2)
+    return counts[0], counts[1]
+
+
+def _get_rank_ranges(values: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray,
+                                                                    np.ndarray]:
+    """
+    Returns the rank of each value in ascending order, and the range [low, high) of the ranks of
+    the values whose difference to it is strictly lower than tolerance. Bounds are bisected on
+    the rounded differences themselves, so that they agree with _compare_sorted_templates.
+    """
+    value_count = len(values)
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    ranks = np.empty(value_count, dtype=np.int64)
+    ranks[order] = np.arange(value_count)
+
+    bounds = []
+    for is_above_range in (lambda difference: difference > -tolerance,
+                           lambda difference: difference >= tolerance):
+        low = np.zeros(value_count, dtype=np.int64)
+        high = np.full(value_count, value_count, dtype=np.int64)
+        for _ in range(value_count.bit_length() + 1):
+            middle = (low + high) // 2
+            is_above = is_above_range(sorted_values[np.minimum(middle, value_count - 1)] - values)
+            is_above |= middle == value_count
+            high = np.where(is_above, middle, high)
+            low = np.where(is_above, low, middle + 1)
+        bounds.append(low)
+    return ranks, bounds[0], bounds[1]
+
+
+def _count_points_in_boxes(keys: List[np.ndarray], lows: List[np.ndarray],
+                           highs: List[np.ndarray], signs: np.ndarray, key_size: int) -> int:
+    """
+    Returns the sum over boxes of their sign times the number of points within them, i.e. whose
+    integer keys are within [lows, highs) on every axis. Keys of the second axis and bounds are
+    lower than key_size.
+
+    Points are sorted on the first axis, so that the points of a box on this axis are a range
+    of positions. With 2 axes, the points of this range which are within the box on the second
+    axis are counted by _count_lower_values. Otherwise the range is the difference of two
+    prefixes, themselves split as in a Fenwick tree into aligned blocks of power of 2 sizes.
+    The points of all blocks of a size are then counted on the remaining axes at once, the
+    index of their block being prefixed to their key on the second axis.
+    """
+    order = np.argsort(keys[0], kind="stable")
+    sorted_keys = keys[0][order]
+    starts = np.searchsorted(sorted_keys, lows[0])
+    ends = np.searchsorted(sorted_keys, highs[0])
+    if len(keys) == 1:
+        return int(np.dot(signs, ends - starts))
+
+    point_count = len(order)
+    remaining_keys = [axis_keys[order] for axis_keys in keys[1:]]
+    if len(keys) == 2:
+        second_order = np.argsort(remaining_keys[0], kind="stable")
+        second_ranks = np.empty(point_count, dtype=np.int64)
+        second_ranks[second_order] = np.arange(point_count)
+        sorted_second_keys = remaining_keys[0][second_order]
+        return _count_lower_values(second_ranks, np.concatenate((starts, starts)),
+                                   np.concatenate((ends, ends)),
+                                   np.searchsorted(sorted_second_keys,
+                                                   np.concatenate((highs[1], lows[1]))),
+                                   np.concatenate((signs, -signs)))
+
+    prefix_ends = np.concatenate((ends, starts))
+    prefix_signs = np.concatenate((signs, -signs))
+    box_index = np.tile(np.arange(len(starts)), 2)
+    point_blocks = np.arange(point_count)
+    total = 0
+    for level in range(point_count.bit_length()):
+        # Blocks of both prefixes cancel out from the level where they are the same
+        is_split = np.tile((starts >> level) != (ends >> level), 2)
+        is_used = is_split & ((prefix_ends >> level) & 1 == 1)
+        if np.any(is_used):
+            # The prefix holds the block before the one of its end at this level
+            blocks = (prefix_ends[is_used] >> level) - 1
+            used_boxes = box_index[is_used]
+            total += _count_points_in_boxes(
+                [point_blocks * key_size + remaining_keys[0]] + remaining_keys[1:],
+                [blocks * key_size + lows[1][used_boxes]] +
+                [axis_lows[used_boxes] for axis_lows in lows[2:]],
+                [blocks * key_size + highs[1][used_boxes]] +
+                [axis_highs[used_boxes] for axis_highs in highs[2:]],
+                prefix_signs[is_used], key_size)
+        point_blocks = point_blocks >> 1
+    return total
+
+
+def _count_lower_values(sequence: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                        thresholds: np.ndarray, signs: np.ndarray) -> int:
+    """
+    Returns the sum over queries of their sign times the number of values of sequence at
+    positions [starts, ends) which are lower than thresholds. Values and thresholds are
+    integers lower than 2 ** len(sequence).bit_length().
+
+    As in a wavelet matrix, values are stably partitioned on each of their bits, from the
+    highest one, and the ranges of positions follow the values having the same higher bits as
+    their threshold. Values in the range whose bit is 0 where the one of the threshold is 1 are
+    lower than the threshold.
+    """
+    value_count = len(sequence)
+    sequence = sequence.astype(np.int32)
+    starts = starts.astype(np.int32)
+    ends = ends.astype(np.int32)
+    thresholds = thresholds.astype(np.int32)
+    total = 0
+    zeros_before = np.zeros(value_count + 1, dtype=np.int32)
+    for bit in range(value_count.bit_length() - 1, -1, -1):
+        is_zero = sequence & (1 << bit) == 0
+        np.cumsum(is_zero, out=zeros_before[1:])
+        start_zeros = zeros_before[starts]
+        end_zeros = zeros_before[ends]
+        is_threshold_one = thresholds & (1 << bit) != 0
+        total += int(np.dot(signs[is_threshold_one], (end_zeros - start_zeros)[is_threshold_one]))
+        # Ranges follow the values whose bit is the one of the threshold
+        zero_count = zeros_before[-1]
+        starts = np.where(is_threshold_one, starts - start_zeros + zero_count, start_zeros)
+        ends = np.where(is_threshold_one, ends - end_zeros + zero_count, end_zeros)
+        sequence = np.concatenate((sequence[is_zero], sequence[~is_zero]))
+    return total
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides methods to clean and extract features from a cohort of recordings using
+ several processes."""
+
+import os
+import math
+import traceback
+from typing import Callable, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from hrvanalysis.batch import flatten_batch
+from hrvanalysis.preprocessing import get_nn_intervals
+from hrvanalysis.extract_features import (get_time_domain_features, get_geometrical_features,
+                                          get_frequency_domain_features, get_csi_cvi_features,
+                                          get_poincare_plot_features, get_sampen)
+
+# limit functions that user might import using "from hrv-analysis import *"
+__all__ = ["get_cohort_features"]
+
+# Features computed for each recording by default
+DEFAULT_FEATURE_FUNCTIONS = (get_time_domain_features, get_geometrical_features,
+                             get_frequency_domain_features, get_csi_cvi_features,
+                             get_poincare_plot_features, get_sampen)
+
+
+def get_cohort_features(rr_intervals: List[List[float]], offsets: List[int] = None,
+                        n_workers: int = None, chunk_size: int = None, preprocess: bool = True,
+                        nn_intervals_kwargs: dict = None,
+                        feature_functions: List[Callable] = DEFAULT_FEATURE_FUNCTIONS) -> Tuple[list, dict]:
+    """
+    Computes NN-intervals with get_nn_intervals then features of every recording of a cohort,
+    spreading recordings over a pool of processes.
+
+    Recordings are concatenated once in a shared memory block that every worker reads without
+    copy, so that only recording indexes and results are sent between processes.
+
+    Parameters
+    ---------
+    rr_intervals : list
+        list of recordings, each one being a list or array of RR-intervals. If offsets are given,
+        flat array of the RR-intervals of all recordings.
+    offsets : list
+        Index of the first RR-interval of each recording in the flat array, followed by the total
+        number of RR-intervals. Only needed if rr_intervals is already a flat array.
+    n_workers : int
+        Number of processes. By default, the number of CPUs of the machine. If set to 1,
+        recordings are processed in the current process.
+    chunk_size : int
+        Number of recordings given at once to a worker. By default, recordings are split in 4
+        chunks per worker.
+    preprocess : bool
+        Whether to compute NN-intervals with get_nn_intervals before extracting features. Set to
+        False if recordings already are NN-intervals.
+    nn_intervals_kwargs : dict
+        Keyword arguments given to get_nn_intervals.
+    feature_functions : list
+        Features functions called on each recording, such as get_time_domain_features. They must
+        be defined at module level so that workers can find them.
+
+    Returns
+    ---------
+    cohort_features : list
+        Dictionary of features of each recording, in input order. None if the recording failed.
+    errors : dict
+        Traceback of the error raised by each failed recording, by recording index.
+    """
+    rr_intervals, offsets = flatten_batch(rr_intervals, offsets, min_length=0)
+    recording_count = len(offsets) - 1
+    nn_intervals_kwargs = dict(nn_intervals_kwargs or {}, verbose=False)
+
+    if n_workers == 1:
+        results = _process_recordings(rr_intervals, offsets, 0, recording_count, preprocess,
+                                      nn_intervals_kwargs, feature_functions)
+        return _split_results(results)
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(recording_count / (4 * n_workers)))
+
+    shared_rr_intervals = shared_memory.SharedMemory(create=True, size=max(rr_intervals.nbytes, 1))
+    try:
+        np.ndarray(rr_intervals.shape, dtype=rr_intervals.dtype,
+                   buffer=shared_rr_intervals.buf)[:] = rr_intervals
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(_process_shared_recordings, shared_rr_intervals.name,
+                                       len(rr_intervals), offsets, start,
+                                       min(start + chunk_size, recording_count), preprocess,
+                                       nn_intervals_kwargs, feature_functions)
+                       for start in range(0, recording_count, chunk_size)]
+            results = [result for future in futures for result in future.result()]
+    finally:
+        shared_rr_intervals.close()
+        shared_rr_intervals.unlink()
+
+    return _split_results(results)
+
+
+def _process_shared_recordings(shared_memory_name: str, size: int, offsets: np.ndarray,
+                               start: int, end: int, preprocess: bool, nn_intervals_kwargs: dict,
+                               feature_functions: List[Callable]) -> list:
+    """Worker task processing recordings start to end read from the shared memory block."""
+    shared_rr_intervals = shared_memory.SharedMemory(name=shared_memory_name)
+    try:
+        rr_intervals = np.ndarray((size,), dtype=float, buffer=shared_rr_intervals.buf)
+        # Recordings are views on the block shared by all workers
+        rr_intervals.flags.writeable = False
+        results = _process_recordings(rr_intervals, offsets, start, end, preprocess,
+                                      nn_intervals_kwargs, feature_functions)
+        # The buffer can only be closed once no array points to it anymore
+        del rr_intervals
+    finally:
+        shared_rr_intervals.close()
+    return results
+
+
+def _process_recordings(rr_intervals: np.ndarray, offsets: np.ndarray, start: int, end: int,
+                        preprocess: bool, nn_intervals_kwargs: dict,
+                        feature_functions: List[Callable]) -> list:
+    """
+    Processes recordings start to end. An error on a recording is caught and returned in place
+    of its features, so that it does not stop the other recordings.
+    """
+    results = []
+    for recording_index in range(start, end):
+        # View on the shared values, given as is to get_nn_intervals and feature functions
+        recording = rr_intervals[offsets[recording_index]:offsets[recording_index + 1]]
+        try:
+            nn_intervals = get_nn_intervals(recording, **nn_intervals_kwargs) if preprocess else recording
+            features = {}
+            for feature_function in feature_functions:
+                features.update(feature_function(nn_intervals))
+            results.append((features, None))
+        except Exception:
+            results.append((None, traceback.format_exc()))
+    return results
+
+
+def _split_results(results: list) -> Tuple[list, dict]:
+    """Splits results of workers in features and errors."""
+    cohort_features = [features for features, _ in results]
+    errors = {recording_index: error for recording_index, (_, error) in enumerate(results)
+              if error is not None}
+    return cohort_features, errors
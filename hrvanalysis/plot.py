@@ -81,7 +81,9 @@ def plot_distrib(nn_intervals: List[float], bin_length: int = 8):
 
 def plot_psd(nn_intervals: List[float], method: str = "welch", sampling_frequency: int = 7,
              interpolation_method: str = "linear", vlf_band: namedtuple = VlfBand(0.003, 0.04),
-             lf_band: namedtuple = LfBand(0.04, 0.15), hf_band: namedtuple = HfBand(0.15, 0.40)):
+             lf_band: namedtuple = LfBand(0.04, 0.15), hf_band: namedtuple = HfBand(0.15, 0.40),
+             nperseg: int = None, noverlap: int = None, nfft=4096, window="hann",
+             detrend="constant"):
     """
     Function plotting the power spectral density of the NN Intervals.
 
@@ -103,11 +105,28 @@ def plot_psd(nn_intervals: List[float], method: str = "welch", sampling_frequenc
         Low frequency bands for features extraction from power spectral density.
     hf_band : tuple
         High frequency bands for features extraction from power spectral density.
+    nperseg : int
+        Length of each Welch segment, in samples. No need to specify if lomb method is used.
+    noverlap : int
+        Number of samples shared by two consecutive Welch segments. No need to specify if lomb
+        method is used.
+    nfft : int or str
+        Length of the FFT of each Welch segment, or "auto" to choose it from the recording
+        length and the VLF band. No need to specify if lomb method is used.
+    window : str, tuple or array
+        Window applied to each Welch segment, by default "hann". No need to specify if lomb
+        method is used.
+    detrend : str, function or False
+        Detrending applied to each Welch segment, by default "constant". No need to specify if
+        lomb method is used.
     """
 
     freq, psd = _get_freq_psd_from_nn_intervals(nn_intervals=nn_intervals, method=method,
                                                 sampling_frequency=sampling_frequency,
-                                                interpolation_method=interpolation_method)
+                                                interpolation_method=interpolation_method,
+                                                vlf_band=vlf_band, hf_band=hf_band,
+                                                nperseg=nperseg, noverlap=noverlap, nfft=nfft,
+                                                window=window, detrend=detrend)
 
     # Calcul of indices between desired frequency bands
     vlf_indexes = np.logical_and(freq >= vlf_band[0], freq < vlf_band[1])
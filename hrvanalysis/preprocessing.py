@@ -3,10 +3,12 @@
 
 """This script provides several methods to clean abnormal and ectopic RR-intervals."""
 
+import logging
 from typing import Tuple
 from typing import List
-import pandas as pd
+from collections import namedtuple
 import numpy as np
+from hrvanalysis.profiling import profile_stage
 
 # Static name for methods params
 MALIK_RULE = "malik"
@@ -15,7 +17,51 @@ KAMATH_RULE = "kamath"
 ACAR_RULE = "acar"
 CUSTOM_RULE = "custom"
 
-__all__ = ["remove_outliers", "remove_ectopic_beats", "interpolate_nan_values", "get_nn_intervals"]
+# Interpolation methods computed with numpy, without pandas
+NUMPY_INTERPOLATION_METHODS = ["linear", "nearest", "cubic"]
+
+# Number of previous RR-intervals used by the acar rule
+ACAR_WINDOW = 9
+
+__all__ = ["remove_outliers", "remove_ectopic_beats", "interpolate_nan_values", "get_nn_intervals",
+           "clean_rr_intervals", "CleaningDiagnostics"]
+
+# Information about removed RR-intervals is logged at INFO level, and outlier values at DEBUG
+# level. It is only computed when the logger is enabled for these levels.
+logger = logging.getLogger(__name__)
+
+
+class CleaningDiagnostics(namedtuple("CleaningDiagnostics", ["outlier_indexes", "ectopic_indexes",
+                                                             "ectopic_beats_removal_method"])):
+    """
+    RR-intervals removed while cleaning a recording.
+
+    - **outlier_indexes** : array of the indexes of RR-intervals out of the plausible range.
+
+    - **ectopic_indexes** : array of the indexes of RR-intervals removed as ectopic beats.
+
+    - **ectopic_beats_removal_method** : rule used to detect ectopic beats, None if ectopic
+      beats were not searched.
+    """
+    __slots__ = ()
+
+    @property
+    def outlier_count(self) -> int:
+        return len(self.outlier_indexes)
+
+    @property
+    def ectopic_count(self) -> int:
+        return len(self.ectopic_indexes)
+
+    def to_dict(self) -> dict:
+        """Returns diagnostics with builtin types, for example to serialize them in JSON."""
+        return {
+            "outlier_indexes": np.asarray(self.outlier_indexes).tolist(),
+            "outlier_count": self.outlier_count,
+            "ectopic_indexes": np.asarray(self.ectopic_indexes).tolist(),
+            "ectopic_count": self.ectopic_count,
+            "ectopic_beats_removal_method": self.ectopic_beats_removal_method
+        }
 
 # ----------------- ClEAN OUTlIERS / ECTOPIC BEATS ----------------- #
 
@@ -34,12 +80,13 @@ def remove_outliers(rr_intervals: List[float], verbose: bool = True, low_rri: in
     high_rri : int
         highest RrInterval to be considered plausible.
     verbose : bool
-        Print information about deleted outliers.
+        Log information about deleted outliers, see _log_diagnostics.
 
     Returns
     ---------
-    rr_intervals_cleaned : list
-        list of RR-intervals without outliers
+    rr_intervals_cleaned : list or array
+        list of RR-intervals without outliers. If rr_intervals is a numpy array, array of the
+        same floating dtype, float64 for integer arrays.
 
     References
     ----------
@@ -57,22 +104,16 @@ def remove_outliers(rr_intervals: List[float], verbose: bool = True, low_rri: in
 
     # Conversion RrInterval to Heart rate ==> rri (ms) =  1000 / (bpm / 60)
     # rri 2000 => bpm 30 / rri 300 => bpm 200
-    rr_intervals_cleaned = [rri if high_rri >= rri >= low_rri else np.nan for rri in rr_intervals]
-
-    if verbose:
-        outliers_list = []
-        for rri in rr_intervals:
-            if high_rri >= rri >= low_rri:
-                pass
-            else:
-                outliers_list.append(rri)
-
-        nan_count = sum(np.isnan(rr_intervals_cleaned))
-        if nan_count == 0:
-            print("{} outlier(s) have been deleted.".format(nan_count))
-        else:
-            print("{} outlier(s) have been deleted.".format(nan_count))
-            print("The outlier(s) value(s) are : {}".format(outliers_list))
+    if isinstance(rr_intervals, np.ndarray):
+        rr_intervals_cleaned = rr_intervals.astype(_get_float_dtype(rr_intervals))
+        rr_intervals_cleaned[~((rr_intervals_cleaned >= low_rri) & (rr_intervals_cleaned <= high_rri))] = np.nan
+    else:
+        rr_intervals_cleaned = [rri if high_rri >= rri >= low_rri else np.nan for rri in rr_intervals]
+
+    if verbose and logger.isEnabledFor(logging.INFO):
+        _log_diagnostics(rr_intervals, CleaningDiagnostics(
+            np.flatnonzero(np.isnan(rr_intervals_cleaned)), np.empty(0, dtype=int), None),
+            log_ectopic_beats=False)
     return rr_intervals_cleaned
 
 
@@ -91,14 +132,15 @@ def remove_ectopic_beats(rr_intervals: List[float], method: str = "malik",
         Percentage criteria of difference with previous RR-interval at which we consider
         that it is abnormal. If method is set to Karlsson, it is the percentage of difference
         between the absolute mean of previous and next RR-interval at which  to consider the beat
-        as abnormal.
+        as abnormal. If method is set to acar, it is the percentage of difference with the mean
+        of the 9 previous NN-intervals.
     verbose : bool
-        Print information about ectopic beats.
+        Log information about ectopic beats, see _log_diagnostics.
 
     Returns
     ---------
-    nn_intervals : list
-        list of NN Interval
+    nn_intervals : list or array
+        list of NN Interval, array of the same floating dtype if rr_intervals is a numpy array.
     outlier_count : int
         Count of outlier detected in RR-interval list
 
@@ -113,39 +155,55 @@ def remove_ectopic_beats(rr_intervals: List[float], method: str = "malik",
         raise ValueError("Not a valid method. Please choose between malik, kamath, karlsson, acar.\
          You can also choose your own removing critera with custom_rule parameter.")
 
+    # Indexes are computed as in _remove_outlier_karlsson, _remove_outlier_acar and
+    # _remove_outlier_successive_rule, and kept for diagnostics
+    rr_intervals_array = np.asarray(rr_intervals, dtype=float)
     if method == KARLSSON_RULE:
-        nn_intervals, outlier_count = _remove_outlier_karlsson(rr_intervals=rr_intervals,
-                                                               removing_rule=custom_removing_rule)
+        ectopic_indexes = _get_karlsson_outlier_indexes(rr_intervals_array, custom_removing_rule)
 
     elif method == ACAR_RULE:
-        nn_intervals, outlier_count = _remove_outlier_acar(rr_intervals=rr_intervals)
+        ectopic_indexes = _get_acar_outlier_indexes(rr_intervals_array, custom_removing_rule)
 
     else:
-        # set first element in list
-        outlier_count = 0
-        previous_outlier = False
-        nn_intervals = [rr_intervals[0]]
-        for i, rr_interval in enumerate(rr_intervals[:-1]):
-
-            if previous_outlier:
-                nn_intervals.append(rr_intervals[i + 1])
-                previous_outlier = False
-                continue
-
-            if is_rr_interval_within_bounds(rr_interval, rr_intervals[i + 1], method=method,
-                          custom_rule=custom_removing_rule):
-                nn_intervals.append(rr_intervals[i + 1])
-            else:
-                nn_intervals.append(np.nan)
-                outlier_count += 1
-                previous_outlier = True
-
-    if verbose:
-        print("{} ectopic beat(s) have been deleted with {} rule.".format(outlier_count, method))
+        ectopic_indexes = np.flatnonzero(_get_successive_rule_outlier_mask(
+            rr_intervals_array, method=method, custom_rule=custom_removing_rule))
+    nn_intervals = _replace_by_nan(rr_intervals, ectopic_indexes)
+
+    if verbose and logger.isEnabledFor(logging.INFO):
+        _log_diagnostics(rr_intervals, CleaningDiagnostics(
+            np.empty(0, dtype=int), np.asarray(ectopic_indexes, dtype=int), method), log_outliers=False)
 
     return nn_intervals
 
 
+def _log_diagnostics(rr_intervals: List[float], diagnostics: CleaningDiagnostics,
+                     log_outliers: bool = True, log_ectopic_beats: bool = True):
+    """
+    Logs the number of outliers and ectopic beats removed at INFO level, with diagnostics given
+    to handlers in the "diagnostics" attribute of the record, and outlier values at DEBUG level.
+
+    Parameters
+    ---------
+    rr_intervals : list or array
+        RR-intervals before cleaning.
+    diagnostics : CleaningDiagnostics
+        RR-intervals removed while cleaning.
+    log_outliers : bool
+        whether to log removed outliers.
+    log_ectopic_beats : bool
+        whether to log removed ectopic beats.
+    """
+    extra = {"diagnostics": diagnostics}
+    if log_outliers:
+        logger.info("%d outlier(s) have been deleted.", diagnostics.outlier_count, extra=extra)
+        if diagnostics.outlier_count and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("The outlier(s) value(s) are : %s",
+                         np.asarray(rr_intervals)[diagnostics.outlier_indexes].tolist(), extra=extra)
+    if log_ectopic_beats:
+        logger.info("%d ectopic beat(s) have been deleted with %s rule.", diagnostics.ectopic_count,
+                    diagnostics.ectopic_beats_removal_method, extra=extra)
+
+
 def is_rr_interval_within_bounds(rr_interval: int, next_rr_interval: float, method: str = "malik",
                custom_rule: float = 0.2) -> bool:
     """
@@ -153,9 +211,9 @@ def is_rr_interval_within_bounds(rr_interval: int, next_rr_interval: float, meth
 
     Parameters
     ----------
-    rr_interval : int
+    rr_interval : int or array
         RrInterval
-    next_rr_interval : int
+    next_rr_interval : int or array
         consecutive RrInterval
     method : str
         method to use to clean outlier. malik, kamath, karlsson, acar or custom
@@ -165,19 +223,93 @@ def is_rr_interval_within_bounds(rr_interval: int, next_rr_interval: float, meth
 
     Returns
     ----------
-    outlier : bool
-        True if RrInterval is valid, False if not
+    outlier : bool or array
+        True if RrInterval is valid, False if not. Element-wise when arrays are given.
     """
+    rr_interval = np.asarray(rr_interval, dtype=float)
+    difference = np.asarray(next_rr_interval, dtype=float) - rr_interval
     if method == MALIK_RULE:
-        outlier = abs(rr_interval - next_rr_interval) <= 0.2 * rr_interval
+        outlier = np.abs(difference) <= 0.2 * rr_interval
     elif method == KAMATH_RULE:
-        outlier = 0 <= (next_rr_interval - rr_interval) <= 0.325 * rr_interval or 0 <= \
-                  (rr_interval - next_rr_interval) <= 0.245 * rr_interval
+        outlier = np.logical_or(np.logical_and(0 <= difference, difference <= 0.325 * rr_interval),
+                                np.logical_and(0 <= -difference, -difference <= 0.245 * rr_interval))
     else:
-        outlier = abs(rr_interval - next_rr_interval) <= custom_rule * rr_interval
+        outlier = np.abs(difference) <= custom_rule * rr_interval
     return outlier
 
 
+def _remove_outlier_successive_rule(rr_intervals: List[float], method: str = "malik",
+                                    custom_rule: float = 0.2) -> Tuple[list, int]:
+    """
+    RR-intervals differing too much from the one proceeding it are removed, according to the
+    malik, kamath or custom rule. The beat following a removed RR-interval is always kept, as it
+    can not be compared to a valid previous beat.
+
+    Parameters
+    ---------
+    rr_intervals : list
+        list of RR-intervals
+    method : str
+        method to use to clean outlier. malik, kamath or custom.
+    custom_rule : float
+        percentage criteria of difference with previous RR-interval at which we consider
+        that it is abnormal
+
+    Returns
+    ---------
+    nn_intervals : list
+        list of NN Interval
+    outlier_count : int
+        Count of outlier detected in RR-interval list
+    """
+    outlier_indexes = np.flatnonzero(_get_successive_rule_outlier_mask(rr_intervals, method=method,
+                                                                       custom_rule=custom_rule))
+    # Only outliers are written so that valid values are returned untouched
+    return _replace_by_nan(rr_intervals, outlier_indexes), len(outlier_indexes)
+
+
+def _get_successive_rule_outlier_mask(rr_intervals: List[float], method: str = "malik",
+                                      custom_rule: float = 0.2) -> np.ndarray:
+    """
+    Computes, without looping over beats, the mask of RR-intervals removed by the malik, kamath
+    or custom rule.
+
+    Parameters
+    ---------
+    rr_intervals : list
+        list of RR-intervals
+    method : str
+        method to use to clean outlier. malik, kamath or custom.
+    custom_rule : float
+        percentage criteria of difference with previous RR-interval at which we consider
+        that it is abnormal
+
+    Returns
+    ---------
+    outlier_mask : array
+        boolean array, True where the RR-interval is considered as an ectopic beat.
+
+    Notes
+    ---------
+    Comparing beat i with beat i + 1 is skipped when beat i has itself been removed. Inside a run
+    of consecutive failed comparisons, only the 1st, 3rd, 5th... beats are therefore removed,
+    which is given by the parity of the position of each comparison within its run.
+    """
+    rr_intervals = np.asarray(rr_intervals, dtype=float)
+    outlier_mask = np.zeros(len(rr_intervals), dtype=bool)
+    if len(rr_intervals) < 2:
+        return outlier_mask
+
+    failed_comparison = ~is_rr_interval_within_bounds(rr_intervals[:-1], rr_intervals[1:],
+                                                      method=method, custom_rule=custom_rule)
+    comparison_index = np.arange(len(failed_comparison))
+    run_start = failed_comparison.copy()
+    run_start[1:] &= ~failed_comparison[:-1]
+    last_run_start = np.maximum.accumulate(np.where(run_start, comparison_index, 0))
+    outlier_mask[1:] = failed_comparison & ((comparison_index - last_run_start) % 2 == 0)
+    return outlier_mask
+
+
 def _remove_outlier_karlsson(rr_intervals: List[float], removing_rule: float = 0.2) -> Tuple[list, int]:
     """
     RR-intervals differing by more than the 20 % of the mean of previous and next RR-interval
@@ -202,22 +334,18 @@ def _remove_outlier_karlsson(rr_intervals: List[float], removing_rule: float = 0
     variability in Holter recordings: a comparison with carefully edited data - Marcus Karlsson, \
     Rolf Hörnsten, Annika Rydberg and Urban Wiklund
     """
-    # set first element in list
-    nn_intervals = [rr_intervals[0]]
-    outlier_count = 0
+    outlier_indexes = _get_karlsson_outlier_indexes(np.asarray(rr_intervals, dtype=float),
+                                                    removing_rule)
+    return _replace_by_nan(rr_intervals, outlier_indexes), len(outlier_indexes)
 
-    for i in range(len(rr_intervals)):
-        # Condition to go out of loop at limits of list
-        if i == len(rr_intervals)-2:
-            nn_intervals.append(rr_intervals[i + 1])
-            break
-        mean_prev_next_rri = (rr_intervals[i] + rr_intervals[i+2]) / 2
-        if abs(mean_prev_next_rri - rr_intervals[i+1]) < removing_rule * mean_prev_next_rri:
-            nn_intervals.append(rr_intervals[i+1])
-        else:
-            nn_intervals.append(np.nan)
-            outlier_count += 1
-    return nn_intervals, outlier_count
+
+def _get_karlsson_outlier_indexes(rr_intervals: np.ndarray, removing_rule: float = 0.2) -> np.ndarray:
+    """Indexes of the RR-intervals removed by the karlsson rule, see _remove_outlier_karlsson."""
+    mean_prev_next_rri = (rr_intervals[:-2] + rr_intervals[2:]) / 2
+    is_valid = np.abs(mean_prev_next_rri - rr_intervals[1:-1]) < removing_rule * mean_prev_next_rri
+
+    # First and last RR-intervals have no neighbours and are always kept
+    return np.flatnonzero(~is_valid) + 1
 
 
 def _remove_outlier_acar(rr_intervals: List[float], custom_rule=0.2) -> Tuple[list, int]:
@@ -243,19 +371,107 @@ def _remove_outlier_acar(rr_intervals: List[float], custom_rule=0.2) -> Tuple[li
     .. [8] Automatic ectopic beat elimination in short-term heart rate variability measurements \
     Acar B., Irina S., Hemingway H., Malik M.
     """
-    nn_intervals = []
-    outlier_count = 0
-    for i, rr_interval in enumerate(rr_intervals):
-        if i < 9:
-            nn_intervals.append(rr_interval)
-            continue
-        acar_rule_elt = np.nanmean(nn_intervals[-9:])
-        if abs(acar_rule_elt - rr_interval) < custom_rule * acar_rule_elt:
-            nn_intervals.append(rr_interval)
-        else:
-            nn_intervals.append(np.nan)
-            outlier_count += 1
-    return nn_intervals, outlier_count
+    outlier_indexes = _get_acar_outlier_indexes(np.asarray(rr_intervals, dtype=float), custom_rule)
+    return _replace_by_nan(rr_intervals, outlier_indexes), len(outlier_indexes)
+
+
+def _get_acar_outlier_indexes(rr_intervals_array: np.ndarray, custom_rule: float = 0.2) -> List[int]:
+    """Indexes of the RR-intervals removed by the acar rule, see _remove_outlier_acar."""
+    nn_values = rr_intervals_array.tolist()
+    outlier_indexes = []
+
+    # Decisions are first computed for every beat at once with rolling sums, as if no beat had
+    # been removed in the 9 previous ones. This assumption only breaks during the 9 beats following
+    # a removed beat, which are replayed one by one against the cleaned signal.
+    candidate_indexes = np.flatnonzero(~_is_acar_rule_valid(rr_intervals_array, custom_rule)) + ACAR_WINDOW
+    next_index = ACAR_WINDOW
+    while True:
+        candidate_position = np.searchsorted(candidate_indexes, next_index)
+        if candidate_position == len(candidate_indexes):
+            break
+        last_outlier_index = int(candidate_indexes[candidate_position])
+        nn_values[last_outlier_index] = np.nan
+        outlier_indexes.append(last_outlier_index)
+
+        next_index = last_outlier_index + 1
+        while next_index < len(nn_values) and next_index - last_outlier_index <= ACAR_WINDOW:
+            previous_nn_intervals = [nni for nni in nn_values[next_index - ACAR_WINDOW:next_index]
+                                     if nni == nni]
+            acar_rule_elt = sum(previous_nn_intervals) / len(previous_nn_intervals) \
+                if previous_nn_intervals else np.nan
+            if not abs(acar_rule_elt - nn_values[next_index]) < custom_rule * acar_rule_elt:
+                nn_values[next_index] = np.nan
+                outlier_indexes.append(next_index)
+                last_outlier_index = next_index
+            next_index += 1
+
+    return outlier_indexes
+
+
+def _is_acar_rule_valid(rr_intervals: np.ndarray, custom_rule: float = 0.2) -> np.ndarray:
+    """
+    Tests every RR-interval, from the 10th one, against the mean of the 9 RR-intervals preceding
+    it. Nan values are ignored in the mean thanks to cumulative counts of valid values.
+
+    Parameters
+    ---------
+    rr_intervals : array
+        array of RR-intervals
+    custom_rule : float
+        percentage criteria of difference with mean of 9 previous RR-intervals at
+        which we consider that RR-interval is abnormal.
+
+    Returns
+    ---------
+    is_valid : array
+        boolean array of length len(rr_intervals) - 9, True if the RR-interval is valid.
+    """
+    is_not_nan = ~np.isnan(rr_intervals)
+    cumulative_sum = np.concatenate(([0.], np.cumsum(np.where(is_not_nan, rr_intervals, 0.))))
+    cumulative_count = np.concatenate(([0], np.cumsum(is_not_nan)))
+    window_sum = cumulative_sum[ACAR_WINDOW:-1] - cumulative_sum[:-ACAR_WINDOW - 1]
+    window_count = cumulative_count[ACAR_WINDOW:-1] - cumulative_count[:-ACAR_WINDOW - 1]
+
+    # A window full of nan values has a nan mean : the RR-interval is then considered abnormal
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acar_rule_elt = window_sum / window_count
+    return np.abs(acar_rule_elt - rr_intervals[ACAR_WINDOW:]) < custom_rule * acar_rule_elt
+
+
+def _replace_by_nan(rr_intervals: List[float], outlier_indexes: List[int]) -> list:
+    """
+    Returns a copy of the RR-intervals where outliers are replaced by nan. Only outliers are
+    written so that valid values are returned untouched.
+
+    Parameters
+    ---------
+    rr_intervals : list or array
+        list of RR-intervals
+    outlier_indexes : list
+        indexes of the RR-intervals to replace by nan.
+
+    Returns
+    ---------
+    nn_intervals : list or array
+        list of NN Interval, or array of floating dtype if rr_intervals is an array.
+    """
+    if isinstance(rr_intervals, np.ndarray):
+        nn_intervals = rr_intervals.astype(_get_float_dtype(rr_intervals))
+        nn_intervals[np.asarray(outlier_indexes, dtype=int)] = np.nan
+        return nn_intervals
+
+    nn_intervals = list(rr_intervals)
+    for index in outlier_indexes:
+        nn_intervals[index] = np.nan
+    return nn_intervals
+
+
+def _get_float_dtype(rr_intervals: np.ndarray) -> np.dtype:
+    """
+    Returns the dtype of arrays derived from rr_intervals : floating dtypes such as float32 are
+    kept to limit memory use, other dtypes are promoted to float64 to hold nan values.
+    """
+    return rr_intervals.dtype if np.issubdtype(rr_intervals.dtype, np.floating) else np.dtype(float)
 
 
 def interpolate_nan_values(rr_intervals: list,
@@ -277,12 +493,25 @@ def interpolate_nan_values(rr_intervals: list,
     limit_direction: str
         If limit is specified, consecutive NaNs will be filled in this direction.
     limit: int
-        TODO
+        Maximum number of consecutive NaNs to fill, counted in limit_direction.
     Returns
     ---------
-    interpolated_rr_intervals : list
-        new list with outliers replaced by interpolated values.
+    interpolated_rr_intervals : list or array
+        new list with outliers replaced by interpolated values. If rr_intervals is a numpy
+        array, new array of the same floating dtype.
+
+    Notes
+    ---------
+    Leading NaNs are replaced by the first valid value. Other NaNs are then filled with the same
+    results and limit semantics as pandas.Series.interpolate. Linear, nearest and cubic
+    interpolations are computed with numpy (and scipy for the cubic spline), other methods
+    are delegated to pandas, which is only imported in that case.
     """
+    is_array = isinstance(rr_intervals, np.ndarray)
+    if is_array:
+        # Work on a copy so that the given array is not modified by the leading nan filling
+        rr_intervals = rr_intervals.astype(_get_float_dtype(rr_intervals))
+
     # search first nan data and fill it post value until it is not nan
     if np.isnan(rr_intervals[0]):
         start_idx = 0
@@ -293,14 +522,113 @@ def interpolate_nan_values(rr_intervals: list,
         rr_intervals[0:start_idx] = [rr_intervals[start_idx]] * start_idx
     else:
         pass
-    # change rr_intervals to pd series
-    series_rr_intervals_cleaned = pd.Series(rr_intervals)
-    # Interpolate nan values and convert pandas object to list of values
-    interpolated_rr_intervals = series_rr_intervals_cleaned.interpolate(method=interpolation_method,
-                                                                        limit=limit,
-                                                                        limit_area=limit_area,
-                                                                        limit_direction=limit_direction)
-    return interpolated_rr_intervals.values.tolist()
+
+    if interpolation_method in NUMPY_INTERPOLATION_METHODS:
+        interpolated_rr_intervals = np.array(rr_intervals, dtype=float)
+        _interpolate_nan_values_numpy(interpolated_rr_intervals, interpolation_method,
+                                      limit_area=limit_area, limit_direction=limit_direction,
+                                      limit=limit)
+    else:
+        # Other methods are only implemented by pandas, imported here as it is slow to import
+        import pandas as pd
+        # change rr_intervals to pd series
+        series_rr_intervals_cleaned = pd.Series(rr_intervals)
+        # Interpolate nan values and convert pandas object to array of values
+        interpolated_rr_intervals = series_rr_intervals_cleaned.interpolate(method=interpolation_method,
+                                                                            limit=limit,
+                                                                            limit_area=limit_area,
+                                                                            limit_direction=limit_direction).values
+    if is_array:
+        return interpolated_rr_intervals.astype(rr_intervals.dtype, copy=False)
+    return interpolated_rr_intervals.tolist()
+
+
+def _interpolate_nan_values_numpy(rr_intervals: np.ndarray, interpolation_method: str = "linear",
+                                  limit_area: str = None, limit_direction: str = "forward",
+                                  limit: int = None):
+    """
+    Interpolates NaN values in place with numpy, as pandas.Series.interpolate does for the
+    linear, nearest and cubic methods. Linear interpolation extends the last valid value to
+    trailing NaNs, nearest and cubic ones leave them as NaN.
+
+    Parameters
+    ---------
+    rr_intervals : array
+        array of RR-intervals of floating dtype, modified in place.
+    interpolation_method : str
+        "linear", "nearest" or "cubic".
+    limit_area: str
+        None, "inside" to only fill NaNs surrounded by valid values, or "outside" to only fill
+        NaNs outside of them.
+    limit_direction: str
+        "forward", "backward" or "both".
+    limit: int
+        Maximum number of consecutive NaNs to fill, counted in limit_direction.
+    """
+    if limit_direction not in ["forward", "backward", "both"]:
+        raise ValueError("Not a valid limit_direction. Choose between 'forward', 'backward' and 'both'")
+    if limit_area not in [None, "inside", "outside"]:
+        raise ValueError("Not a valid limit_area. Choose between None, 'inside' and 'outside'")
+    if limit is not None and limit <= 0:
+        raise ValueError("limit must be greater than 0")
+
+    interpolated_rr_intervals = rr_intervals
+    is_nan = np.isnan(interpolated_rr_intervals)
+    valid_index = np.flatnonzero(~is_nan)
+    if len(valid_index) == 0 or not np.any(is_nan):
+        return
+
+    nan_index = np.flatnonzero(is_nan)
+    valid_values = interpolated_rr_intervals[valid_index]
+    if interpolation_method == "linear":
+        interpolated_rr_intervals[nan_index] = np.interp(nan_index, valid_index, valid_values)
+    else:
+        is_inside = (nan_index > valid_index[0]) & (nan_index < valid_index[-1])
+        interpolated_rr_intervals[nan_index[~is_inside]] = np.nan
+        inside_index = nan_index[is_inside]
+        if interpolation_method == "nearest":
+            # Same tie breaking as scipy interp1d : a midpoint takes the previous value
+            midpoints = (valid_index[1:] + valid_index[:-1]) / 2
+            interpolated_rr_intervals[inside_index] = valid_values[np.searchsorted(midpoints,
+                                                                                   inside_index)]
+        else:
+            from scipy.interpolate import make_interp_spline
+            spline = make_interp_spline(valid_index, valid_values, k=3)
+            interpolated_rr_intervals[inside_index] = spline(inside_index)
+
+    # NaNs which must stay NaN, as selected by pandas from limit and limit_area
+    leading_nan = np.arange(len(is_nan)) < valid_index[0]
+    trailing_nan = np.arange(len(is_nan)) > valid_index[-1]
+    preserved_nan = np.zeros(len(is_nan), dtype=bool)
+    if limit_direction == "forward":
+        preserved_nan |= leading_nan
+    elif limit_direction == "backward":
+        preserved_nan |= trailing_nan
+    if limit is not None:
+        beyond_forward_limit = _get_nan_run_position(is_nan) >= limit
+        beyond_backward_limit = _get_nan_run_position(is_nan[::-1])[::-1] >= limit
+        if limit_direction == "forward":
+            preserved_nan |= beyond_forward_limit
+        elif limit_direction == "backward":
+            preserved_nan |= beyond_backward_limit
+        else:
+            preserved_nan |= (beyond_forward_limit | leading_nan) & (beyond_backward_limit | trailing_nan)
+    if limit_area == "inside":
+        preserved_nan |= leading_nan | trailing_nan
+    elif limit_area == "outside":
+        preserved_nan |= is_nan & ~leading_nan & ~trailing_nan
+
+    interpolated_rr_intervals[preserved_nan] = np.nan
+
+
+def _get_nan_run_position(is_nan: np.ndarray) -> np.ndarray:
+    """
+    Returns for each NaN its position in its run of consecutive NaNs, 0 for the first one, and
+    -1 for valid values.
+    """
+    index = np.arange(len(is_nan))
+    last_valid_index = np.maximum.accumulate(np.where(is_nan, -1, index))
+    return np.where(is_nan, index - last_valid_index - 1, -1)
 
 
 def get_nn_intervals(rr_intervals: List[float], low_rri: int = 300, high_rri: int = 2000,
@@ -327,23 +655,161 @@ def get_nn_intervals(rr_intervals: List[float], low_rri: int = 300, high_rri: in
     limit_direction: str
         If limit is specified, consecutive NaNs will be filled in this direction.
     verbose : bool
-        Print information about deleted outliers.
+        Log information about deleted outliers and ectopic beats, see _log_diagnostics.
 
     Returns
     ---------
-    interpolated_nn_intervals : list
+    interpolated_nn_intervals : list or array
         list of NN Interval interpolated
+
+    Notes
+    ---------
+    If rr_intervals is a numpy array, every step works on arrays and a numpy array is returned,
+    without conversion to list. Its dtype is the one of rr_intervals if floating, so that a
+    float32 recording is returned as float32 NN-intervals, and float64 otherwise.
+    """
+    interpolated_nn_intervals, _ = clean_rr_intervals(rr_intervals, low_rri=low_rri, high_rri=high_rri,
+                                                      limit_area=limit_area,
+                                                      limit_direction=limit_direction,
+                                                      interpolation_method=interpolation_method,
+                                                      ectopic_beats_removal_method=ectopic_beats_removal_method,
+                                                      verbose=verbose)
+    if isinstance(rr_intervals, np.ndarray):
+        return interpolated_nn_intervals
+    return interpolated_nn_intervals.tolist()
+
+
+def clean_rr_intervals(rr_intervals: List[float], low_rri: int = 300, high_rri: int = 2000,
+                       limit_area: str = None, limit_direction: str = "forward",
+                       interpolation_method: str = "linear",
+                       ectopic_beats_removal_method: str = KAMATH_RULE,
+                       custom_removing_rule: float = 0.2, verbose: bool = True,
+                       out: np.ndarray = None, return_diagnostics: bool = False) -> Tuple:
+    """
+    Function that computes NN Intervals from RR-intervals, as get_nn_intervals does, in a
+    single buffer, and returns which beats have been corrected.
+
+    Out of range values, then ectopic beats, are replaced by nan and interpolated directly in
+    the buffer : only nan values are interpolated, and no intermediate list or array is
+    created between steps.
+
+    Parameters
+    ---------
+    rr_intervals : list or array
+        RrIntervals list.
+    low_rri : int
+        lowest RrInterval to be considered plausible.
+    high_rri : int
+        highest RrInterval to be considered plausible.
+    limit_area: str
+        If limit is specified, consecutive NaNs will be filled with this restriction.
+    limit_direction: str
+        If limit is specified, consecutive NaNs will be filled in this direction.
+    interpolation_method : str
+        Method used to interpolate Nan values of series.
+    ectopic_beats_removal_method : str
+        method to use to clean outlier. malik, kamath, karlsson, acar or custom.
+    custom_removing_rule : float
+        Percentage criteria of the custom, karlsson and acar rules, see remove_ectopic_beats.
+    verbose : bool
+        Log information about deleted outliers and ectopic beats, see _log_diagnostics.
+    out : array
+        Floating array of the length of rr_intervals in which NN-intervals are written. Give
+        rr_intervals itself to clean it in place. By default, a new array is created, of the
+        dtype of rr_intervals if it is a floating array, float64 otherwise.
+    return_diagnostics : bool
+        whether to return the indexes of outliers and ectopic beats.
+
+    Returns
+    ---------
+    nn_intervals : array
+        array of NN Interval interpolated, out if given.
+    corrected_mask : array
+        boolean array, True where the RR-interval has been replaced because it was out of
+        range or an ectopic beat.
+    diagnostics : CleaningDiagnostics
+        Indexes of outliers and ectopic beats, only returned if return_diagnostics is True.
     """
-    rr_intervals_cleaned = remove_outliers(rr_intervals, low_rri=low_rri, high_rri=high_rri,
-                                           verbose=verbose)
-    interpolated_rr_intervals = interpolate_nan_values(rr_intervals_cleaned, interpolation_method,
-                                                       limit_area=limit_area, limit_direction=limit_direction)
-    nn_intervals = remove_ectopic_beats(interpolated_rr_intervals,
-                                        method=ectopic_beats_removal_method,
-                                        verbose=verbose)
-    interpolated_nn_intervals = interpolate_nan_values(nn_intervals, interpolation_method,
-                                                       limit_area=limit_area, limit_direction=limit_direction)
-    return interpolated_nn_intervals
+    if ectopic_beats_removal_method not in [MALIK_RULE, KAMATH_RULE, KARLSSON_RULE, ACAR_RULE, CUSTOM_RULE]:
+        raise ValueError("Not a valid method. Please choose between malik, kamath, karlsson, acar.\
+         You can also choose your own removing critera with custom_rule parameter.")
+
+    if out is None:
+        nn_intervals = np.array(rr_intervals, dtype=_get_float_dtype(np.asarray(rr_intervals)))
+    elif not isinstance(out, np.ndarray) or not np.issubdtype(out.dtype, np.floating) \
+            or out.shape != (len(rr_intervals),):
+        raise ValueError("out must be a floating array of the length of rr_intervals")
+    else:
+        nn_intervals = out
+        if out is not rr_intervals:
+            nn_intervals[:] = rr_intervals
+
+    # Diagnostics are only computed if they are returned or logged
+    log_diagnostics = verbose and logger.isEnabledFor(logging.INFO)
+
+    # ---------- Out of range values ---------- #
+    with profile_stage("preprocessing.remove_outliers", len(nn_intervals)):
+        corrected_mask = ~((nn_intervals >= low_rri) & (nn_intervals <= high_rri))
+        if log_diagnostics or return_diagnostics:
+            outlier_indexes = np.flatnonzero(corrected_mask)
+        if log_diagnostics:
+            # Outliers are logged before rr_intervals is overwritten, when cleaned in place
+            _log_diagnostics(rr_intervals, CleaningDiagnostics(outlier_indexes, np.empty(0, dtype=int),
+                                                               None), log_ectopic_beats=False)
+        nn_intervals[corrected_mask] = np.nan
+    with profile_stage("preprocessing.interpolate_outliers", len(nn_intervals)):
+        _fill_nan_values(nn_intervals, interpolation_method, limit_area=limit_area,
+                         limit_direction=limit_direction)
+
+    # ---------- Ectopic beats ---------- #
+    with profile_stage("preprocessing.remove_ectopic_beats", len(nn_intervals)):
+        rr_intervals_array = np.asarray(nn_intervals, dtype=float)
+        if ectopic_beats_removal_method == KARLSSON_RULE:
+            ectopic_indexes = _get_karlsson_outlier_indexes(rr_intervals_array, custom_removing_rule)
+        elif ectopic_beats_removal_method == ACAR_RULE:
+            ectopic_indexes = _get_acar_outlier_indexes(rr_intervals_array, custom_removing_rule)
+        else:
+            ectopic_indexes = np.flatnonzero(_get_successive_rule_outlier_mask(
+                rr_intervals_array, method=ectopic_beats_removal_method,
+                custom_rule=custom_removing_rule))
+        ectopic_indexes = np.asarray(ectopic_indexes, dtype=int)
+        if log_diagnostics or return_diagnostics:
+            diagnostics = CleaningDiagnostics(outlier_indexes, ectopic_indexes,
+                                              ectopic_beats_removal_method)
+        if log_diagnostics:
+            _log_diagnostics(rr_intervals, diagnostics, log_outliers=False)
+        nn_intervals[ectopic_indexes] = np.nan
+        corrected_mask[ectopic_indexes] = True
+    with profile_stage("preprocessing.interpolate_ectopic_beats", len(nn_intervals)):
+        _fill_nan_values(nn_intervals, interpolation_method, limit_area=limit_area,
+                         limit_direction=limit_direction)
+
+    if return_diagnostics:
+        return nn_intervals, corrected_mask, diagnostics
+    return nn_intervals, corrected_mask
+
+
+def _fill_nan_values(nn_intervals: np.ndarray, interpolation_method: str = "linear",
+                     limit_area: str = None, limit_direction: str = "forward"):
+    """
+    Interpolates nan values of a floating array in place, as interpolate_nan_values does :
+    leading nan values take the first valid value.
+    """
+    is_nan = np.isnan(nn_intervals)
+    if not np.any(is_nan):
+        return
+    first_valid_index = np.argmax(~is_nan)
+    if is_nan[first_valid_index]:
+        raise ValueError("rr_intervals does not contain any valid RR-interval")
+    nn_intervals[:first_valid_index] = nn_intervals[first_valid_index]
+
+    if interpolation_method in NUMPY_INTERPOLATION_METHODS:
+        _interpolate_nan_values_numpy(nn_intervals, interpolation_method, limit_area=limit_area,
+                                      limit_direction=limit_direction)
+    else:
+        nn_intervals[:] = interpolate_nan_values(nn_intervals, interpolation_method,
+                                                 limit_area=limit_area,
+                                                 limit_direction=limit_direction)
 
 
 def is_valid_sample(nn_intervals: List[float], outlier_count: int, removing_rule: float = 0.04) -> bool:
@@ -366,9 +832,9 @@ def is_valid_sample(nn_intervals: List[float], outlier_count: int, removing_rule
     """
     result = True
     if outlier_count / len(nn_intervals) > removing_rule:
-        print("Too much outlier for analyses ! You should descard the sample.")
+        logger.info("Too much outlier for analyses ! You should descard the sample.")
         result = False
     if len(nn_intervals) < 240:
-        print("Not enough Heart beat for Nyquist criteria ! ")
+        logger.info("Not enough Heart beat for Nyquist criteria ! ")
         result = False
     return result
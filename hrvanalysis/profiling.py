@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides opt-in instrumentation of the internal stages of preprocessing and
+ feature extraction functions : wall time, input size and allocated memory of each stage."""
+
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator, List
+
+# limit functions that user might import using "from hrv-analysis import *"
+__all__ = ["profile_stages", "profile_stage", "StageProfile", "add_stage_callback",
+           "remove_stage_callback"]
+
+# Callbacks called at the end of each stage, in every thread
+_STAGE_CALLBACKS = []
+
+# Context returned when instrumentation is disabled, which does nothing
+_NO_STAGE = nullcontext()
+
+# Profiles being recorded by each thread, and stages it opened to find parents of nested stages
+_THREAD_STATE = threading.local()
+
+# Peak of traced memory can only be reset from python 3.9 : before, allocated memory of a stage
+# is measured from the highest peak since tracing started, and may be overestimated
+_reset_peak = getattr(tracemalloc, "reset_peak", lambda: None)
+
+
+class StageProfile:
+    """
+    Records of the stages run while profile_stages is active.
+
+    Each record is a dictionary with :
+
+    - **stage** : name of the stage, such as "preprocessing.remove_outliers".
+
+    - **parent** : name of the stage in which this stage is nested, None at top level.
+
+    - **time** : wall time of the stage, in seconds.
+
+    - **size** : number of values processed by the stage.
+
+    - **allocated_bytes** : peak memory allocated during the stage, above the memory allocated
+      when it started. None if memory is not traced.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def get_summary(self) -> dict:
+        """
+        Returns, for each stage name, the number of times it was run, its total time, the total
+        number of values it processed and the largest memory it allocated.
+        """
+        summary = {}
+        for record in self.records:
+            stage_summary = summary.setdefault(record["stage"], {"count": 0, "time": 0., "size": 0,
+                                                                 "allocated_bytes": None})
+            stage_summary["count"] += 1
+            stage_summary["time"] += record["time"]
+            stage_summary["size"] += record["size"] or 0
+            if record["allocated_bytes"] is not None:
+                stage_summary["allocated_bytes"] = max(stage_summary["allocated_bytes"] or 0,
+                                                       record["allocated_bytes"])
+        return summary
+
+    def to_dict(self) -> dict:
+        """Returns records and summary in a dictionary of builtin types."""
+        return {"records": list(self.records), "summary": self.get_summary()}
+
+    def to_json(self, **kwargs) -> str:
+        """Returns records and summary as a JSON string. kwargs are given to json.dumps."""
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+@contextmanager
+def profile_stages(trace_memory: bool = False) -> Iterator[StageProfile]:
+    """
+    Context manager recording the stages run by hrvanalysis functions inside it, in the thread
+    which opened it. Stages run by other threads, such as the workers of a thread pool, are
+    only recorded by profiles they open themselves.
+
+    Parameters
+    ----------
+    trace_memory : bool
+        whether to record memory allocated by each stage. Memory is traced with tracemalloc,
+        which slows allocations down. If tracemalloc is already tracing, memory is recorded
+        anyway. tracemalloc traces the whole process : allocations of other threads running at
+        the same time are counted too.
+
+    Returns
+    -------
+    profile : StageProfile
+        Records of the stages, filled while the context is active.
+
+    Examples
+    --------
+    >>> with profile_stages() as profile:
+    ...     nn_intervals = get_nn_intervals(rr_intervals)
+    ...     frequency_domain_features = get_frequency_domain_features(nn_intervals)
+    >>> profile.get_summary()["frequency_domain.welch"]["time"]
+    """
+    profile = StageProfile()
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    active_profiles = _get_active_profiles()
+    active_profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        active_profiles.remove(profile)
+        if start_tracing:
+            tracemalloc.stop()
+
+
+def add_stage_callback(callback: Callable[[dict], None]):
+    """
+    Registers a function called with the record of each stage when it ends, for example to send
+    it to a metrics system. Callbacks receive the stages of every thread, from the thread
+    running the stage. See StageProfile for the content of records.
+
+    Parameters
+    ----------
+    callback : function
+        function taking a record dictionary.
+    """
+    _STAGE_CALLBACKS.append(callback)
+
+
+def remove_stage_callback(callback: Callable[[dict], None]):
+    """
+    Unregisters a function registered with add_stage_callback.
+
+    Parameters
+    ----------
+    callback : function
+        function to unregister.
+    """
+    _STAGE_CALLBACKS.remove(callback)
+
+
+def profile_stage(stage: str, size: int = None):
+    """
+    Returns a context manager timing a stage. It is used around internal stages of
+    hrvanalysis functions, and can be used around user code, whose stages become the parents of
+    the internal ones. When no profile is recorded and no callback is registered, a shared
+    context doing nothing is returned, so that instrumentation only costs this test.
+
+    Parameters
+    ----------
+    stage : str
+        name of the stage.
+    size : int
+        number of values processed by the stage.
+    """
+    if not _STAGE_CALLBACKS and not getattr(_THREAD_STATE, "profiles", None):
+        return _NO_STAGE
+    return _Stage(stage, size)
+
+
+class _Stage:
+    """Context manager measuring a stage and sending its record to profiles and callbacks."""
+
+    def __init__(self, stage: str, size: int = None):
+        self.stage = stage
+        self.size = size
+
+    def __enter__(self):
+        stack = _get_stage_stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        self.trace_memory = tracemalloc.is_tracing()
+        if self.trace_memory:
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            if self.parent is not None and self.parent.trace_memory:
+                self.parent.peak_memory = max(self.parent.peak_memory, peak_memory)
+            _reset_peak()
+            self.start_memory = self.peak_memory = current_memory
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed_time = time.perf_counter() - self.start_time
+        allocated_bytes = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            allocated_bytes = self.peak_memory - self.start_memory
+            if self.parent is not None and self.parent.trace_memory:
+                self.parent.peak_memory = max(self.parent.peak_memory, self.peak_memory)
+        _get_stage_stack().pop()
+
+        record = {
+            "stage": self.stage,
+            "parent": self.parent.stage if self.parent is not None else None,
+            "time": elapsed_time,
+            "size": self.size,
+            "allocated_bytes": allocated_bytes,
+        }
+        for profile in list(_get_active_profiles()):
+            profile.records.append(record)
+        for callback in list(_STAGE_CALLBACKS):
+            callback(record)
+        return False
+
+
+def _get_stage_stack() -> List[_Stage]:
+    """Stages currently opened by the calling thread."""
+    if not hasattr(_THREAD_STATE, "stack"):
+        _THREAD_STATE.stack = []
+    return _THREAD_STATE.stack
+
+
+def _get_active_profiles() -> List[StageProfile]:
+    """Profiles currently recorded by the calling thread."""
+    if not hasattr(_THREAD_STATE, "profiles"):
+        _THREAD_STATE.profiles = []
+    return _THREAD_STATE.profiles
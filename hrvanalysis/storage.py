@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides a compact binary file format storing many RR-interval or NN-interval
+ recordings, read through memory maps without parsing nor copying the values."""
+
+from typing import Iterator, List
+import numpy as np
+
+# limit functions that user might import using "from hrv-analysis import *"
+__all__ = ["write_rr_intervals_file", "RrIntervalsFile"]
+
+# First bytes of the file, with the version of the format
+FILE_MAGIC = b"HRVRRI01"
+
+# dtypes in which values can be stored, in ms. int16 halves the size of float32 but can not
+# store nan values nor fractions of ms.
+STORAGE_DTYPES = {"float32": np.dtype("<f4"), "int16": np.dtype("<i2")}
+
+# Header : magic, dtype code and number of recordings, followed by the offsets index
+_HEADER_DTYPE = np.dtype([("magic", "S8"), ("dtype", "S8"), ("recording_count", "<i8")])
+_OFFSETS_DTYPE = np.dtype("<i8")
+
+
+def write_rr_intervals_file(path: str, rr_intervals: List[List[float]], dtype: str = "float32"):
+    """
+    Writes recordings of RR-intervals or NN-intervals to a binary file readable with
+    RrIntervalsFile.
+
+    The file contains a header, the index of the first value of each recording followed by the
+    total number of values, then the values of all recordings one after the other.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file to write.
+    rr_intervals : list
+        list of recordings, each one being a list or array of intervals in ms.
+    dtype : str
+        dtype in which values are stored, "float32" or "int16". int16 values are rounded to
+        the closest ms.
+    """
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError("Not a valid dtype. Choose between 'float32' and 'int16'")
+    storage_dtype = STORAGE_DTYPES[dtype]
+
+    recording_lengths = [len(recording) for recording in rr_intervals]
+    offsets = np.concatenate(([0], np.cumsum(recording_lengths, dtype=_OFFSETS_DTYPE)))
+    header = np.array([(FILE_MAGIC, dtype.encode(), len(recording_lengths))], dtype=_HEADER_DTYPE)
+
+    with open(path, "wb") as binary_file:
+        header.tofile(binary_file)
+        offsets.astype(_OFFSETS_DTYPE).tofile(binary_file)
+        for recording in rr_intervals:
+            binary_file.write(_to_storage_dtype(recording, storage_dtype).tobytes())
+
+
+def _to_storage_dtype(recording: List[float], storage_dtype: np.dtype) -> np.ndarray:
+    """Converts a recording to the storage dtype, checking that int16 can represent it."""
+    recording = np.asarray(recording, dtype=float)
+    if np.issubdtype(storage_dtype, np.integer):
+        # Range is checked after rounding, as values up to 0.5 ms above the maximum round to it
+        recording = np.rint(recording)
+        integer_info = np.iinfo(storage_dtype)
+        if not np.all((recording >= integer_info.min) & (recording <= integer_info.max)):
+            raise ValueError("int16 storage can not represent nan values nor intervals longer "
+                             "than {} ms".format(integer_info.max))
+    return recording.astype(storage_dtype)
+
+
+class RrIntervalsFile:
+    """
+    Read-only access to the recordings of a file written by write_rr_intervals_file.
+
+    The file is memory mapped : opening it only reads the header and the offsets index, and
+    each recording is a view of the file, loaded by the operating system when values are
+    accessed. Views are numpy arrays accepted directly by preprocessing and feature functions,
+    and values with offsets can be given to get_batch_features.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+
+    Examples
+    --------
+    >>> rr_intervals_file = RrIntervalsFile("recordings.hrv")
+    >>> nn_intervals = get_nn_intervals(rr_intervals_file[0])
+    >>> batch_features = get_batch_features(rr_intervals_file.values, rr_intervals_file.offsets)
+    """
+
+    def __init__(self, path: str):
+        header = np.fromfile(path, dtype=_HEADER_DTYPE, count=1)
+        if len(header) != 1 or header["magic"][0] != FILE_MAGIC:
+            raise ValueError("{} is not a RR-intervals file".format(path))
+        dtype = header["dtype"][0].decode()
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError("RR-intervals file has an unknown dtype : {}".format(dtype))
+        recording_count = int(header["recording_count"][0])
+
+        self.path = path
+        self.offsets = np.memmap(path, dtype=_OFFSETS_DTYPE, mode="r", offset=_HEADER_DTYPE.itemsize,
+                                 shape=(recording_count + 1,))
+        values_offset = _HEADER_DTYPE.itemsize + self.offsets.nbytes
+        value_count = int(self.offsets[-1])
+        # A memory map can not be empty
+        self.values = np.memmap(path, dtype=STORAGE_DTYPES[dtype], mode="r", offset=values_offset,
+                                shape=(value_count,)) if value_count \
+            else np.empty(0, dtype=STORAGE_DTYPES[dtype])
+
+    @property
+    def dtype(self) -> np.dtype:
+        """dtype in which values are stored."""
+        return self.values.dtype
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """Read-only view of the values of a recording, without copy."""
+        if not -len(self) <= index < len(self):
+            raise IndexError("recording index out of range")
+        index = index % len(self)
+        return self.values[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self[index]
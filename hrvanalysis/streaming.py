@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides a stateful processor to clean RR-intervals and extract heart rate
+ variability features on live RR-interval feeds."""
+
+from typing import List, Union
+from collections import deque
+import numpy as np
+from hrvanalysis.preprocessing import (is_rr_interval_within_bounds, MALIK_RULE, KARLSSON_RULE,
+                                       KAMATH_RULE, ACAR_RULE, CUSTOM_RULE, ACAR_WINDOW)
+
+# limit functions that user might import using "from hrv-analysis import *"
+__all__ = ["HrvStream"]
+
+
+class HrvStream:
+    """
+    Stateful processor cleaning RR-intervals one beat (or one small chunk) at a time and keeping
+    time domain and Poincaré plot features of the last NN-intervals up to date.
+
+    Cleaning follows get_nn_intervals : outliers are removed, removed values are linearly
+    interpolated, ectopic beats are removed and interpolated again. Since an interpolated value
+    is only known once the next valid beat is received, NN-intervals are emitted with a delay
+    equal to the length of the current gap (plus one beat for the karlsson rule, which needs
+    the next beat). Processing a beat costs a constant time and memory is bounded by the
+    window size, whatever the length of the feed.
+
+    Parameters
+    ----------
+    window : int
+        Number of last NN-intervals on which features are computed.
+    low_rri : int
+        lowest RrInterval to be considered plausible.
+    high_rri : int
+        highest RrInterval to be considered plausible.
+    ectopic_beats_removal_method : str
+        method to use to clean outlier. malik, kamath, karlsson, acar or custom.
+    custom_removing_rule : float
+        Percentage criteria used by the custom, karlsson and acar rules.
+    pnni_as_percent: bool
+        whether to remove bias or not to compute pnni features.
+
+    Examples
+    --------
+    >>> hrv_stream = HrvStream(window=300)
+    >>> for rr_interval in rr_intervals_feed:
+    ...     hrv_stream.add_rr_intervals(rr_interval)
+    ...     time_domain_features = hrv_stream.get_time_domain_features()
+    """
+
+    def __init__(self, window: int = 300, low_rri: int = 300, high_rri: int = 2000,
+                 ectopic_beats_removal_method: str = KAMATH_RULE, custom_removing_rule: float = 0.2,
+                 pnni_as_percent: bool = True):
+        if ectopic_beats_removal_method not in [MALIK_RULE, KAMATH_RULE, KARLSSON_RULE, ACAR_RULE,
+                                                CUSTOM_RULE]:
+            raise ValueError("Not a valid method. Please choose between malik, kamath, karlsson, acar.\
+             You can also choose your own removing critera with custom_rule parameter.")
+        if window < 2:
+            raise ValueError("window must contain at least 2 NN-intervals")
+
+        self.window = window
+        self.low_rri = low_rri
+        self.high_rri = high_rri
+        self.method = ectopic_beats_removal_method
+        self.custom_removing_rule = custom_removing_rule
+        self.pnni_as_percent = pnni_as_percent
+
+        self._outliers_interpolator = _CausalLinearInterpolator()
+        self._ectopic_beats_interpolator = _CausalLinearInterpolator()
+        # State of ectopic beats rules : previous RR-intervals and whether last one was removed
+        self._previous_rr_intervals = deque(maxlen=ACAR_WINDOW if self.method == ACAR_RULE else 2)
+        self._previous_outlier = False
+
+        self._nn_intervals = deque()
+        self._nn_statistics = _RunningStatistics()
+        self._diff_statistics = _RunningStatistics()
+        self._hr_statistics = _RunningStatistics()
+        self._nni_50 = 0
+        self._nni_20 = 0
+        # Monotonic queues of (beat number, NN-interval) giving the window min and max
+        self._min_queue = deque()
+        self._max_queue = deque()
+        self._beat_count = 0
+
+    @property
+    def nn_intervals(self) -> np.ndarray:
+        """NN-intervals of the current window."""
+        return np.array(self._nn_intervals)
+
+    def add_rr_intervals(self, rr_intervals: Union[float, List[float]]) -> List[float]:
+        """
+        Cleans new RR-intervals and updates features.
+
+        Parameters
+        ----------
+        rr_intervals : float or list
+            a single RR-interval or a list of RR-intervals, in ms.
+
+        Returns
+        -------
+        nn_intervals : list
+            NN-intervals which could be emitted after receiving these RR-intervals.
+        """
+        nn_intervals = []
+        for rr_interval in np.atleast_1d(rr_intervals).tolist():
+            # Conversion RrInterval to Heart rate ==> rri (ms) =  1000 / (bpm / 60)
+            rr_interval = rr_interval if self.high_rri >= rr_interval >= self.low_rri else np.nan
+            for interpolated_rr_interval in self._outliers_interpolator.push(rr_interval):
+                nn_intervals.extend(self._push_to_ectopic_beats_rule(interpolated_rr_interval))
+        return self._add_nn_intervals(nn_intervals)
+
+    def flush(self) -> List[float]:
+        """
+        Emits the NN-intervals held back at the end of the feed, as get_nn_intervals does for the
+        end of a recording : trailing removed values are replaced by the last valid one.
+
+        Returns
+        -------
+        nn_intervals : list
+            NN-intervals emitted.
+        """
+        nn_intervals = []
+        for rr_interval in self._outliers_interpolator.flush():
+            nn_intervals.extend(self._push_to_ectopic_beats_rule(rr_interval))
+        if self.method == KARLSSON_RULE and len(self._previous_rr_intervals) == 2:
+            # Last RR-interval has no next one and is always kept
+            nn_intervals.extend(self._ectopic_beats_interpolator.push(self._previous_rr_intervals[-1]))
+            self._previous_rr_intervals.clear()
+        nn_intervals.extend(self._ectopic_beats_interpolator.flush())
+        return self._add_nn_intervals(nn_intervals)
+
+    def _push_to_ectopic_beats_rule(self, rr_interval: float) -> List[float]:
+        """Applies the ectopic beats rule to a new interpolated RR-interval."""
+        previous_rr_intervals = self._previous_rr_intervals
+        if self.method == KARLSSON_RULE:
+            # The decision on a beat is taken once the next beat is received
+            if len(previous_rr_intervals) < 2:
+                nn_interval = rr_interval if not previous_rr_intervals else None
+            else:
+                mean_prev_next_rri = (previous_rr_intervals[0] + rr_interval) / 2
+                is_valid = abs(mean_prev_next_rri - previous_rr_intervals[1]) < \
+                    self.custom_removing_rule * mean_prev_next_rri
+                nn_interval = previous_rr_intervals[1] if is_valid else np.nan
+            previous_rr_intervals.append(rr_interval)
+            if nn_interval is None:
+                return []
+
+        elif self.method == ACAR_RULE:
+            if len(previous_rr_intervals) < ACAR_WINDOW:
+                nn_interval = rr_interval
+            else:
+                window_nn_intervals = [nni for nni in previous_rr_intervals if nni == nni]
+                acar_rule_elt = sum(window_nn_intervals) / len(window_nn_intervals) \
+                    if window_nn_intervals else np.nan
+                is_valid = abs(acar_rule_elt - rr_interval) < self.custom_removing_rule * acar_rule_elt
+                nn_interval = rr_interval if is_valid else np.nan
+            # Acar rule compares to previous cleaned NN-intervals
+            previous_rr_intervals.append(nn_interval)
+
+        else:
+            if not previous_rr_intervals or self._previous_outlier:
+                nn_interval = rr_interval
+                self._previous_outlier = False
+            elif is_rr_interval_within_bounds(previous_rr_intervals[-1], rr_interval, method=self.method,
+                                              custom_rule=self.custom_removing_rule):
+                nn_interval = rr_interval
+            else:
+                nn_interval = np.nan
+                self._previous_outlier = True
+            previous_rr_intervals.append(rr_interval)
+
+        return self._ectopic_beats_interpolator.push(nn_interval)
+
+    def _add_nn_intervals(self, nn_intervals: List[float]) -> List[float]:
+        """Adds new NN-intervals to the window and updates running statistics."""
+        for nn_interval in nn_intervals:
+            if self._nn_intervals:
+                diff_nni = nn_interval - self._nn_intervals[-1]
+                self._diff_statistics.add(diff_nni)
+                self._nni_50 += abs(diff_nni) > 50
+                self._nni_20 += abs(diff_nni) > 20
+            self._nn_intervals.append(nn_interval)
+            self._nn_statistics.add(nn_interval)
+            self._hr_statistics.add(60000 / nn_interval)
+
+            while self._min_queue and self._min_queue[-1][1] >= nn_interval:
+                self._min_queue.pop()
+            self._min_queue.append((self._beat_count, nn_interval))
+            while self._max_queue and self._max_queue[-1][1] <= nn_interval:
+                self._max_queue.pop()
+            self._max_queue.append((self._beat_count, nn_interval))
+            self._beat_count += 1
+
+            if len(self._nn_intervals) > self.window:
+                self._remove_oldest_nn_interval()
+
+            # Running sums slowly accumulate rounding errors : they are periodically recomputed
+            if self._beat_count % self.window == 0:
+                self._nn_statistics.reset(self._nn_intervals)
+                self._diff_statistics.reset(np.diff(self._nn_intervals))
+                self._hr_statistics.reset(np.divide(60000, self._nn_intervals))
+        return nn_intervals
+
+    def _remove_oldest_nn_interval(self):
+        """Removes the oldest NN-interval of the window from running statistics."""
+        oldest_nn_interval = self._nn_intervals.popleft()
+        diff_nni = self._nn_intervals[0] - oldest_nn_interval
+        self._nn_statistics.remove(oldest_nn_interval)
+        self._diff_statistics.remove(diff_nni)
+        self._hr_statistics.remove(60000 / oldest_nn_interval)
+        self._nni_50 -= abs(diff_nni) > 50
+        self._nni_20 -= abs(diff_nni) > 20
+
+        oldest_beat = self._beat_count - self.window
+        for queue in (self._min_queue, self._max_queue):
+            while queue[0][0] < oldest_beat:
+                queue.popleft()
+
+    def get_time_domain_features(self) -> dict:
+        """
+        Returns a dictionary containing time domain features of the NN-intervals of the current
+        window. See get_time_domain_features for details about each feature. The median is not
+        computed as it can not be updated in constant time.
+
+        Returns
+        -------
+        time_domain_features : dict
+            dictionary containing time domain features for HRV analyses.
+        """
+        nn_count = len(self._nn_intervals)
+        if nn_count < 2:
+            raise ValueError("Not enough NN-intervals received to compute features")
+        length_int = nn_count - 1 if self.pnni_as_percent else nn_count
+
+        mean_nni = self._nn_statistics.mean()
+        sdnn = np.sqrt(self._nn_statistics.var(ddof=1))
+        rmssd = np.sqrt(self._diff_statistics.mean_square())
+        min_nni = self._min_queue[0][1]
+        max_nni = self._max_queue[0][1]
+
+        time_domain_features = {
+            'mean_nni': mean_nni,
+            'sdnn': sdnn,
+            'sdsd': np.sqrt(self._diff_statistics.var()),
+            'nni_50': self._nni_50,
+            'pnni_50': 100 * self._nni_50 / length_int,
+            'nni_20': self._nni_20,
+            'pnni_20': 100 * self._nni_20 / length_int,
+            'rmssd': rmssd,
+            'range_nni': max_nni - min_nni,
+            'cvsd': rmssd / mean_nni,
+            'cvnni': sdnn / mean_nni,
+            'mean_hr': self._hr_statistics.mean(),
+            "max_hr": 60000 / min_nni,
+            "min_hr": 60000 / max_nni,
+            "std_hr": np.sqrt(self._hr_statistics.var()),
+        }
+
+        return time_domain_features
+
+    def get_poincare_plot_features(self) -> dict:
+        """
+        Returns a dictionary containing Poincaré plot features of the NN-intervals of the current
+        window. See get_poincare_plot_features for details about each feature.
+
+        Returns
+        -------
+        poincare_plot_features : dict
+            Dictionary containing non linear domain features for hrV analyses.
+        """
+        if len(self._nn_intervals) < 3:
+            raise ValueError("Not enough NN-intervals received to compute features")
+        var_diff_nni = self._diff_statistics.var(ddof=1)
+        sd1 = np.sqrt(var_diff_nni * 0.5)
+        sd2 = np.sqrt(2 * self._nn_statistics.var(ddof=1) - 0.5 * var_diff_nni)
+
+        poincare_plot_features = {
+            'sd1': sd1,
+            'sd2': sd2,
+            'ratio_sd2_sd1': sd2 / sd1
+        }
+
+        return poincare_plot_features
+
+
+class _CausalLinearInterpolator:
+    """
+    Linear interpolation of nan values of a stream. Values are held back while a gap is open and
+    released, interpolated, when the next valid value is received. Leading nan values take the
+    first valid value, as in interpolate_nan_values.
+    """
+
+    def __init__(self):
+        self._last_valid_value = None
+        self._gap_length = 0
+
+    def push(self, value: float) -> List[float]:
+        if value != value:
+            self._gap_length += 1
+            return []
+        if self._last_valid_value is None:
+            values = [value] * self._gap_length
+        else:
+            slope = (value - self._last_valid_value) / (self._gap_length + 1)
+            values = [self._last_valid_value + slope * k for k in range(1, self._gap_length + 1)]
+        values.append(value)
+        self._last_valid_value = value
+        self._gap_length = 0
+        return values
+
+    def flush(self) -> List[float]:
+        if self._last_valid_value is None:
+            return []
+        values = [self._last_valid_value] * self._gap_length
+        self._gap_length = 0
+        return values
+
+
+class _RunningStatistics:
+    """
+    Sum and sum of squares of the values of a sliding window, updated in constant time. Values
+    are shifted by a reference value to limit cancellation errors in the variance.
+    """
+
+    def __init__(self):
+        self._reference = None
+        self._count = 0
+        self._sum = 0.
+        self._square_sum = 0.
+
+    def add(self, value: float):
+        if self._reference is None:
+            self._reference = value
+        shifted_value = value - self._reference
+        self._count += 1
+        self._sum += shifted_value
+        self._square_sum += shifted_value ** 2
+
+    def remove(self, value: float):
+        shifted_value = value - self._reference
+        self._count -= 1
+        self._sum -= shifted_value
+        self._square_sum -= shifted_value ** 2
+
+    def reset(self, values: List[float]):
+        values = np.asarray(values, dtype=float)
+        self._reference = float(np.mean(values)) if len(values) else None
+        shifted_values = values - (self._reference or 0.)
+        self._count = len(values)
+        self._sum = float(np.sum(shifted_values))
+        self._square_sum = float(np.sum(shifted_values ** 2))
+
+    def mean(self) -> float:
+        return self._reference + self._sum / self._count
+
+    def mean_square(self) -> float:
+        mean = self.mean()
+        return self.var() + mean ** 2
+
+    def var(self, ddof: int = 0) -> float:
+        return max(self._square_sum - self._sum ** 2 / self._count, 0.) / (self._count - ddof)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides methods to extract features on sliding windows (epochs) of Normal to
+ Normal Intervals for heart rate variability analysis."""
+
+from typing import List, Tuple
+from collections import namedtuple
+import numpy as np
+from hrvanalysis.extract_features import (resample_nn_intervals, _get_band_powers, VlfBand, LfBand,
+                                          HfBand)
+from hrvanalysis.profiling import profile_stage
+
+# limit functions that user might import using "from hrv-analysis import *"
+__all__ = ["get_sliding_window_features", "get_spectrogram_features"]
+
+# Units in which window_length and step can be given
+BEATS_UNIT = "beats"
+SECONDS_UNIT = "seconds"
+
+# Maximum number of resampled values whose FFT is computed at once by get_spectrogram_features,
+# to bound the memory used by the frames of long recordings
+SPECTROGRAM_CHUNK_SIZE = 2 ** 20
+
+
+def get_sliding_window_features(nn_intervals: List[float], window_length: float, step: float,
+                                unit: str = BEATS_UNIT, pnni_as_percent: bool = True) -> dict:
+    """
+    Returns a dictionary containing time domain and Poincaré plot features computed on sliding
+    windows (epochs) of the NN-intervals, for example 5 minutes windows every 30 seconds.
+
+    Features are derived from cumulative sums and counts computed once over the whole
+    recording : each window only costs a few subtractions, whatever its length and overlap with
+    the previous one.
+
+    Parameters
+    ----------
+    nn_intervals : list
+        list of Normal to Normal Interval
+    window_length : float
+        Length of each window, in beats or in seconds depending on unit.
+    step : float
+        Shift between the start of two consecutive windows, in beats or in seconds depending
+        on unit.
+    unit : str
+        Unit of window_length and step, "beats" or "seconds". In seconds, a window contains the
+        NN-intervals ending inside it.
+    pnni_as_percent: bool
+        whether to remove bias or not to compute pnni features.
+
+    Returns
+    -------
+    sliding_window_features : dict
+        Dictionary mapping each feature name to an array containing its value for every window.
+        window_start and window_end give the indexes of the NN-intervals of each window,
+        nn_intervals[window_start:window_end]. Features which can not be computed on a window,
+        for example because it contains less than 2 NN-intervals, are set to nan.
+
+    Notes
+    -----
+    Features are the same as the ones from get_time_domain_features and
+    get_poincare_plot_features : mean_nni, sdnn, sdsd, rmssd, nni_50, pnni_50, nni_20, pnni_20,
+    range_nni, cvsd, cvnni, mean_hr, max_hr, min_hr, std_hr, sd1, sd2 and ratio_sd2_sd1.
+    """
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    window_start, window_end = _get_window_indexes(nn_intervals, window_length, step, unit)
+    return _get_window_features(nn_intervals, window_start, window_end, pnni_as_percent)
+
+
+def _get_window_features(nn_intervals: np.ndarray, window_start: np.ndarray, window_end: np.ndarray,
+                         pnni_as_percent: bool = True) -> dict:
+    """
+    Computes the features of get_sliding_window_features on the windows
+    nn_intervals[window_start:window_end], whatever the way these windows have been chosen.
+    """
+    window_length = (window_end - window_start).astype(float)
+    window_length[window_length < 2] = np.nan
+    diff_length = window_length - 1
+    length_int = diff_length if pnni_as_percent else window_length
+
+    diff_nni = np.diff(nn_intervals)
+    # Successive differences of a window are diff_nni[window_start:window_end - 1]
+    diff_end = np.maximum(window_end - 1, window_start)
+
+    mean_nni, var_nni = _get_window_mean_var(nn_intervals, window_start, window_end, ddof=1)
+    _, var_diff_nni = _get_window_mean_var(diff_nni, window_start, diff_end, ddof=1)
+    _, biased_var_diff_nni = _get_window_mean_var(diff_nni, window_start, diff_end, ddof=0)
+    rmssd = np.sqrt(_get_window_sum(diff_nni ** 2, window_start, diff_end) / diff_length)
+    sdsd = np.sqrt(biased_var_diff_nni)
+
+    nni_50 = _get_window_sum(np.abs(diff_nni) > 50, window_start, diff_end)
+    nni_20 = _get_window_sum(np.abs(diff_nni) > 20, window_start, diff_end)
+
+    sdnn = np.sqrt(var_nni)
+    min_nni = _get_window_extremum(nn_intervals, window_start, window_end, np.minimum)
+    max_nni = _get_window_extremum(nn_intervals, window_start, window_end, np.maximum)
+
+    heart_rate = np.divide(60000, nn_intervals)
+    mean_hr, var_hr = _get_window_mean_var(heart_rate, window_start, window_end, ddof=0)
+
+    sd1 = np.sqrt(var_diff_nni * 0.5)
+    # Rounding errors of the variances may make the difference slightly negative
+    sd2 = np.sqrt(np.maximum(2 * var_nni - 0.5 * var_diff_nni, 0))
+
+    sliding_window_features = {
+        'window_start': window_start,
+        'window_end': window_end,
+        'mean_nni': mean_nni,
+        'sdnn': sdnn,
+        'sdsd': sdsd,
+        'nni_50': nni_50,
+        'pnni_50': 100 * nni_50 / length_int,
+        'nni_20': nni_20,
+        'pnni_20': 100 * nni_20 / length_int,
+        'rmssd': rmssd,
+        'range_nni': max_nni - min_nni,
+        'cvsd': rmssd / mean_nni,
+        'cvnni': sdnn / mean_nni,
+        'mean_hr': mean_hr,
+        'max_hr': np.divide(60000, min_nni),
+        'min_hr': np.divide(60000, max_nni),
+        'std_hr': np.sqrt(var_hr),
+        'sd1': sd1,
+        'sd2': sd2,
+        'ratio_sd2_sd1': sd2 / sd1
+    }
+
+    return sliding_window_features
+
+
+def _get_window_indexes(nn_intervals: np.ndarray, window_length: float, step: float,
+                        unit: str = BEATS_UNIT) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the index of the first NN-interval of each window and the index following the last
+    one. Only complete windows are returned.
+
+    Parameters
+    ----------
+    nn_intervals : array
+        array of Normal to Normal Interval
+    window_length : float
+        Length of each window, in beats or in seconds depending on unit.
+    step : float
+        Shift between the start of two consecutive windows, in beats or in seconds.
+    unit : str
+        Unit of window_length and step, "beats" or "seconds".
+
+    Returns
+    -------
+    window_start : array
+        index of the first NN-interval of each window.
+    window_end : array
+        index following the last NN-interval of each window.
+    """
+    if window_length <= 0 or step <= 0:
+        raise ValueError("window_length and step must be strictly positive")
+
+    if unit == BEATS_UNIT:
+        window_start = np.arange(0, len(nn_intervals) - int(window_length) + 1, int(step))
+        window_end = window_start + int(window_length)
+    elif unit == SECONDS_UNIT:
+        # Time in seconds at the end of each NN-interval
+        nni_end_time = np.cumsum(nn_intervals) / 1000
+        duration = nni_end_time[-1] if len(nni_end_time) else 0
+        window_count = int(np.floor((duration - window_length) / step)) + 1 \
+            if duration >= window_length else 0
+        window_start_time = np.arange(window_count) * step
+        window_start = np.searchsorted(nni_end_time, window_start_time, side="right")
+        window_end = np.searchsorted(nni_end_time, window_start_time + window_length, side="right")
+    else:
+        raise ValueError("Not a valid unit. Choose between 'beats' and 'seconds'")
+    return window_start, window_end
+
+
+def _get_window_sum(values: np.ndarray, window_start: np.ndarray, window_end: np.ndarray) -> np.ndarray:
+    """Sum of values in each window, from the cumulative sum of values."""
+    cumulative_sum = np.concatenate(([0], np.cumsum(values)))
+    return cumulative_sum[window_end] - cumulative_sum[window_start]
+
+
+def _get_window_mean_var(values: np.ndarray, window_start: np.ndarray, window_end: np.ndarray,
+                         ddof: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and variance of values in each window, from cumulative sums of values and squared
+    values. Values are centered beforehand to limit cancellation errors in the variance.
+    Windows of constant values, detected from the exact count of changes between successive
+    values, get their first value as mean and a variance of exactly 0.
+    """
+    length = (window_end - window_start).astype(float)
+    length[length <= ddof] = np.nan
+    reference = np.mean(values) if len(values) else 0.
+    centered_values = values - reference
+
+    window_sum = _get_window_sum(centered_values, window_start, window_end)
+    window_square_sum = _get_window_sum(centered_values ** 2, window_start, window_end)
+
+    mean = reference + window_sum / length
+    var = np.maximum(window_square_sum - window_sum ** 2 / length, 0) / (length - ddof)
+
+    # Changes of a window are the ones between values[window_start:window_end]
+    change_count = _get_window_sum(np.diff(values) != 0, window_start,
+                                   np.maximum(window_end - 1, window_start))
+    is_constant = (change_count == 0) & (window_end > window_start)
+    mean[is_constant] = values[window_start[is_constant]]
+    var[is_constant & ~np.isnan(var)] = 0.
+    return mean, var
+
+
+def _get_window_extremum(values: np.ndarray, window_start: np.ndarray, window_end: np.ndarray,
+                         extremum_function=np.minimum) -> np.ndarray:
+    """
+    Minimum or maximum of values in each window, answered in constant time per window from a
+    sparse table of extrema over windows of length power of two.
+    """
+    window_extremum = np.full(len(window_start), np.nan)
+    length = window_end - window_start
+    is_not_empty = length > 0
+    if not np.any(is_not_empty):
+        return window_extremum
+
+    window_start, window_end, length = (window_start[is_not_empty], window_end[is_not_empty],
+                                        length[is_not_empty])
+    level = np.floor(np.log2(length)).astype(int)
+
+    sparse_table = [values]
+    for _ in range(level.max()):
+        previous_level = sparse_table[-1]
+        half = 2 ** (len(sparse_table) - 1)
+        sparse_table.append(extremum_function(previous_level[:-half], previous_level[half:]))
+
+    for table_level in np.unique(level):
+        in_level = level == table_level
+        table = sparse_table[table_level]
+        window_extremum[np.flatnonzero(is_not_empty)[in_level]] = extremum_function(
+            table[window_start[in_level]], table[window_end[in_level] - 2 ** table_level])
+    return window_extremum
+
+
+def get_spectrogram_features(nn_intervals: List[float], window_length: float = 300,
+                             step: float = 30, sampling_frequency: int = 4,
+                             interpolation_method: str = "linear",
+                             vlf_band: namedtuple = VlfBand(0.003, 0.04),
+                             lf_band: namedtuple = LfBand(0.04, 0.15),
+                             hf_band: namedtuple = HfBand(0.15, 0.40), nfft: int = None,
+                             window_function="hann", detrend="constant",
+                             return_psd: bool = False) -> dict:
+    """
+    Returns a dictionary containing frequency domain features computed on sliding windows
+    (epochs) of the NN-intervals, for example LF, HF and LF/HF ratio trends over a night from
+    5 minutes windows every 30 seconds.
+
+    NN-intervals are resampled once on a regular time grid, as done by
+    get_frequency_domain_features. Windows are then views on the resampled signal, and the power
+    spectral densities of all windows are computed with a single batched FFT (short-time
+    Fourier transform), by chunks of windows for long recordings.
+
+    Parameters
+    ----------
+    nn_intervals : list
+        list of Normal to Normal Interval
+    window_length : float
+        Length of each window, in seconds.
+    step : float
+        Shift between the start of two consecutive windows, in seconds.
+    sampling_frequency : int
+        Frequency at which the signal is resampled, by default set to 4 Hz.
+    interpolation_method : str
+        kind of interpolation as a string, by default "linear".
+    vlf_band : tuple
+        Very low frequency bands for features extraction from power spectral density.
+    lf_band : tuple
+        Low frequency bands for features extraction from power spectral density.
+    hf_band : tuple
+        High frequency bands for features extraction from power spectral density.
+    nfft : int
+        Length of the FFT of each window. By default, the smallest power of two greater or equal
+        to the number of samples of a window.
+    window_function : str, tuple or array
+        Window applied to each window of samples, as accepted by scipy.signal.get_window, by
+        default "hann".
+    detrend : str or False
+        Detrending applied to each window of samples, "constant", "linear" or False.
+    return_psd : bool
+        whether to return the frequencies and the power spectral density of every window.
+
+    Returns
+    -------
+    spectrogram_features : dict
+        Dictionary mapping each feature name to an array containing its value for every window.
+        window_start_time and window_end_time give the time of each window in seconds, from the
+        end of the first NN-interval. If return_psd is True, freq is the array of frequencies
+        and psd the array of shape (number of windows, number of frequencies) of power spectral
+        densities.
+
+    Notes
+    -----
+    Features are the same as the ones from get_frequency_domain_features : vlf, lf, hf,
+    lf_hf_ratio, lfnu, hfnu and total_power. The power spectral density of each window is
+    the one scipy.signal.welch computes with a single segment as long as the window, which is
+    also the one of scipy.signal.spectrogram.
+    """
+    if window_length <= 0 or step <= 0:
+        raise ValueError("window_length and step must be strictly positive")
+    nperseg = int(round(window_length * sampling_frequency))
+    step_samples = max(int(round(step * sampling_frequency)), 1)
+    if nfft is None:
+        nfft = 2 ** int(np.ceil(np.log2(max(nperseg, 1))))
+    elif nfft < nperseg:
+        raise ValueError("nfft must be greater or equal to the number of samples of a window")
+
+    nn_intervals = np.asarray(nn_intervals, dtype=float)
+    with profile_stage("spectrogram.interpolation", len(nn_intervals)):
+        nni_interpolation = resample_nn_intervals(nn_intervals, sampling_frequency=sampling_frequency,
+                                                  interpolation_method=interpolation_method) \
+            if len(nn_intervals) else np.empty(0)
+    window_count = (len(nni_interpolation) - nperseg) // step_samples + 1 \
+        if len(nni_interpolation) >= nperseg else 0
+
+    from scipy import signal
+    taper = signal.get_window(window_function, nperseg)
+    # Density scaling of scipy.signal.welch, one-sided : power of positive and negative
+    # frequencies are summed, except for 0 Hz and, for even nfft, the Nyquist frequency
+    scale = np.full(nfft // 2 + 1, 2 / (sampling_frequency * np.sum(taper ** 2)))
+    scale[0] /= 2
+    if nfft % 2 == 0:
+        scale[-1] /= 2
+    freq = np.fft.rfftfreq(nfft, 1 / sampling_frequency)
+
+    lows = np.array([vlf_band[0], lf_band[0], hf_band[0]], dtype=float)
+    highs = np.array([vlf_band[1], lf_band[1], hf_band[1]], dtype=float)
+    band_powers = np.empty((window_count, 3))
+    psd = np.empty((window_count, len(freq))) if return_psd else None
+
+    # Read-only view of every window of samples, without copy
+    sample_stride = nni_interpolation.strides[0]
+    frames = np.lib.stride_tricks.as_strided(nni_interpolation, shape=(window_count, nperseg),
+                                             strides=(step_samples * sample_stride, sample_stride),
+                                             writeable=False) \
+        if window_count else np.empty((0, nperseg))
+    chunk_window_count = max(SPECTROGRAM_CHUNK_SIZE // max(nfft, 1), 1)
+    for start in range(0, window_count, chunk_window_count):
+        end = min(start + chunk_window_count, window_count)
+        with profile_stage("spectrogram.fft", (end - start) * nperseg):
+            chunk_frames = signal.detrend(frames[start:end], type=detrend, axis=-1) if detrend \
+                else np.array(frames[start:end])
+            chunk_frames *= taper
+            spectrum = np.fft.rfft(chunk_frames, n=nfft, axis=-1)
+            chunk_psd = (spectrum.real ** 2 + spectrum.imag ** 2) * scale
+        with profile_stage("spectrogram.band_integration", (end - start) * len(freq)):
+            band_powers[start:end] = _get_band_powers(freq, chunk_psd, lows, highs)[0]
+        if return_psd:
+            psd[start:end] = chunk_psd
+
+    vlf, lf, hf = band_powers.T
+    window_start_time = np.arange(window_count) * step_samples / sampling_frequency
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spectrogram_features = {
+            'window_start_time': window_start_time,
+            'window_end_time': window_start_time + nperseg / sampling_frequency,
+            'lf': lf,
+            'hf': hf,
+            'lf_hf_ratio': lf / hf,
+            'lfnu': (lf / (lf + hf)) * 100,
+            'hfnu': (hf / (lf + hf)) * 100,
+            'total_power': vlf + lf + hf,
+            'vlf': vlf
+        }
+    if return_psd:
+        spectrogram_features.update(freq=freq, psd=psd)
+
+    return spectrogram_features
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""This script provides methods to test batch methods."""
+
+import os
+import unittest
+import numpy as np
+from hrvanalysis.extract_features import (get_time_domain_features, get_geometrical_features,
+                                          get_poincare_plot_features, get_csi_cvi_features,
+                                          get_frequency_domain_features)
+from hrvanalysis.batch import get_batch_features, flatten_batch
+
+
+TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
+
+
+def load_test_data(path):
+    # Load test rr_intervals data
+    with open(path, "r") as text_file:
+        lines = text_file.readlines()
+    nn_intervals = list(map(lambda x: int(x.strip()), lines))
+    return nn_intervals
+
+
+class BatchTestCase(unittest.TestCase):
+    """Class for UniTests of different methods in batch module"""
+
+    def setUp(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        self.recordings = [nn_intervals[:300], nn_intervals[300:750], nn_intervals[750:]]
+
+    def test_if_batch_features_are_equal_to_single_recording_features(self):
+        batch_features = get_batch_features(self.recordings)
+        for i, nn_intervals in enumerate(self.recordings):
+            features = {**get_time_domain_features(nn_intervals),
+                        **get_geometrical_features(nn_intervals),
+                        **get_poincare_plot_features(nn_intervals),
+                        **get_csi_cvi_features(nn_intervals),
+                        **get_frequency_domain_features(nn_intervals)}
+            for feature_name, value in features.items():
+                self.assertAlmostEqual(batch_features[feature_name][i], value, places=8)
+
+    def test_if_values_and_offsets_give_same_features_as_list_of_recordings(self):
+        values, offsets = flatten_batch(self.recordings)
+        self.assertEqual(list(offsets), [0, 300, 750, 1000])
+        features_from_list = get_batch_features(self.recordings, frequency_domain=False)
+        features_from_offsets = get_batch_features(values, offsets=offsets, frequency_domain=False)
+        for feature_name, values in features_from_list.items():
+            np.testing.assert_array_equal(values, features_from_offsets[feature_name])
+
+    def test_if_batch_lomb_features_on_fixed_grid_are_equal_to_single_recording_features(self):
+        lomb_frequencies = np.linspace(0.003, 0.4, 512)
+        batch_features = get_batch_features(self.recordings, method="lomb",
+                                            lomb_frequencies=lomb_frequencies)
+        for i, nn_intervals in enumerate(self.recordings):
+            features = get_frequency_domain_features(nn_intervals, method="lomb",
+                                                     lomb_frequencies=lomb_frequencies)
+            for feature_name, value in features.items():
+                self.assertAlmostEqual(batch_features[feature_name][i], value, places=6)
+
+    def test_if_too_short_recording_raises_error(self):
+        with self.assertRaises(ValueError):
+            get_batch_features([[800, 810, 820], [800]])
+
+
+if __name__ == '__main__':
+    unittest.main()
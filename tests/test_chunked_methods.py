@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""This script provides methods to test chunked methods."""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from hrvanalysis.preprocessing import get_nn_intervals
+from hrvanalysis.windowing import get_sliding_window_features
+from hrvanalysis.chunked import read_rr_intervals, HrvChunkCleaner, get_chunked_epoch_features
+
+
+TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
+
+
+def load_test_data(path):
+    # Load test rr_intervals data
+    with open(path, "r") as text_file:
+        lines = text_file.readlines()
+    nn_intervals = list(map(lambda x: int(x.strip()), lines))
+    return nn_intervals
+
+
+class ChunkedTestCase(unittest.TestCase):
+    """Class for UniTests of different methods in chunked module"""
+
+    def test_if_chunks_are_read_from_text_npy_and_binary_files(self):
+        rr_intervals = np.array(load_test_data(TEST_DATA_FILENAME), dtype=np.float32)
+        with tempfile.TemporaryDirectory() as directory:
+            npy_path = os.path.join(directory, "rr_intervals.npy")
+            binary_path = os.path.join(directory, "rr_intervals.bin")
+            np.save(npy_path, rr_intervals)
+            rr_intervals.tofile(binary_path)
+            for path, dtype in [(TEST_DATA_FILENAME, None), (npy_path, None), (binary_path, "float32")]:
+                chunks = list(read_rr_intervals(path, chunk_size=300, dtype=dtype))
+                self.assertEqual([len(chunk) for chunk in chunks], [300, 300, 300, 100])
+                np.testing.assert_array_equal(np.concatenate(chunks), rr_intervals)
+            with self.assertRaises(ValueError):
+                read_rr_intervals(binary_path)
+
+    def test_if_chunk_cleaning_is_equal_to_get_nn_intervals(self):
+        rri_list = [700, 600, 2300, 1000, 1000, 230, 1200, 800, 810, 1300, 820, 815, 200,
+                    790, 800, 805, 1500, 810, 2500, 2500, 820, 800, 100]
+        for method in ["malik", "kamath", "karlsson", "acar", "custom"]:
+            expected_nn_intervals = get_nn_intervals(rri_list, verbose=False,
+                                                     ectopic_beats_removal_method=method)
+            for chunk_size in [1, 2, 5, len(rri_list)]:
+                cleaner = HrvChunkCleaner(ectopic_beats_removal_method=method)
+                nn_intervals = [cleaner.add_rr_intervals(rri_list[start:start + chunk_size])
+                                for start in range(0, len(rri_list), chunk_size)]
+                nn_intervals = np.concatenate(nn_intervals + [cleaner.flush()])
+                np.testing.assert_allclose(nn_intervals, expected_nn_intervals)
+
+    def test_if_epoch_features_are_equal_to_sliding_window_features(self):
+        rr_intervals = load_test_data(TEST_DATA_FILENAME)
+        nn_intervals = get_nn_intervals(rr_intervals, verbose=False)
+        for epoch, unit in [(60, "seconds"), (100, "beats")]:
+            expected_features = get_sliding_window_features(nn_intervals, window_length=epoch,
+                                                            step=epoch, unit=unit)
+            epoch_features = get_chunked_epoch_features(TEST_DATA_FILENAME, epoch=epoch, unit=unit,
+                                                        chunk_size=77)
+            self.assertEqual(epoch_features.keys(), expected_features.keys())
+            for feature_name, values in expected_features.items():
+                np.testing.assert_allclose(epoch_features[feature_name], values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,10 +5,23 @@ import os
 import unittest
 import numpy as np
 import pandas as pd
+import nolds
 from hrvanalysis.extract_features import (get_time_domain_features, get_geometrical_features,
                                           _create_interpolated_timestamp_list, get_sampen,
                                           get_csi_cvi_features, get_poincare_plot_features,
-                                          get_frequency_domain_features)
+                                          get_frequency_domain_features, clear_psd_cache,
+                                          get_psd_cache_info, set_psd_cache_max_bytes,
+                                          DEFAULT_PSD_CACHE_MAX_BYTES, LfBand, HfBand,
+                                          get_lomb_psd, _create_timestamp_list,
+                                          resample_nn_intervals, _get_auto_welch_sizes,
+                                          _get_freq_psd_from_nn_intervals, VlfBand,
+                                          get_multiscale_entropy, get_dfa_features,
+                                          get_all_features, get_frequency_bands_features,
+                                          FrequencyBand, _compare_sorted_templates,
+                                          _count_templates_in_boxes)
+from scipy import interpolate
+from scipy import signal
+from astropy.timeseries import LombScargle
 
 
 TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
@@ -74,10 +87,24 @@ class ExtractFeaturesTestCase(unittest.TestCase):
         nn_intervals = load_test_data(TEST_DATA_FILENAME)
         function_geometrical_domain_features = get_geometrical_features(nn_intervals)
         real_function_geometrical_domain_features = {'triangular_index': 11.363636363636363,
-                                                     'tinn': None}
+                                                     'tinn': 184.0}
         self.assertAlmostEqual(function_geometrical_domain_features,
                                real_function_geometrical_domain_features)
 
+    def test_if_tinn_is_the_base_of_a_triangular_histogram(self):
+        # Histogram 1, 2, 3, 4, 3, 2, 1 from the 3rd bin : the triangle is 0 at the 2nd and 10th bins
+        histogram = [0, 0, 1, 2, 3, 4, 3, 2, 1]
+        nn_intervals = [300 + 8 * bin_index + 4 for bin_index, count in enumerate(histogram)
+                        for _ in range(count)]
+        self.assertEqual(get_geometrical_features(nn_intervals)["tinn"], 64)
+
+    def test_if_bincount_histogram_is_equal_to_numpy_histogram(self):
+        nn_intervals = np.concatenate((load_test_data(TEST_DATA_FILENAME), [300, 1984, 1992, 1995]))
+        for bin_width in [8, 7.8125]:
+            self.assertEqual(get_geometrical_features(nn_intervals, bin_width=bin_width),
+                             get_geometrical_features(nn_intervals, bin_width=bin_width,
+                                                      histogram_method="numpy"))
+
     # TODO : check why there is not equality between arrays
     # def test_if_time_info_created_is_correct(self):
     #     nn_intervals = [900, 1000, 1100, 1000, 950, 850]
@@ -117,6 +144,75 @@ class ExtractFeaturesTestCase(unittest.TestCase):
         sampen_plot_features = {'sampen': 1.2046675751816824}
         self.assertAlmostEqual(function_sampen_features, sampen_plot_features)
 
+    def test_if_sampen_is_equal_to_nolds(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        for emb_dim, tolerance in [(2, None), (1, 10.), (3, 25.)]:
+            self.assertEqual(get_sampen(nn_intervals, emb_dim=emb_dim, tolerance=tolerance)["sampen"],
+                             nolds.sampen(nn_intervals, emb_dim=emb_dim, tolerance=tolerance))
+
+    def test_if_template_matches_counted_in_boxes_are_equal_to_compared_ones(self):
+        nn_intervals = np.array(load_test_data(TEST_DATA_FILENAME), dtype=float)
+        # Rounded values have ties and differences equal to the tolerance
+        rounded_nni = np.round(nn_intervals, -1)
+        for values, emb_dim, tolerance in [(nn_intervals, 2, 0.2 * np.std(nn_intervals)),
+                                           (rounded_nni, 1, 30.), (rounded_nni, 2, 30.),
+                                           (rounded_nni + 0.1, 3, 30.)]:
+            self.assertEqual(_count_templates_in_boxes(values, emb_dim, tolerance),
+                             _compare_sorted_templates(values, emb_dim, tolerance))
+        templates = np.stack([rounded_nni[:-2], rounded_nni[1:-1], rounded_nni[2:]], axis=1)
+        distances = np.max(np.abs(templates[:, np.newaxis] - templates[np.newaxis]), axis=2)
+        match_count = (np.count_nonzero(distances < 30.) - len(templates)) // 2
+        self.assertEqual(_count_templates_in_boxes(rounded_nni, 2, 30.)[1], match_count)
+
+    def test_if_multiscale_entropy_is_equal_to_nolds_on_coarse_grained_series(self):
+        nn_intervals = np.array(load_test_data(TEST_DATA_FILENAME), dtype=float)
+        tolerance = 0.2 * np.std(nn_intervals, ddof=1)
+        multiscale_entropy = get_multiscale_entropy(nn_intervals, max_scale=3, tolerance=tolerance)
+        for scale in [1, 2, 3]:
+            coarse_grained_nni = nn_intervals[:len(nn_intervals) // scale * scale].reshape(-1, scale).mean(axis=1)
+            self.assertAlmostEqual(multiscale_entropy["mse_{}".format(scale)],
+                                   nolds.sampen(coarse_grained_nni, emb_dim=2, tolerance=tolerance))
+        self.assertEqual(multiscale_entropy["mse_1"],
+                         get_sampen(nn_intervals, tolerance=tolerance)["sampen"])
+
+    def test_if_dfa_features_are_equal_to_nolds(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        dfa_features = get_dfa_features(nn_intervals)
+        self.assertAlmostEqual(dfa_features["dfa_alpha1"],
+                               nolds.dfa(nn_intervals, nvals=list(range(4, 17)), overlap=False,
+                                         fit_exp="poly"))
+        self.assertAlmostEqual(dfa_features["dfa_alpha2"],
+                               nolds.dfa(nn_intervals, nvals=list(range(16, 65)), overlap=False,
+                                         fit_exp="poly"))
+
+    def test_if_all_features_are_equal_to_features_of_each_group(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        expected_features = {}
+        for features in [get_time_domain_features(nn_intervals),
+                         get_geometrical_features(nn_intervals),
+                         get_frequency_domain_features(nn_intervals),
+                         get_poincare_plot_features(nn_intervals),
+                         get_csi_cvi_features(nn_intervals), get_sampen(nn_intervals),
+                         get_multiscale_entropy(nn_intervals), get_dfa_features(nn_intervals)]:
+            expected_features.update(features)
+        self.assertEqual(get_all_features(nn_intervals), expected_features)
+
+    def test_if_only_selected_feature_groups_are_computed(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        all_features = get_all_features(nn_intervals, feature_groups=["csi_cvi", "sampen"])
+        self.assertEqual(all_features, dict(get_csi_cvi_features(nn_intervals),
+                                            **get_sampen(nn_intervals)))
+        with self.assertRaises(ValueError):
+            get_all_features(nn_intervals, feature_groups=["time"])
+
+    def test_if_features_of_float32_arrays_are_computed_in_double_precision(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        nn_intervals_float32 = np.array(nn_intervals, dtype=np.float32)
+        self.assertEqual(get_time_domain_features(nn_intervals_float32),
+                         get_time_domain_features(nn_intervals))
+        self.assertEqual(get_frequency_domain_features(nn_intervals_float32),
+                         get_frequency_domain_features(nn_intervals))
+
     def test_if_get_frequency_domain_features_handles_pandas_series(self):
 
         # TODO: Investigate: extract_features.py:432: RuntimeWarning: invalid value encountered in double_scalars
@@ -127,6 +223,142 @@ class ExtractFeaturesTestCase(unittest.TestCase):
         except KeyError:
             self.fail()
 
+    def test_if_psd_is_reused_when_bands_change(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        clear_psd_cache()
+        frequency_domain_features = get_frequency_domain_features(nn_intervals)
+        other_bands_features = get_frequency_domain_features(nn_intervals, lf_band=LfBand(0.05, 0.15),
+                                                             hf_band=HfBand(0.15, 0.5))
+        psd_cache_info = get_psd_cache_info()
+        self.assertEqual((psd_cache_info["hits"], psd_cache_info["misses"]), (1, 1))
+        self.assertEqual(frequency_domain_features["vlf"], other_bands_features["vlf"])
+        self.assertNotEqual(frequency_domain_features["lf"], other_bands_features["lf"])
+
+    def test_if_band_bank_powers_are_equal_to_frequency_domain_features(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        clear_psd_cache()
+        frequency_domain_features = get_frequency_domain_features(nn_intervals)
+        frequency_bands_features = get_frequency_bands_features(nn_intervals)
+        psd_cache_info = get_psd_cache_info()
+        self.assertEqual((psd_cache_info["hits"], psd_cache_info["misses"]), (1, 1))
+        for band in ["vlf", "lf", "hf"]:
+            self.assertAlmostEqual(frequency_bands_features[band], frequency_domain_features[band])
+
+        freq, psd = _get_freq_psd_from_nn_intervals(nn_intervals)
+        lf_indexes = (freq >= 0.04) & (freq < 0.15)
+        self.assertEqual(frequency_bands_features["lf_peak"],
+                         freq[lf_indexes][np.argmax(psd[lf_indexes])])
+        all_indexes = freq < 0.40
+        self.assertAlmostEqual(frequency_bands_features["total_power"],
+                               np.trapz(psd[all_indexes], freq[all_indexes]))
+        self.assertAlmostEqual(frequency_bands_features["hf_relative"],
+                               frequency_domain_features["hf"] / frequency_bands_features["total_power"])
+
+    def test_if_band_bank_accepts_overlapping_and_empty_bands(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        bands = [FrequencyBand("lf", 0.04, 0.15), ("lf1", 0.04, 0.09), ("lf2", 0.09, 0.15),
+                 ("empty", 0.1001, 0.1002)]
+        frequency_bands_features = get_frequency_bands_features(nn_intervals, bands=bands)
+        self.assertAlmostEqual(frequency_bands_features["lf_relative"], 1)
+        self.assertGreater(frequency_bands_features["lf"], frequency_bands_features["lf1"])
+        self.assertEqual(frequency_bands_features["empty"], 0)
+        self.assertTrue(np.isnan(frequency_bands_features["empty_peak"]))
+        with self.assertRaises(ValueError):
+            get_frequency_bands_features(nn_intervals, bands=[("lf", 0.15, 0.04)])
+
+    def test_if_psd_cache_evicts_least_recently_used_psd(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        clear_psd_cache()
+        try:
+            # Welch PSD with nfft 4096 holds 2 arrays of 2049 floats
+            set_psd_cache_max_bytes(2 * 2 * 2049 * 8)
+            for sampling_frequency in [4, 5, 6]:
+                get_frequency_domain_features(nn_intervals, sampling_frequency=sampling_frequency)
+            get_frequency_domain_features(nn_intervals, sampling_frequency=6)
+            get_frequency_domain_features(nn_intervals, sampling_frequency=4)
+            psd_cache_info = get_psd_cache_info()
+            self.assertEqual(psd_cache_info["entries"], 2)
+            self.assertEqual((psd_cache_info["hits"], psd_cache_info["misses"]), (1, 4))
+        finally:
+            set_psd_cache_max_bytes(DEFAULT_PSD_CACHE_MAX_BYTES)
+
+    def test_if_lomb_psd_is_equal_to_astropy_fast_method(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        lomb_frequencies = np.linspace(0.003, 0.4, 256)
+        astropy_psd = LombScargle(_create_timestamp_list(nn_intervals), nn_intervals,
+                                  normalization='psd').power(lomb_frequencies, method="fast",
+                                                             assume_regular_frequency=True)
+        np.testing.assert_allclose(get_lomb_psd(nn_intervals, lomb_frequencies), astropy_psd,
+                                   rtol=1e-8)
+
+    def test_if_batched_lomb_psd_is_equal_to_single_recording_psd(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        recordings = [nn_intervals[:400], nn_intervals[400:]]
+        lomb_frequencies = np.linspace(0.003, 0.4, 256)
+        batch_psd = get_lomb_psd(recordings, lomb_frequencies)
+        self.assertEqual(batch_psd.shape, (2, 256))
+        for recording, psd in zip(recordings, batch_psd):
+            np.testing.assert_allclose(psd, get_lomb_psd(recording, lomb_frequencies))
+
+    def test_if_given_lomb_frequencies_are_still_writeable_after_caching(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        clear_psd_cache()
+        lomb_frequencies = np.linspace(0.003, 0.4, 500)
+        get_frequency_domain_features(nn_intervals, method="lomb", lomb_frequencies=lomb_frequencies)
+        self.assertTrue(lomb_frequencies.flags.writeable)
+        lomb_frequencies[0] = 0.004
+        freq, psd = _get_freq_psd_from_nn_intervals(nn_intervals, method="lomb",
+                                                    lomb_frequencies=np.linspace(0.003, 0.4, 500))
+        self.assertFalse(freq.flags.writeable or psd.flags.writeable)
+
+    def test_if_irregular_lomb_frequencies_raises_error(self):
+        with self.assertRaises(ValueError):
+            get_lomb_psd([800, 810, 790, 805], [0.01, 0.02, 0.05])
+
+    def test_if_lomb_frequencies_starting_at_zero_raises_error(self):
+        with self.assertRaises(ValueError):
+            get_lomb_psd([800, 810, 790, 805], np.linspace(0, 0.4, 5))
+
+    def test_if_resampled_nn_intervals_are_equal_to_interp1d(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)[:100]
+        timestamps = _create_interpolated_timestamp_list(nn_intervals, sampling_frequency=4)
+        for interpolation_method in ["linear", "cubic", "nearest"]:
+            funct = interpolate.interp1d(x=_create_timestamp_list(nn_intervals), y=nn_intervals,
+                                         kind=interpolation_method)
+            np.testing.assert_allclose(resample_nn_intervals(nn_intervals, sampling_frequency=4,
+                                                             interpolation_method=interpolation_method),
+                                       funct(timestamps))
+
+    def test_if_resampled_nn_intervals_are_written_in_given_buffer(self):
+        nn_intervals = [1000, 900, 1100, 1000, 950, 850]
+        buffer = np.zeros(20)
+        nni_interpolation = resample_nn_intervals(nn_intervals, sampling_frequency=2, out=buffer)
+        self.assertEqual(len(nni_interpolation), 10)
+        self.assertTrue(np.shares_memory(nni_interpolation, buffer))
+        np.testing.assert_allclose(buffer[:3], [1000, 900 + 100 * 0.4 / 0.9, 900 + 200 * 0.1 / 1.1])
+        with self.assertRaises(ValueError):
+            resample_nn_intervals(nn_intervals, sampling_frequency=2, out=np.zeros(5))
+
+    def test_if_welch_parameters_are_given_to_welch(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        freq, psd = _get_freq_psd_from_nn_intervals(nn_intervals, nperseg=512, noverlap=384,
+                                                    nfft=1024, window="hamming", detrend="linear")
+        nni_interpolation = resample_nn_intervals(nn_intervals, sampling_frequency=4)
+        expected_freq, expected_psd = signal.welch(nni_interpolation - np.mean(nni_interpolation),
+                                                   fs=4, window="hamming", nperseg=512,
+                                                   noverlap=384, nfft=1024, detrend="linear")
+        np.testing.assert_allclose(freq, expected_freq)
+        np.testing.assert_allclose(psd, expected_psd)
+
+    def test_if_auto_welch_sizes_are_powers_of_two(self):
+        # 4 Hz needs 1334 samples per segment to resolve 0.003 Hz
+        self.assertEqual(_get_auto_welch_sizes(24 * 3600 * 4, 4, VlfBand(0.003, 0.04)), (2048, 2048))
+        # Short recordings are bounded by the signal length
+        self.assertEqual(_get_auto_welch_sizes(1200, 4, VlfBand(0.003, 0.04)), (1024, 1024))
+        self.assertEqual(_get_auto_welch_sizes(1200, 4, VlfBand(0.003, 0.04), nperseg=300), (300, 512))
+        freq, _ = _get_freq_psd_from_nn_intervals(load_test_data(TEST_DATA_FILENAME), nfft="auto")
+        self.assertEqual(len(freq), 2048 // 2 + 1)
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""This script provides methods to test the import time of hrvanalysis."""
+
+import os
+import sys
+import subprocess
+import unittest
+
+# Maximum time to import hrvanalysis in a new interpreter, in seconds. Importing it used to
+# take more than 1.5 s with matplotlib, astropy and scipy.signal loaded eagerly.
+IMPORT_TIME_BUDGET = 1.0
+
+# Backends which must only be loaded when a function needing them is called
+HEAVY_MODULES = ["matplotlib", "astropy", "scipy.signal", "pandas", "nolds"]
+
+# Modules of hrvanalysis loaded on first access to one of their functions
+LAZY_MODULES = ["hrvanalysis.batch", "hrvanalysis.windowing", "hrvanalysis.streaming",
+                "hrvanalysis.parallel", "hrvanalysis.chunked", "hrvanalysis.storage",
+                "hrvanalysis.plot"]
+
+IMPORT_SCRIPT = """
+import sys
+import time
+start = time.perf_counter()
+import hrvanalysis
+print(time.perf_counter() - start)
+print(",".join(module for module in {} if module in sys.modules))
+""".format(HEAVY_MODULES + LAZY_MODULES)
+
+
+def run_import_script():
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=package_dir)
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], env=env, check=True,
+                            capture_output=True, text=True).stdout.splitlines()
+    return float(output[0]), [module for module in output[1].split(",") if module]
+
+
+class ImportTestCase(unittest.TestCase):
+    """Class for UniTests of hrvanalysis import"""
+
+    def test_if_heavy_backends_and_lazy_modules_are_not_imported(self):
+        _, imported_modules = run_import_script()
+        self.assertEqual(imported_modules, [])
+
+    def test_if_import_time_is_within_budget(self):
+        # Best of several runs, to ignore a slow start of the machine
+        import_time = min(run_import_script()[0] for _ in range(3))
+        self.assertLess(import_time, IMPORT_TIME_BUDGET)
+
+    def test_if_plot_functions_are_loaded_on_first_access(self):
+        import hrvanalysis
+        from hrvanalysis.plot import plot_psd
+        self.assertIs(hrvanalysis.plot_psd, plot_psd)
+        with self.assertRaises(AttributeError):
+            hrvanalysis.plot_spectrum
+
+    def test_if_lazy_functions_are_exported(self):
+        import hrvanalysis
+        from hrvanalysis.chunked import HrvChunkCleaner
+        self.assertIs(hrvanalysis.HrvChunkCleaner, HrvChunkCleaner)
+        for name in hrvanalysis.__all__:
+            self.assertIn(name, dir(hrvanalysis))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""This script provides methods to test parallel methods."""
+
+import os
+import unittest
+from hrvanalysis.preprocessing import get_nn_intervals
+from hrvanalysis.extract_features import get_time_domain_features, get_poincare_plot_features
+from hrvanalysis.parallel import get_cohort_features
+
+
+TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
+
+
+def load_test_data(path):
+    # Load test rr_intervals data
+    with open(path, "r") as text_file:
+        lines = text_file.readlines()
+    nn_intervals = list(map(lambda x: int(x.strip()), lines))
+    return nn_intervals
+
+
+class CohortFeaturesTestCase(unittest.TestCase):
+    """Class for UniTests of different methods in parallel module"""
+
+    def setUp(self):
+        rr_intervals = load_test_data(TEST_DATA_FILENAME)
+        self.recordings = [rr_intervals[start:start + 250] for start in range(0, 1000, 250)]
+        self.feature_functions = [get_time_domain_features, get_poincare_plot_features]
+
+    def test_if_cohort_features_are_returned_in_input_order(self):
+        cohort_features, errors = get_cohort_features(self.recordings, n_workers=2, chunk_size=1,
+                                                      feature_functions=self.feature_functions)
+        self.assertEqual(errors, {})
+        for features, rr_intervals in zip(cohort_features, self.recordings):
+            nn_intervals = get_nn_intervals(rr_intervals, verbose=False)
+            self.assertEqual(features, {**get_time_domain_features(nn_intervals),
+                                        **get_poincare_plot_features(nn_intervals)})
+
+    def test_if_failing_recording_does_not_stop_other_recordings(self):
+        recordings = self.recordings[:2] + [[]] + self.recordings[2:]
+        cohort_features, errors = get_cohort_features(recordings, n_workers=2,
+                                                      feature_functions=self.feature_functions)
+        self.assertEqual(list(errors), [2])
+        self.assertIsNone(cohort_features[2])
+        self.assertEqual(sum(features is not None for features in cohort_features), 4)
+
+    def test_if_sequential_and_parallel_results_are_equal(self):
+        parallel_features, _ = get_cohort_features(self.recordings, n_workers=2, preprocess=False,
+                                                   feature_functions=self.feature_functions)
+        sequential_features, _ = get_cohort_features(self.recordings, n_workers=1, preprocess=False,
+                                                     feature_functions=self.feature_functions)
+        self.assertEqual(parallel_features, sequential_features)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,15 @@
 #!/usr/bin/env python
 """This script provides methods to test clean_outliers methods."""
 
+import io
 import unittest
+from contextlib import redirect_stdout
 import numpy as np
+import pandas as pd
 from hrvanalysis.preprocessing import (remove_outliers, interpolate_nan_values,
-                                       remove_ectopic_beats, get_nn_intervals)
+                                       remove_ectopic_beats, get_nn_intervals, clean_rr_intervals,
+                                       is_valid_sample, _remove_outlier_successive_rule,
+                                       _remove_outlier_acar)
 
 
 class CleanOutliersTestCase(unittest.TestCase):
@@ -25,6 +30,34 @@ class CleanOutliersTestCase(unittest.TestCase):
         # self.assertAlmostEqual(interpolated_list, expected_list)
         pass
 
+    def test_interpolate_nan_values_is_equal_to_pandas(self):
+        rri_list = [800, 810, np.nan, 830, np.nan, np.nan, np.nan, 790, 805, np.nan, 820,
+                    np.nan, np.nan]
+        for interpolation_method in ["linear", "nearest", "cubic"]:
+            for limit_area in [None, "inside", "outside"]:
+                for limit_direction, limit in [("forward", None), ("forward", 2),
+                                               ("backward", 1), ("both", 1)]:
+                    expected_list = pd.Series(rri_list).interpolate(
+                        method=interpolation_method, limit_area=limit_area,
+                        limit_direction=limit_direction, limit=limit).values
+                    np.testing.assert_allclose(
+                        interpolate_nan_values(rri_list, interpolation_method, limit_area=limit_area,
+                                               limit_direction=limit_direction, limit=limit),
+                        expected_list)
+
+    def test_interpolate_nan_values_with_pandas_only_method_is_equal_to_pandas(self):
+        rri_list = [800, 810, np.nan, 830, np.nan, np.nan, 790, 805, np.nan, 820]
+        expected_list = pd.Series(rri_list).interpolate(method="quadratic").values
+        np.testing.assert_allclose(interpolate_nan_values(rri_list, "quadratic"), expected_list)
+        nn_intervals = get_nn_intervals([800, 810, 2500, 830, 790, 805, 150, 820],
+                                        interpolation_method="quadratic", verbose=False)
+        self.assertFalse(np.any(np.isnan(nn_intervals)))
+
+    def test_interpolate_nan_values_fills_leading_nan_with_first_value(self):
+        rri_array = np.array([np.nan, np.nan, 800, np.nan, 820])
+        np.testing.assert_array_equal(interpolate_nan_values(rri_array), [800, 800, 800, 810, 820])
+        self.assertTrue(np.isnan(rri_array[0]))
+
     def test_1_successive_outlier_malik(self):
         rri_list = [100, 110, 100, 130, 100, 100, 70, 100, 120, 100]
         self.assertEqual(remove_ectopic_beats(rr_intervals=rri_list, method="malik"),
@@ -45,6 +78,40 @@ class CleanOutliersTestCase(unittest.TestCase):
         self.assertEqual((remove_ectopic_beats(rr_intervals=rri_list, method="acar")),
                          [100, 100, 100, 100, 100, 100, 100, 100, 110, np.nan, 110, 100, np.nan])
 
+    def test_acar_uses_cleaned_previous_beats(self):
+        # 112 and 118 are valid against the cleaned window but not against the raw one
+        rri_list = [100] * 9 + [2000, 112, 118]
+        nn_intervals, outlier_count = _remove_outlier_acar(rri_list)
+        self.assertEqual(nn_intervals, [100] * 9 + [np.nan, 112, 118])
+        self.assertEqual(outlier_count, 1)
+
+    def test_acar_ignores_nan_values_in_window(self):
+        rri_list = [100, np.nan, 100, 100, np.nan, 100, 100, 100, 100, 115, 150, 100]
+        self.assertEqual(remove_ectopic_beats(rr_intervals=rri_list, method="acar"),
+                         [100, np.nan, 100, 100, np.nan, 100, 100, 100, 100, 115, np.nan, 100])
+
+    def test_acar_uses_custom_removing_rule(self):
+        rri_list = [800] * 9 + [920, 800, 810]
+        self.assertEqual(remove_ectopic_beats(rr_intervals=rri_list, method="acar"), rri_list)
+        nn_intervals = remove_ectopic_beats(rr_intervals=rri_list, method="acar",
+                                            custom_removing_rule=0.1)
+        self.assertEqual(nn_intervals, [800] * 9 + [np.nan, 800, 810])
+        cleaned_nn_intervals, _ = clean_rr_intervals(rri_list, ectopic_beats_removal_method="acar",
+                                                     custom_removing_rule=0.1, verbose=False)
+        self.assertEqual(cleaned_nn_intervals.tolist(), interpolate_nan_values(nn_intervals))
+
+    def test_beat_following_an_outlier_is_kept_malik(self):
+        rri_list = [100, 150, 100, 150, 100, 150, 150]
+        self.assertEqual(remove_ectopic_beats(rr_intervals=rri_list, method="malik"),
+                         [100, np.nan, 100, np.nan, 100, np.nan, 150])
+
+    def test_successive_rule_outlier_count(self):
+        rri_list = [100, 150, 100, 150, 100, 100, 70, 100]
+        nn_intervals, outlier_count = _remove_outlier_successive_rule(rri_list, method="custom",
+                                                                      custom_rule=0.1)
+        self.assertEqual(nn_intervals, [100, np.nan, 100, np.nan, 100, 100, np.nan, 100])
+        self.assertEqual(outlier_count, 3)
+
     # def test_2_succesive_outliers_malik(self):
     #     rri_list = [103, 110, 100, 150, 50, 100, 100, 130, 115, 100, 78, 70, 100, 100]
     #     self.assertEqual(remove_ectopic_beats(rr_intervals=rri_list, method="Malik"),
@@ -70,6 +137,64 @@ class CleanOutliersTestCase(unittest.TestCase):
         expected_rri_list = [700, 600, 800, 1000, 1000, 1100, 1200]
         self.assertEqual(get_nn_intervals(rri_list), expected_rri_list)
 
+    def test_if_get_nn_intervals_keeps_float32_arrays(self):
+        rri_array = np.array([700, 600, 2300, 1000, 1000, 230, 1200, 900, 1300, 880], dtype=np.float32)
+        for method in ["malik", "karlsson", "acar"]:
+            nn_intervals = get_nn_intervals(rri_array, ectopic_beats_removal_method=method, verbose=False)
+            self.assertIsInstance(nn_intervals, np.ndarray)
+            self.assertEqual(nn_intervals.dtype, np.float32)
+            np.testing.assert_allclose(nn_intervals,
+                                       get_nn_intervals(rri_array.tolist(), verbose=False,
+                                                        ectopic_beats_removal_method=method))
+        self.assertEqual(rri_array[2], 2300)
+
+    def test_if_clean_rr_intervals_returns_corrected_beats_mask(self):
+        rri_list = [700, 600, 2300, 1000, 1000, 230, 1200, 600, 1200, 1100]
+        nn_intervals, corrected_mask = clean_rr_intervals(rri_list, ectopic_beats_removal_method="malik",
+                                                          verbose=False)
+        self.assertEqual(nn_intervals.tolist(), get_nn_intervals(rri_list, verbose=False,
+                                                                 ectopic_beats_removal_method="malik"))
+        self.assertEqual(np.flatnonzero(corrected_mask).tolist(), [2, 5, 7])
+
+    def test_if_clean_rr_intervals_works_in_place(self):
+        rri_array = np.array([700, 600, 2300, 1000, 1000, 230, 1200], dtype=np.float32)
+        nn_intervals, _ = clean_rr_intervals(rri_array, verbose=False, out=rri_array)
+        self.assertIs(nn_intervals, rri_array)
+        np.testing.assert_array_equal(rri_array, [700, 600, 800, 1000, 1000, 1100, 1200])
+        with self.assertRaises(ValueError):
+            clean_rr_intervals([700, 600], verbose=False, out=np.zeros(2, dtype=int))
+
+    def test_if_integer_arrays_are_cleaned_as_float64_arrays(self):
+        rri_cleaned = remove_outliers(np.array([700, 600, 2300, 1000]), verbose=False)
+        self.assertEqual(rri_cleaned.dtype, np.float64)
+        np.testing.assert_array_equal(rri_cleaned, [700, 600, np.nan, 1000])
+
+    def test_if_clean_rr_intervals_returns_diagnostics(self):
+        rri_list = [700, 600, 2300, 1000, 1000, 230, 1200, 600, 1200, 1100]
+        _, corrected_mask, diagnostics = clean_rr_intervals(
+            rri_list, ectopic_beats_removal_method="malik", verbose=False, return_diagnostics=True)
+        self.assertEqual(diagnostics.outlier_indexes.tolist(), [2, 5])
+        # Interpolated value of the 3rd RR-interval differs too much from the next one
+        self.assertEqual(diagnostics.ectopic_indexes.tolist(), [2, 7])
+        self.assertEqual(diagnostics.to_dict()["ectopic_count"], 2)
+        self.assertEqual(np.flatnonzero(corrected_mask).tolist(), [2, 5, 7])
+
+    def test_if_verbose_information_is_logged_instead_of_printed(self):
+        rri_list = [700, 600, 2300, 1000, 1000, 230, 1200]
+        with redirect_stdout(io.StringIO()) as stdout:
+            with self.assertLogs("hrvanalysis.preprocessing", level="DEBUG") as logs:
+                remove_outliers(rri_list)
+                get_nn_intervals(rri_list, ectopic_beats_removal_method="malik")
+                is_valid_sample(rri_list, outlier_count=2)
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertEqual(logs.output[:2], [
+            "INFO:hrvanalysis.preprocessing:2 outlier(s) have been deleted.",
+            "DEBUG:hrvanalysis.preprocessing:The outlier(s) value(s) are : [2300, 230]"])
+        self.assertIn("INFO:hrvanalysis.preprocessing:1 ectopic beat(s) have been deleted with malik rule.",
+                      logs.output)
+        self.assertEqual(logs.records[0].diagnostics.outlier_indexes.tolist(), [2, 5])
+        self.assertEqual(len(logs.output), 7)
+
 
 if __name__ == '__main__':
     unittest.main()
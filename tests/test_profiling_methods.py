@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""This script provides methods to test profiling methods."""
+
+import os
+import json
+import unittest
+import threading
+from hrvanalysis.preprocessing import get_nn_intervals
+from hrvanalysis.extract_features import get_frequency_domain_features, clear_psd_cache
+from hrvanalysis.profiling import (profile_stages, profile_stage, add_stage_callback,
+                                   remove_stage_callback)
+
+
+TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
+
+
+def load_test_data(path):
+    # Load test rr_intervals data
+    with open(path, "r") as text_file:
+        lines = text_file.readlines()
+    nn_intervals = list(map(lambda x: int(x.strip()), lines))
+    return nn_intervals
+
+
+class ProfilingTestCase(unittest.TestCase):
+    """Class for UniTests of different methods in profiling module"""
+
+    def test_if_stages_of_preprocessing_and_frequency_domain_are_recorded(self):
+        rr_intervals = load_test_data(TEST_DATA_FILENAME)
+        clear_psd_cache()
+        with profile_stages() as profile:
+            with profile_stage("analysis", len(rr_intervals)):
+                nn_intervals = get_nn_intervals(rr_intervals, verbose=False)
+                get_frequency_domain_features(nn_intervals)
+        self.assertEqual([record["stage"] for record in profile.records],
+                         ["preprocessing.remove_outliers", "preprocessing.interpolate_outliers",
+                          "preprocessing.remove_ectopic_beats",
+                          "preprocessing.interpolate_ectopic_beats",
+                          "frequency_domain.interpolation", "frequency_domain.welch",
+                          "frequency_domain.band_integration", "analysis"])
+        self.assertEqual(profile.records[0]["size"], len(rr_intervals))
+        self.assertEqual(profile.records[0]["parent"], "analysis")
+        self.assertIsNone(profile.records[0]["allocated_bytes"])
+        summary = json.loads(profile.to_json())["summary"]
+        self.assertEqual(summary["frequency_domain.welch"]["count"], 1)
+        self.assertGreaterEqual(summary["analysis"]["time"], summary["frequency_domain.welch"]["time"])
+
+    def test_if_allocated_memory_is_recorded(self):
+        with profile_stages(trace_memory=True) as profile:
+            with profile_stage("outer"):
+                with profile_stage("inner"):
+                    values = [0.] * 100000
+                del values
+        inner_record, outer_record = profile.records
+        self.assertGreaterEqual(inner_record["allocated_bytes"], 800000)
+        self.assertGreaterEqual(outer_record["allocated_bytes"], inner_record["allocated_bytes"])
+
+    def test_if_callbacks_receive_records_only_while_registered(self):
+        records = []
+        add_stage_callback(records.append)
+        try:
+            get_nn_intervals([700, 600, 2300, 1000, 1000, 230, 1200], verbose=False)
+        finally:
+            remove_stage_callback(records.append)
+        get_nn_intervals([700, 600, 2300, 1000, 1000, 230, 1200], verbose=False)
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[-1]["stage"], "preprocessing.interpolate_ectopic_beats")
+
+    def test_if_stages_of_other_threads_are_not_recorded(self):
+        records = []
+        add_stage_callback(records.append)
+        try:
+            with profile_stages() as profile:
+                with profile_stage("main"):
+                    thread = threading.Thread(target=get_nn_intervals,
+                                              args=([700, 600, 2300, 1000, 1000, 230, 1200],),
+                                              kwargs={"verbose": False})
+                    thread.start()
+                    thread.join()
+        finally:
+            remove_stage_callback(records.append)
+        self.assertEqual([record["stage"] for record in profile.records], ["main"])
+        self.assertEqual(len(records), 5)
+        self.assertIsNone(records[0]["parent"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""This script provides methods to test storage methods."""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from hrvanalysis.preprocessing import get_nn_intervals
+from hrvanalysis.extract_features import get_time_domain_features
+from hrvanalysis.batch import get_batch_features
+from hrvanalysis.storage import write_rr_intervals_file, RrIntervalsFile
+
+
+TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
+
+
+def load_test_data(path):
+    # Load test rr_intervals data
+    with open(path, "r") as text_file:
+        lines = text_file.readlines()
+    nn_intervals = list(map(lambda x: int(x.strip()), lines))
+    return nn_intervals
+
+
+class StorageTestCase(unittest.TestCase):
+    """Class for UniTests of different methods in storage module"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "recordings.hrv")
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        self.recordings = [nn_intervals, nn_intervals[:300], [800.5, 810.25]]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_if_recordings_are_read_as_memory_mapped_views(self):
+        write_rr_intervals_file(self.path, self.recordings)
+        rr_intervals_file = RrIntervalsFile(self.path)
+        self.assertEqual(len(rr_intervals_file), 3)
+        self.assertEqual(rr_intervals_file.offsets.tolist(), [0, 1000, 1300, 1302])
+        for recording, expected_recording in zip(rr_intervals_file, self.recordings):
+            self.assertIsInstance(recording, np.memmap)
+            self.assertEqual(recording.dtype, np.float32)
+            np.testing.assert_array_equal(recording, expected_recording)
+        self.assertFalse(rr_intervals_file[-1].flags.writeable)
+
+    def test_if_int16_recordings_are_rounded(self):
+        write_rr_intervals_file(self.path, self.recordings, dtype="int16")
+        rr_intervals_file = RrIntervalsFile(self.path)
+        self.assertEqual(rr_intervals_file.dtype, np.int16)
+        self.assertEqual(rr_intervals_file[2].tolist(), [800, 810])
+        with self.assertRaises(ValueError):
+            write_rr_intervals_file(self.path, [[800, np.nan]], dtype="int16")
+        with self.assertRaises(ValueError):
+            write_rr_intervals_file(self.path, [[800, 32767.6]], dtype="int16")
+        write_rr_intervals_file(self.path, [[800, 32767.4]], dtype="int16")
+        self.assertEqual(RrIntervalsFile(self.path)[0].tolist(), [800, 32767])
+
+    def test_if_views_are_accepted_by_preprocessing_and_features_functions(self):
+        write_rr_intervals_file(self.path, self.recordings[:2])
+        rr_intervals_file = RrIntervalsFile(self.path)
+        nn_intervals = get_nn_intervals(rr_intervals_file[0], verbose=False)
+        np.testing.assert_allclose(nn_intervals, get_nn_intervals(self.recordings[0], verbose=False))
+
+        batch_features = get_batch_features(rr_intervals_file.values, rr_intervals_file.offsets,
+                                            frequency_domain=False)
+        for index, recording in enumerate(self.recordings[:2]):
+            self.assertAlmostEqual(batch_features["sdnn"][index],
+                                   get_time_domain_features(recording)["sdnn"])
+
+    def test_if_other_files_are_rejected(self):
+        with self.assertRaises(ValueError):
+            RrIntervalsFile(TEST_DATA_FILENAME)
+
+
+if __name__ == '__main__':
+    unittest.main()
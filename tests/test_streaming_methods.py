@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""This script provides methods to test streaming methods."""
+
+import os
+import unittest
+import numpy as np
+from hrvanalysis.preprocessing import get_nn_intervals
+from hrvanalysis.extract_features import get_time_domain_features, get_poincare_plot_features
+from hrvanalysis.streaming import HrvStream
+
+
+TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
+
+
+def load_test_data(path):
+    # Load test rr_intervals data
+    with open(path, "r") as text_file:
+        lines = text_file.readlines()
+    nn_intervals = list(map(lambda x: int(x.strip()), lines))
+    return nn_intervals
+
+
+class HrvStreamTestCase(unittest.TestCase):
+    """Class for UniTests of HrvStream in streaming module"""
+
+    def test_if_stream_cleaning_is_equal_to_get_nn_intervals(self):
+        rri_list = [700, 600, 2300, 1000, 1000, 230, 1200, 800, 810, 1300, 820, 815, 200]
+        for method in ["malik", "kamath", "karlsson", "acar", "custom"]:
+            hrv_stream = HrvStream(ectopic_beats_removal_method=method)
+            nn_intervals = []
+            for rr_interval in rri_list:
+                nn_intervals.extend(hrv_stream.add_rr_intervals(rr_interval))
+            nn_intervals.extend(hrv_stream.flush())
+            np.testing.assert_allclose(nn_intervals,
+                                       get_nn_intervals(rri_list, ectopic_beats_removal_method=method,
+                                                        verbose=False))
+
+    def test_if_nn_intervals_are_held_back_during_a_gap(self):
+        hrv_stream = HrvStream(ectopic_beats_removal_method="malik")
+        self.assertEqual(hrv_stream.add_rr_intervals([800, 810]), [800, 810])
+        self.assertEqual(hrv_stream.add_rr_intervals(2500), [])
+        self.assertEqual(hrv_stream.add_rr_intervals(830), [820, 830])
+
+    def test_if_window_features_are_equal_to_features_of_last_nn_intervals(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        hrv_stream = HrvStream(window=200)
+        for start in range(0, len(nn_intervals), 7):
+            hrv_stream.add_rr_intervals(nn_intervals[start:start + 7])
+        hrv_stream.flush()
+
+        last_nn_intervals = hrv_stream.nn_intervals
+        self.assertEqual(len(last_nn_intervals), 200)
+        features = {**get_time_domain_features(last_nn_intervals),
+                    **get_poincare_plot_features(last_nn_intervals)}
+        stream_features = {**hrv_stream.get_time_domain_features(),
+                           **hrv_stream.get_poincare_plot_features()}
+        for feature_name, value in stream_features.items():
+            self.assertAlmostEqual(value, features[feature_name], places=8)
+
+    def test_if_features_without_enough_nn_intervals_raises_error(self):
+        hrv_stream = HrvStream()
+        hrv_stream.add_rr_intervals(800)
+        with self.assertRaises(ValueError):
+            hrv_stream.get_time_domain_features()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""This script provides methods to test windowing methods."""
+
+import os
+import unittest
+import numpy as np
+from scipy import signal
+from hrvanalysis.extract_features import (get_time_domain_features, get_poincare_plot_features,
+                                          resample_nn_intervals, _get_features_from_psd)
+from hrvanalysis.windowing import get_sliding_window_features, get_spectrogram_features
+
+
+TEST_DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'test_nn_intervals.txt')
+
+
+def load_test_data(path):
+    # Load test rr_intervals data
+    with open(path, "r") as text_file:
+        lines = text_file.readlines()
+    nn_intervals = list(map(lambda x: int(x.strip()), lines))
+    return nn_intervals
+
+
+class SlidingWindowTestCase(unittest.TestCase):
+    """Class for UniTests of different methods in windowing module"""
+
+    def assert_features_equal_to_slice_features(self, nn_intervals, sliding_window_features):
+        for i, (start, end) in enumerate(zip(sliding_window_features["window_start"],
+                                             sliding_window_features["window_end"])):
+            features = {**get_time_domain_features(nn_intervals[start:end]),
+                        **get_poincare_plot_features(nn_intervals[start:end])}
+            for feature_name, values in sliding_window_features.items():
+                if feature_name in features:
+                    self.assertAlmostEqual(values[i], features[feature_name], places=7)
+
+    def test_if_beats_windows_features_are_equal_to_slice_features(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        sliding_window_features = get_sliding_window_features(nn_intervals, window_length=300,
+                                                              step=50)
+        self.assertEqual(list(sliding_window_features["window_start"]),
+                         list(range(0, 701, 50)))
+        self.assert_features_equal_to_slice_features(nn_intervals, sliding_window_features)
+
+    def test_if_seconds_windows_features_are_equal_to_slice_features(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        sliding_window_features = get_sliding_window_features(nn_intervals, window_length=300,
+                                                              step=30, unit="seconds")
+        # The recording lasts 718 seconds : windows start every 30 seconds until 390 seconds
+        self.assertEqual(len(sliding_window_features["window_start"]), 14)
+        nni_end_time = np.cumsum(nn_intervals) / 1000
+        for i, (start, end) in enumerate(zip(sliding_window_features["window_start"],
+                                             sliding_window_features["window_end"])):
+            self.assertTrue(30 * i < nni_end_time[start] <= nni_end_time[end - 1] <= 30 * i + 300)
+        self.assert_features_equal_to_slice_features(nn_intervals, sliding_window_features)
+
+    def test_if_constant_windows_have_null_poincare_plot_features(self):
+        nn_intervals = np.concatenate((np.random.default_rng(0).normal(800, 50, 500),
+                                       np.full(400, 800.)))
+        sliding_window_features = get_sliding_window_features(nn_intervals, window_length=100,
+                                                              step=50)
+        for i, start in enumerate(sliding_window_features["window_start"]):
+            features = get_poincare_plot_features(nn_intervals[start:start + 100])
+            self.assertAlmostEqual(sliding_window_features["sd1"][i], features["sd1"], places=7)
+            self.assertAlmostEqual(sliding_window_features["sd2"][i], features["sd2"], places=7)
+        self.assertEqual(sliding_window_features["sdnn"][-1], 0)
+        self.assertEqual(sliding_window_features["sd1"][-1], 0)
+        self.assertEqual(sliding_window_features["sd2"][-1], 0)
+
+    def test_if_wrong_unit_raises_error(self):
+        with self.assertRaises(ValueError):
+            get_sliding_window_features([800, 810, 820], window_length=2, step=1, unit="minutes")
+
+    def test_if_spectrogram_psd_is_equal_to_scipy_spectrogram(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        spectrogram_features = get_spectrogram_features(nn_intervals, window_length=300, step=30,
+                                                        return_psd=True)
+        nni_interpolation = resample_nn_intervals(nn_intervals, sampling_frequency=4)
+        freq, _, psd = signal.spectrogram(nni_interpolation, fs=4, window="hann", nperseg=1200,
+                                          noverlap=1200 - 120, nfft=2048, detrend="constant")
+        np.testing.assert_allclose(spectrogram_features["freq"], freq)
+        np.testing.assert_allclose(spectrogram_features["psd"], psd.T)
+        self.assertEqual(list(spectrogram_features["window_start_time"]),
+                         [30. * i for i in range(psd.shape[1])])
+
+    def test_if_spectrogram_features_are_equal_to_welch_features_of_each_window(self):
+        nn_intervals = load_test_data(TEST_DATA_FILENAME)
+        spectrogram_features = get_spectrogram_features(nn_intervals, window_length=120, step=60)
+        nni_interpolation = resample_nn_intervals(nn_intervals, sampling_frequency=4)
+        for i, start_time in enumerate(spectrogram_features["window_start_time"]):
+            start = int(start_time * 4)
+            freq, psd = signal.welch(nni_interpolation[start:start + 480], fs=4, nperseg=480,
+                                     nfft=512)
+            features = _get_features_from_psd(freq, psd)
+            for feature_name, value in features.items():
+                self.assertAlmostEqual(spectrogram_features[feature_name][i], value)
+
+    def test_if_recording_shorter_than_window_has_no_spectrogram_window(self):
+        spectrogram_features = get_spectrogram_features([800] * 10, window_length=300, step=30)
+        self.assertEqual(len(spectrogram_features["lf"]), 0)
+        with self.assertRaises(ValueError):
+            get_spectrogram_features([800] * 500, window_length=300, step=30, nfft=512)
+
+
+if __name__ == '__main__':
+    unittest.main()